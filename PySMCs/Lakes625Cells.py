@@ -2,21 +2,20 @@
 ##  Program to generate 6-25km SMC cell arrays for Gt Lakes and Caspian Sea.
 ##
 ##  First created:        JGLi28Feb2023
-##  Last modified:        JGLi03Feb2025
+##  Last modified:        JGLi18Oct2026
 ##
 """
 
 def main():
 
 ##  Import relevant modules and functions
-    import numpy   as np
     import netCDF4 as nc 
 
-    from smcellgen import smcellgen
+    from smcelbatch import smcelbatch
+    from readbathy import readbathy
 
     Wrkdir='../tmpfls/'
     bathyf='../Bathys/Bathy088_059deg.nc'
-    Global= False
 #   Arctic= False   ## defaul value.
 
 ##  Open and read bathymetry data.
@@ -38,10 +37,8 @@ def main():
     dlon = (xlon[-1] - xlon[0])/float(nlon-1)
     print(" nlat, nlon, dlat, dlon =", nlat, nlon, dlat, dlon )
 
-    Bathy= datas.variables['elevation'][:,:]
-    depthmax = np.amin(Bathy)
-    hightmax = np.amax(Bathy)
-    print(' Bathy range=', depthmax, hightmax)
+##  Only the lake row bands are read from the bathy file.  JGLi18Oct2026
+    Bathy= readbathy(bathyf, varname='elevation')
     print(' Bathy shape=', Bathy.shape )
 
     print( " Domain range x0, y0, xn, yn =",xlon[0],ylat[0],xlon[-1],ylat[-1] )
@@ -80,10 +77,6 @@ def main():
     LakeRange=[Caspian,Superior,Michigan,ErieSClr,Ontario]
     Lowaterlv=[ -27.5, 183.3,   176.0,   173.5,   74.2   ]
 
-    for grd in range(len(GridNames)):
-        GridNm=GridNames[grd]+'6125'
-        Ranges=LakeRange[grd]
-        wlevel=Lowaterlv[grd]
 ##  Note wlevel defines water surface altitude (normally sea level 0.0) 
 ##  and non-zero values are used to define lake surfaces differ from sea level.
 ##  The depmin defines the minimum elavation the model domain should cover and 
@@ -92,20 +85,18 @@ def main():
 ##  dshalw defines shallow water altitude and is used to refine shallow water area
 ##  so setting dshalw equal to wlevel makes all area below wlevel to be deep water.
 ##  Define dshalw = wlevel - 60.0 will refine areas less than 60 m below wlevel.
-        dshalw=wlevel
-        depmin=wlevel
- 
-        print( GridNm+" range and water level =", Ranges, wlevel  ) 
-
-##  Merte lake range with mlvlxy0 array. 
-        mlvlxy0 = [ NLvl, x0lon, y0lat ] + Ranges 
-
-        smcellgen(Bathy, ndzlonlat, mlvlxy0, FileNm=Wrkdir+GridNm, 
-            Global=Global, depmin=depmin, dshalw=dshalw, wlevel=wlevel) 
-    
-        print( "GridNm cells saved in ", Wrkdir+GridNm+'Cels.dat')
-
-##  End of lake grid loop.
+    jobs = []
+    for grd in range(len(GridNames)):
+        wlevel=Lowaterlv[grd]
+        jobs.append( {'GridNm': GridNames[grd]+'6125', 
+                      'region': LakeRange[grd], 'wlevel': wlevel,
+                      'depmin': wlevel, 'dshalw': wlevel, 'NLvl': NLvl} )
+
+##  All lakes are generated in one batch sharing bathy rows and tables.
+##  JGLi18Oct2026
+    smcelbatch(Bathy, ndzlonlat, jobs, x0lon=x0lon, y0lat=y0lat, 
+               Wrkdir=Wrkdir, nproc=1)
+    Bathy.close()
     
 ##  End of main function.
 
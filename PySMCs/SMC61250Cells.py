@@ -11,16 +11,18 @@
 ##  Re-tested with updated smcellgen.py function.     JGLi02Mar2023 
 ##  Adapted to generate SMC371250 grid with Bathy044_033.nc   JGLi18Mar2023 
 ##  Adapted to generate SMC61250 grid with Bathy088_059.nc   JGLi28Apr2023 
+##  Read bathy in row bands with readbathy to bound memory.  JGLi18Oct2026 
+##  Next row band prefetched on a background thread.        JGLi18Oct2026 
 ##
 """
 
 def main():
 
 ##  Import relevant modules and functions
-    import numpy   as np
     import netCDF4 as nc 
 
     from smcellgen import smcellgen
+    from readbathy import readbathy
 
     Wrkdir='../tmpfls/'
     bathyf='../Bathys/Bathy088_059deg.nc' 
@@ -48,16 +50,17 @@ def main():
 
     xlon = datas.variables['lon'][:]
     ylat = datas.variables['lat'][:]
-    Bathy= datas.variables['elevation'][:,:]
-    depthmax = np.amin(Bathy)
-    hightmax = np.amax(Bathy)
-    print(' Bathy range=', depthmax, hightmax)
-    print(' Bathy shape=', Bathy.shape )
     print(' x_lon range=', xlon[0], xlon[nlon-1])
     print(' y_lat range=', ylat[0], ylat[nlat-1])
 
     datas.close()
 
+##  Bathy elevation is read in row bands only when smcellgen needs them
+##  so full resolution bathy need not be held in memory, with the next 
+##  band read ahead while the current one is worked on.
+    Bathy= readbathy(bathyf, varname='elevation', prefetch=True)
+    print(' Bathy shape=', Bathy.shape )
+
 ##  Pack bathy parameters into one list.
     ndzlonlat=[ nlon, nlat, dlon, dlat, xlon[0], ylat[0] ]
 ##  Check top row bathy values
@@ -73,6 +76,7 @@ def main():
 
     smcellgen(Bathy, ndzlonlat, mlvlxy0, FileNm=Wrkdir+GridNm, 
               Global=Global, Arctic=Arctic, depmin=depmin)
+    Bathy.close()
     
 ##  End of main program.
 
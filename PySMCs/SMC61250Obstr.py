@@ -20,10 +20,12 @@
 ## Modified for updated SMC61250 grid.  JGLi10May2021
 ## Modified for SMCGTools package.      JGLi06Oct2021
 ## Adapted to use Bathy088_059deg.nc obstruction ratio.  JGLi28Apr2023
+## Cell mean ratios from pooled block means of smcellpyr.  JGLi18Oct2026
+## Accept SMCCells cells returned by smcellgen and return Kobstr.  JGLi18Oct2026
 ##
 """
 
-def main(): 
+def main(cells=None): 
 ##  Import relevant modules and functions
 
     import numpy   as np
@@ -31,13 +33,17 @@ def main():
 
     from readcell import readcell   
     from readtext import readtext   
+    from smcellpyr import pyrmean
 
 ##  Read global and Arctic part cells. 
     Wrkdir='../tmpfls/'
     Cel_file = '../DatGMC/SMC61250Cels.dat'
     Arc_file = '../DatGMC/SMC61250BArc.dat'
 
-    headrs, Cel = readcell( [Cel_file, Arc_file] ) 
+    if( cells is not None ):
+        headrs, Cel = readcell( cells )
+    else:
+        headrs, Cel = readcell( [Cel_file, Arc_file] ) 
     ng = int( headrs[0].split()[0] )
     na = int( headrs[1].split()[0] )
     nb = int( headrs[1].split()[1] )
@@ -96,22 +102,26 @@ def main():
 #;; Create sub-grid obstruction ratio for all cells, excluding Arctic part 
     print (' Generating obstruction ratios for ng =', ng )
 
-    for n in range(ng):
-        i=Cel[n,0] + iShft
-        j=Cel[n,1] + jEqut
-        if( i >= NCobs ): i = i - NCobs 
-        if( j >= NRobs or j < 0 ): print ('n, j=', n, j)
-        mi=Cel[n,2]
-        nj=Cel[n,3]
-
-#;; Loop over merged cells if any
-        avrobs = 0.0
-        for ii in range(i, i+mi):
-            if( ii >= NCobs ): ii = ii - NCobs 
-            avrobs += np.sum( Fobsin[j:j+nj,ii] ) 
+#;; Cells of the same size share one pooled block mean grid over the 
+#;; rows and columns of their cells, given by pyrmean.  JGLi18Oct2026
+    Fobsin = np.ma.filled(Fobsin, 0.0)
+    ci = Cel[:ng,0] + iShft
+    ci = np.where( ci >= NCobs, ci - NCobs, ci )
+    cj = Cel[:ng,1] + jEqut
+    jout = (cj >= NRobs) | (cj < 0)
+    for n in np.nonzero(jout)[0]: print ('n, j=', n, cj[n])
+
+    avrobs = np.zeros(ng, dtype=float)
+    sizes, ksize = np.unique( Cel[:ng,2:4], axis=0, return_inverse=True )
+    for k, (mi, nj) in enumerate(sizes):
+        kcel = np.nonzero( (ksize.ravel() == k) & ~jout )[0]
+        jrows, jk = np.unique( cj[kcel], return_inverse=True )
+        icols, ik = np.unique( ci[kcel], return_inverse=True )
+        mobs = pyrmean(Fobsin, nj, mi, jrows, icols, NCM=NCobs)
+        avrobs[kcel] = mobs[jk.ravel(), ik.ravel()]
 
 #;; Maximum 90% blocking is enforced to avoid full blocking.
-        Kobstr[n] = np.min( [90, int(round( 100.0*avrobs/float(nj*mi)))] )
+    Kobstr[:] = np.minimum( 90, np.rint( 100.0*avrobs ) )
 
 #;; WW3 read in obstruction rather transparency so 1.0 mean complete blocking!
 #;; The value will be from 0.0 for transparent sea point to 1.0 for full land 
@@ -125,6 +135,8 @@ def main():
 
     print (" All done! " )
 
+    return Kobstr
+
 ##  End of SMC61250Obstr.py main function.
 
 if __name__ == '__main__':
@@ -0,0 +1,156 @@
+"""
+## Content-addressed cache of reduced and interpolated bathymetry files.
+##
+## A product, such as GEBCO_reduced_8_6.nc of reduceGEBCObstr or the
+## Bathy_interpolated_*.nc of interpdepthobstr, is saved in a cache
+## directory under the hash key of its source file identity (size,
+## modification time and a hash of its first and last MiB, or of the
+## whole file with fullhash=True), the reduction parameters and the
+## code version, i.e. the bytes of the modules making the product.
+## A rerun with the same key finds the cached file and copies it to the
+## product file name at once instead of reading the source again.
+##
+##   key = cachekey(gebcofile, {'scalefac':[8,6], 'depthmin':0.0})
+##   hit = cacheget(cachedir, key)
+##   if( hit is not None ): cachecopy(hit, outfile)
+##   ... make outfile ...
+##   cacheput(cachedir, key, outfile, maxsize=20*2**30)
+##
+## Files are copied into and out of the cache, never linked, so a later
+## change of a product file, in place or not, leaves the cached file as
+## it was.  Each copy is written to a temporary file and renamed, so no
+## partial file is ever seen under a cache or product name.  The cache is
+## kept within maxsize bytes by removing the least recently used files,
+## whose modification times are renewed on each hit.
+##
+## First created:    JGLi18Oct2026
+##
+"""
+
+def cachekey(srcfile, params, codes=None, fullhash=False):
+    """
+    Hash key of a product from the identity of its source file, a dict
+    of the parameters making it and the bytes of the code files codes.
+    """
+    import os
+    import json
+    import hashlib
+
+    stat = os.stat(srcfile)
+    hsh = hashlib.sha1()
+    hsh.update( json.dumps({'size': stat.st_size, 'mtime': stat.st_mtime_ns,
+                            'params': params}, sort_keys=True,
+                           default=str).encode() )
+
+## Source bytes, only the first and last MiB unless fullhash.
+    nbyt = 2**20
+    with open(srcfile, 'rb') as flhdl:
+        if( fullhash or stat.st_size <= 2*nbyt ):
+            for blk in iter(lambda: flhdl.read(16*nbyt), b''):
+                hsh.update( blk )
+        else:
+            hsh.update( flhdl.read(nbyt) )
+            flhdl.seek(-nbyt, os.SEEK_END)
+            hsh.update( flhdl.read(nbyt) )
+
+    for code in (codes or []):
+        with open(code, 'rb') as flhdl:
+            hsh.update( flhdl.read() )
+
+    return hsh.hexdigest()
+
+## End of cachekey function.
+
+
+def cachefile(cachedir, key, suffix='.nc'):
+    """ Cache file name of a key. """
+    import os
+    return os.path.join(cachedir, key + suffix)
+
+## End of cachefile function.
+
+
+def cacheget(cachedir, key, suffix='.nc'):
+    """
+    Cached file of the key with its use time renewed, or None.
+    """
+    import os
+    from bathycache import cachefile
+
+    if( cachedir is None ): return None
+    cfile = cachefile(cachedir, key, suffix)
+    if( not os.path.exists(cfile) ): return None
+    os.utime(cfile)
+    print(" Cache hit "+cfile)
+    return cfile
+
+## End of cacheget function.
+
+
+def cachecopy(cfile, outfile):
+    """
+    Copy file cfile to outfile, replacing any old outfile.
+    """
+    import os
+    import shutil
+
+## A file copied onto itself would be truncated.
+    if( os.path.exists(outfile) and os.path.samefile(cfile, outfile) ):
+        return outfile
+
+    tmpfile = outfile + '.tmp'
+    shutil.copyfile(cfile, tmpfile)
+    os.replace(tmpfile, outfile)
+    return outfile
+
+## End of cachecopy function.
+
+
+def cacheput(cachedir, key, outfile, maxsize=None, suffix='.nc'):
+    """
+    Save product file outfile in the cache under the key and evict old
+    files beyond maxsize bytes.  Return the cached file name.
+    """
+    import os
+    from bathycache import cachefile, cachecopy, cacheevict
+
+    os.makedirs(cachedir, exist_ok=True)
+    cfile = cachecopy(outfile, cachefile(cachedir, key, suffix))
+    os.utime(cfile)
+    print(" Cached "+outfile+" as "+cfile)
+    if( maxsize is not None ):
+        cacheevict(cachedir, maxsize, keep=[cfile])
+    return cfile
+
+## End of cacheput function.
+
+
+def cacheevict(cachedir, maxsize, keep=()):
+    """
+    Remove least recently used cache files until the cache is within
+    maxsize bytes, except the files in keep.  Return removed files.
+    """
+    import os
+
+    files = []
+    for name in os.listdir(cachedir):
+        path = os.path.join(cachedir, name)
+        if( name.endswith('.tmp') or not os.path.isfile(path) ): continue
+        stat = os.stat(path)
+        files.append( (stat.st_mtime, stat.st_size, path) )
+
+    total = sum( [ size for mtime, size, path in files ] )
+    removed = []
+    for mtime, size, path in sorted(files):
+        if( total <= maxsize ): break
+        if( path in keep ): continue
+        os.remove(path)
+        total -= size
+        removed.append( path )
+        print(" Cache evicted "+path)
+
+    return removed
+
+## End of cacheevict function.
+
+## End of bathycache.py program.
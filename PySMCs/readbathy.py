@@ -0,0 +1,289 @@
+"""
+Lazy row-band access to a bathymetry variable in a netCDF file.
+
+Function readbathy(bathyfile) returns a BathyRows object, which can
+be passed to smcellgen or smcellbdy in place of the Bathy array.
+Only the rows requested by Bathy[j0:j1,:] slicing are read from the
+file and the last rows are kept so that the overlapping halo of the
+next row band is not read again.  Peak memory is then bounded by the
+row band size rather than the full bathymetry.
+
+Longitude wrapping is left to the cell generators as full rows are
+always read.  The object could be pickled to worker processes, which
+re-open the file with their own read-only netCDF4.Dataset handle.
+
+Row reads are extended to the row chunk ends of a chunked variable, 
+so no chunk is decompressed twice for a forward moving band, and with
+prefetch=True the next row band is read on a background thread while
+the current one is being processed.  As the netCDF library is not 
+thread safe, no other netCDF file should be accessed by the caller
+while a prefetching BathyRows is in use.  The lon and lat coordinates
+are read once and cached as xlon and ylat.
+
+Function ncchunks gives the chunk layout of a netCDF variable, tilesize
+a tile size aligned to it, and prefetch reads a sequence of tiles one
+ahead on a background thread, as used by reduce_interp.
+
+The main() function demonstrates reading the top row of a bathymetry.
+
+First created:      JGLi18Oct2026
+Last modified:      JGLi18Oct2026
+
+"""
+
+class BathyRows:
+    """
+    Bathymetry variable read in row bands with a rolling row cache.
+    Values are multiplied by factor, i.e. factor=-1.0 converts depth
+    into elevation as smcellgen requires.
+    """
+
+    def __init__(self, bathyfile, varname='elevation', factor=1.0,
+                 prefetch=False, lonname='lon', latname='lat'):
+        import numpy   as np
+        import netCDF4 as nc
+        from readbathy import ncchunks
+
+        self.bathyfile = bathyfile
+        self.varname = varname
+        self.factor = factor
+        self.prefetch = prefetch
+        self.lonname = lonname
+        self.latname = latname
+        self._dh = None
+        self._rows = [0, 0]
+        self._data = None
+        self._pool = None
+        self._next = None
+        self._coords = None
+
+        with nc.Dataset(bathyfile) as dh:
+            var = dh.variables[varname]
+            self.shape = tuple(var.shape)
+            self.dtype = (np.zeros(1, dtype=var.dtype)*factor).dtype
+            self.chunks = ncchunks(var)
+        self.ndim = len(self.shape)
+
+    def __getstate__(self):
+## Dataset handle, cached rows and the prefetch thread are not passed 
+## to other processes.
+        state = self.__dict__.copy()
+        state['_dh'] = None
+        state['_rows'] = [0, 0]
+        state['_data'] = None
+        state['_pool'] = None
+        state['_next'] = None
+        return state
+
+    def __len__(self):
+        return self.shape[0]
+
+    def close(self):
+        if( self._pool is not None ):
+            self._pool.shutdown(wait=True, cancel_futures=True)
+        self._pool = None
+        self._next = None
+        if( self._dh is not None ):
+            self._dh.close()
+        self._dh = None
+        self._data = None
+        self._rows = [0, 0]
+
+    def coords(self):
+        """ Return the lon and lat coordinate vectors, read only once. """
+        import numpy   as np
+        import netCDF4 as nc
+
+        def readxy():
+            if( self._dh is None ):
+                self._dh = nc.Dataset(self.bathyfile)
+            return ( np.asarray( self._dh.variables[self.lonname][:] ),
+                     np.asarray( self._dh.variables[self.latname][:] ) )
+
+        if( self._coords is None ):
+            if( self._pool is not None ):
+                self._coords = self._pool.submit(readxy).result()
+            else:
+                self._coords = readxy()
+        return self._coords
+
+    @property
+    def xlon(self):
+        return self.coords()[0]
+
+    @property
+    def ylat(self):
+        return self.coords()[1]
+
+    def _read(self, j0, j1):
+        """ Read rows j0:j1 from the file, always on one thread. """
+        import numpy   as np
+        import netCDF4 as nc
+
+        if( self._dh is None ):
+            self._dh = nc.Dataset(self.bathyfile)
+        rows = np.asarray( self._dh.variables[self.varname][j0:j1,:] )
+        if( self.factor != 1.0 ): rows = rows*self.factor
+        return rows
+
+    def _rowend(self, j1):
+        """ Row j1 moved up to the next row chunk end. """
+        if( self.chunks is not None and self.chunks[0] > 1 ):
+            nch = self.chunks[0]
+            j1 = min([ self.shape[0], -(-j1//nch)*nch ])
+        return j1
+
+    def _fetch(self, r0, r1):
+        """ New rows r0 up to at least r1, prefetched if available. """
+        if( self._next is not None ):
+            p0, p1, fut = self._next
+            self._next = None
+            if( p0 == r0 and p1 >= r1 ):
+                return fut.result()
+            fut.result()
+        r1 = self._rowend(r1)
+        if( self._pool is not None ):
+            return self._pool.submit(self._read, r0, r1).result()
+        return self._read(r0, r1)
+
+    def readrows(self, j0, j1):
+        """ Return bathy rows j0:j1 as a plain numpy array. """
+        import numpy   as np
+        from concurrent.futures import ThreadPoolExecutor
+
+        c0, c1 = self._rows
+        if( self._data is not None and c0 <= j0 and j1 <= c1 ):
+            return self._data[j0-c0:j1-c0]
+
+        if( self.prefetch and self._pool is None ):
+            self._pool = ThreadPoolExecutor(max_workers=1)
+
+## Only read rows beyond the cached ones for a forward moving band.
+        if( self._data is not None and c0 <= j0 < c1 < j1 ):
+            newrows = self._fetch(c1, j1)
+            data = np.concatenate( (self._data[j0-c0:], newrows) )
+        else:
+            data = self._fetch(j0, j1)
+
+        self._rows = [j0, j0 + data.shape[0]]
+        self._data = data
+
+## Next band of the same height read in the background.
+        r0 = self._rows[1]
+        if( self._pool is not None and r0 < self.shape[0] ):
+            r1 = self._rowend( min([self.shape[0], r0 + max([1, j1-j0])]) )
+            self._next = ( r0, r1, self._pool.submit(self._read, r0, r1) )
+
+        return data[:j1-j0]
+
+    def __getitem__(self, key):
+        import numpy as np
+
+        if( not isinstance(key, tuple) ):
+            key = (key, slice(None))
+        jkey, ikey = key
+
+        if( isinstance(jkey, slice) ):
+            j0, j1, jstep = jkey.indices(self.shape[0])
+            if( jstep == 1 ):
+                return self.readrows(j0, max([j0, j1]))[:, ikey]
+## Other row strides are picked from all the rows in between.
+            jrow = np.arange(j0, j1, jstep)
+            if( jrow.size == 0 ):
+                return self.readrows(j0, j0)[:, ikey]
+            rows = self.readrows(jrow.min(), jrow.max()+1)
+            return rows[jrow - jrow.min()][:, ikey]
+        else:
+            j0 = int(jkey)
+            if( j0 < 0 ): j0 += self.shape[0]
+            return self.readrows(j0, j0+1)[0, ikey]
+
+## End of BathyRows class.
+
+
+def readbathy(bathyfile, varname='elevation', factor=1.0, prefetch=False):
+    """ Open a bathymetry file for row band reading. """
+    return BathyRows(bathyfile, varname=varname, factor=factor, 
+                     prefetch=prefetch)
+
+## End of readbathy function.
+
+
+def ncchunks(var):
+    """ Chunk sizes of a netCDF variable, or None if it is contiguous. """
+
+    chunks = var.chunking()
+    if( chunks is None or isinstance(chunks, str) ):
+        return None
+    return tuple( [ int(n) for n in chunks ] )
+
+## End of ncchunks function.
+
+
+def tilesize(ndm, nfac=1, chunk=None, nmax=400):
+    """
+    Largest divisor of ndm not more than nmax whose tile of nfac times
+    raw points is a whole number of chunks, or the largest divisor if
+    none is aligned or the chunk is not given.
+    """
+
+    divs = [ n for n in range(min([nmax, ndm]), 0, -1) if ndm % n == 0 ]
+    if( len(divs) == 0 ): return 0
+    if( chunk is not None and chunk > 1 ):
+        for n in divs:
+            if( (n*nfac) % chunk == 0 ): return n
+    return divs[0]
+
+## End of tilesize function.
+
+
+def prefetch(read, keys, depth=1, pool=None):
+    """
+    Generator of (key, read(key)) for keys in order, with the next depth
+    reads done on one background thread while the caller works on the
+    current one.  The netCDF (HDF5) library must not be called by two 
+    threads at a time, so any other netCDF access of the caller, such
+    as tile writes, is to be submitted to the same single thread pool.
+    """
+    from collections import deque
+    from concurrent.futures import ThreadPoolExecutor
+
+    keys = list(keys)
+    depth = max(1, int(depth))
+    owner = pool is None
+    if( owner ): pool = ThreadPoolExecutor(max_workers=1)
+    try:
+        futs = deque()
+        for key in keys[:depth]:
+            futs.append( pool.submit(read, key) )
+        for k, key in enumerate(keys):
+            data = futs.popleft().result()
+            if( k+depth < len(keys) ):
+                futs.append( pool.submit(read, keys[k+depth]) )
+            yield key, data
+    finally:
+        if( owner ): pool.shutdown(wait=True, cancel_futures=True)
+
+## End of prefetch function.
+
+
+def main():
+
+    import sys
+
+    bathyf = '../Bathys/Bathy088_059deg.nc'
+    if( len(sys.argv) > 1 ): bathyf = sys.argv[1]
+
+    Bathy = readbathy(bathyf)
+    nlat = Bathy.shape[0]
+    nlon = Bathy.shape[1]
+    print(" Bathy shape and dtype =", Bathy.shape, Bathy.dtype)
+    print('Bathy[',nlat-1,[f'{i:d}' for i in range(0,nlon,1024)],']')
+    print(Bathy[nlat-1,0:nlon:1024])
+    Bathy.close()
+
+##  End of main() function.
+
+if __name__ == '__main__':
+    main()
+
@@ -15,26 +15,41 @@ as a stand alone function and merge the Arctic part manually.
 
 Use Numpy genfromtxt to read cell array.  JGLi26Feb2025
 
+Cells returned by the cell generators as an SMCCells object, or its
+(header, cells) parts, could be given in place of the file names and 
+are merged in the same way without any file read.  JGLi18Oct2026
+
 First created:              JGLi18Feb2019 
-Last modified:              JGLi26Feb2025 
+Last modified:              JGLi18Oct2026 
 
 """
 
 ##  Input celfiles as a list even if there is only one file.
 ##  For instance celfiles=['path/celfile.dat', 'path/arcfile.dat']
+##  An SMCCells object, i.e. cells=smcellgen(...), could be given as 
+##  celfiles=cells or celfiles=[cells['Cels'], cells['BArc']].
 def readcell(celfiles):
     import numpy  as np
+    from smcells import SMCCells
+
+    if( isinstance(celfiles, SMCCells) ):
+        return celfiles.readcell()
     
     nfls = 0 
     for celfile in celfiles:
-        print( " Read cel from ", celfile)
-        archd=open(celfile, 'r') 
-        hdlin=archd.readline()
-        archd.close()
-         
+
+##  In-memory (header, cells) part of an SMCCells object.
+        if( isinstance(celfile, tuple) ):
+            hdlin = '' if( celfile[0] is None ) else celfile[0]+'\n'
+            celin = np.asarray(celfile[1], dtype=int)
+        else:
+            print( " Read cel from ", celfile)
+            archd=open(celfile, 'r') 
+            hdlin=archd.readline()
+            archd.close()
 
 ##  Read the cell array as Numpy integers but skip first count line.
-        celin=np.genfromtxt(celfile, dtype=int, skip_header=1)
+            celin=np.genfromtxt(celfile, dtype=int, skip_header=1)
         nfls += 1
 
         if( nfls <= 1):
@@ -51,8 +51,21 @@
 #  Add obstruction ratio and simplify configure input with a main() function.
 #  Lake corrections are moved into SMC grid generating program.
 #
+# Jian-Guo Li; Met Office; Oct-2026
+#  Opt-in tile read/reduce timing of reduceGEBCObstr with smctimer.
+#  Obstruction ratios from popcounts of bit-packed land masks (smcelbits).
+#  Tile depth means by one blockmean reshape/mean with optional float32 sums.
+#  Reduction and interpolation tiles run in nproc processes by tilemap.
+#  Finished tiles written straight into chunked and compressed netCDF files.
+#  Reduction tiles aligned to the input chunks and read ahead on a background thread.
+#  Pyramid of scale factors s, 2s, 4s, ... in one pass as netCDF groups.
+#  Reduced and interpolated files optionally cached by source, parameters and code
+#  (bathycache), on with a cachedir config entry.
+#  Interpolation tiles read with a halo and a cheaper separable linear/cubic method.
+#
 #==================================================================================
 
+import os
 import netCDF4 as nc
 import numpy as np
 import scipy.interpolate as interp
@@ -124,6 +137,54 @@ def writeReducedNCxy(outfile, scalefac, depthmin, latout, lonout, depout, obsout
         nbg.minimum_depth = depthmin
 
 
+def createdepthobstrNC(outfile, latout, lonout, attrs, chunks=None, complevel=4, 
+                       group=None):
+    """ Create a netCDF file of lat, lon and the elevation and obstruction variables,
+        chunked by chunks (lat, lon sizes) and zlib compressed at complevel (0 for
+        none), to be written tile by tile.  Return the open netCDF dataset.
+        If group is given, they are created in a new group of that name in the open
+        netCDF dataset outfile and the group is returned.
+    """
+
+    if( group is None ):
+        if( os.path.exists(outfile) ): os.remove(outfile)
+        nbg = nc.Dataset(outfile, 'w')
+    else:
+        nbg = outfile.createGroup(group)
+    ndimx = nbg.createDimension('lon',size=np.size(lonout))
+    ndimy = nbg.createDimension('lat',size=np.size(latout))
+
+    ndep = nbg.createVariable('lat','f8',dimensions=('lat'))
+    ndep.units = 'degrees_east'
+    ndep[:] = latout[:]
+
+    ndep = nbg.createVariable('lon','f8',dimensions=('lon'))
+    ndep.units = 'degrees_north'
+    ndep[:] = lonout[:]
+
+    if( chunks is not None ):
+        chunks = ( max(1, min(chunks[0], np.size(latout))), 
+                   max(1, min(chunks[1], np.size(lonout))) )
+    for name, units in (('elevation', 'm'), ('obstruction', '1.0')):
+        ndep = nbg.createVariable(name,'f8',dimensions=('lat','lon'), chunksizes=chunks,
+                                  zlib=complevel > 0, complevel=max(1, complevel))
+        ndep.units = units
+
+    for key, val in attrs.items():
+        nbg.setncattr(key, val)
+
+    return nbg
+
+def cacheproduct(srcfile, params, cachedir):
+    """ Cache key of a product of srcfile made with params by this module and
+        smcelbits, and its cached file in cachedir or None.
+    """
+    import smcelbits
+    from bathycache import cachekey, cacheget
+
+    key = cachekey(srcfile, params, codes=[__file__, smcelbits.__file__])
+    return key, cacheget(cachedir, key)
+
 def rebin(arr, new_shape):
     """ Bin a large array to a smaller one by averaging """
 
@@ -139,6 +200,48 @@ def rebin(arr, new_shape):
 
     return arrout
 
+def blocks(arr, nfay, nfax):
+    """ Every nfay x nfax block of a 2-D array as a flattened last axis. """
+
+    nby = arr.shape[0] // nfay
+    nbx = arr.shape[1] // nfax
+    return arr.reshape(nby, nfay, nbx, nfax).swapaxes(1, 2).reshape(nby, nbx, nfay*nfax)
+
+def blockmean(arr, nfay, nfax, dtype=float):
+    """ Mean of every nfay x nfax block of a 2-D (masked) array, summed in dtype.
+        Blocks are summed in the same order as a flattened block, and masked
+        points are excluded with NaN for fully masked blocks as np.mean does.
+    """
+
+    mask = np.ma.getmaskarray(arr)
+    if( not np.any(mask) ):
+        return blocks( np.ma.getdata(arr), nfay, nfax ).mean(axis=-1, dtype=dtype)
+
+    bsum, count = blocksum(arr, nfay, nfax, dtype=dtype)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(count > 0, bsum/count, np.nan)
+
+def blocksum(arr, nfay, nfax, dtype=float):
+    """ Sum and unmasked point number of every nfay x nfax block of a 2-D (masked)
+        array, summed in dtype as blockmean.
+    """
+
+    mask = np.ma.getmaskarray(arr)
+    count = blocks( ~mask, nfay, nfax ).sum(axis=-1)
+    bsum = blocks( np.ma.filled(arr, 0), nfay, nfax ).sum(axis=-1, dtype=dtype)
+    return bsum, count
+
+def landcount(tmpdep, depthmin, nfay, nfax):
+    """ Land point (>= depthmin) numbers of every nfay x nfax block of a raw tile,
+        from the bit-packed land mask of the tile.
+    """
+    from smcelbits import bitcount
+
+    lndbit = np.packbits( np.ma.filled(tmpdep >= depthmin, False), axis=1 )
+    jrys = np.arange(0, tmpdep.shape[0] - nfay + 1, nfay)[:,None]
+    irxs = np.arange(0, tmpdep.shape[1] - nfax + 1, nfax)[None,:]
+    return bitcount(lndbit, jrys, jrys+nfay, irxs, irxs+nfax)
+
 def depthobstr(subathy, depmin=0.0):
     """ Average the subathy into a single value and caculate obstruction ratio """
 
@@ -152,10 +255,143 @@ def depthobstr(subathy, depmin=0.0):
     return (depth, obstr)
 
 
+def tileinit(ncfile):
+    """ Open the read-only netCDF handle of a tilemap worker process. """
+
+    global TILEDH
+    TILEDH = nc.Dataset(ncfile, 'r')
+
+def tilejob(args):
+    """ Read and work on one tile in a tilemap worker on its own netCDF handle. """
+
+    read, work, task = args
+    return work(read(TILEDH, *task), *task)
+
+def tilemap(read, work, tasks, ncfile, put, nproc=1):
+    """ Run work(read(dh, *task), *task) for all tile tasks on the netCDF file ncfile
+        and pass each finished tile result to put(result) in the calling process, so
+        only tiles in hand are held in memory.  In one process the next tile is read
+        on a background thread (readbathy prefetch) while the current one is worked
+        on, with put also run on the same thread as the netCDF library is not thread
+        safe.  With nproc > 1 tiles are shared out to a process pool, each worker with
+        its own read-only netCDF handle, and are put in the order they are finished.
+        Return the list of put returns.
+    """
+    from multiprocessing import Pool
+    from concurrent.futures import ThreadPoolExecutor
+    from readbathy import prefetch
+
+    if( nproc <= 1 or len(tasks) <= 1 ):
+        with nc.Dataset(ncfile, 'r') as dh, ThreadPoolExecutor(max_workers=1) as iopool:
+            return [ iopool.submit(put, work(data, *task)).result() for task, data in 
+                     prefetch(lambda task: read(dh, *task), tasks, pool=iopool) ]
+
+    with Pool(processes=nproc, initializer=tileinit, initargs=(ncfile,)) as pool:
+        return [ put(result) for result in pool.imap_unordered(tilejob, 
+                 [ (read, work, task) for task in tasks ]) ]
+
+def reduceread(dh, ix, jy, prm):
+    """ Read the raw elevation tile of reduced grid tile ix, jy and the read time. """
+    import time
+
+    nhtx = prm['ntlx']*prm['nfax']
+    nhty = prm['ntly']*prm['nfay']
+    ihx = (ix+prm['iffx'])*prm['nfax']
+    jhy = (jy+prm['jffy'])*prm['nfay']
+
+    tread = time.perf_counter()
+    tmpdep = dh.variables['elevation'][jhy:jhy+nhty,ihx:ihx+nhtx]
+    return tmpdep, time.perf_counter() - tread
+
+def reducetile(tile, ix, jy, prm):
+    """ Reduce the raw tile read by reduceread at reduced grid ix, jy.  Return the
+        tile indexes, read and reduce times and the tile depth and obstruction arrays.
+    """
+    import time
+
+    tmpdep, tread = tile
+    nfax = prm['nfax']; nfay = prm['nfay']
+
+    tredu = time.perf_counter()
+    depth = blockmean(tmpdep, nfay, nfax, dtype=np.float32 if prm['float32'] else float)
+
+##  Land point counts of all blocks from the bit-packed land mask of the tile.
+    nland = landcount(tmpdep, prm['depthmin'], nfay, nfax)
+    obstr = nland/float(nfax*nfay)
+    tredu = time.perf_counter() - tredu
+
+    return ix, jy, tread, tredu, depth, obstr
+
+def pyramidtile(tile, ix, jy, prm):
+    """ Reduce the raw tile read by reduceread into nlevel levels of scale factors 
+        doubled level by level, each coarser level summed from the finer one.
+        Return the tile indexes, read and reduce times and a list of the level
+        depth and obstruction arrays.
+    """
+    import time
+
+    tmpdep, tread = tile
+    nfax = prm['nfax']; nfay = prm['nfay']
+
+##  Depth sums, sea point and land point numbers are added up exactly, so
+##  each level is the same as a direct reduction of the raw tile.
+    tredu = time.perf_counter()
+    bsum, count = blocksum(tmpdep, nfay, nfax)
+    nland = landcount(tmpdep, prm['depthmin'], nfay, nfax)
+    levels = []
+    for k in range(prm['nlevel']):
+        if( k > 0 ):
+            bsum  = blocks(bsum,  2, 2).sum(axis=-1)
+            count = blocks(count, 2, 2).sum(axis=-1)
+            nland = blocks(nland, 2, 2).sum(axis=-1)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            depth = np.where(count > 0, bsum/count, np.nan)
+        levels.append( (depth, nland/float(nfax*nfay*4**k)) )
+    tredu = time.perf_counter() - tredu
+
+    return ix, jy, tread, tredu, levels
+
 def reduceGEBCObstr(gebcofile='./GEBCO_2022.nc', scalefac=[8,6], depthmin=0.0, 
-                    cutout=None, region=None, workdir='./'):
+                    cutout=None, region=None, workdir='./', timer=None, float32=False,
+                    nproc=1, complevel=4, nlevel=1, cachedir=None, cachesize=20.0):
     """ Reduce the size of GEBCO grid and save obstruction ratio as land/total points.
+        Tile read and reduce times are recorded in timer (smctimer SMCTimer) if given.
+        Tile block depths are summed in float32 if float32 is True, exact for the
+        int16 GEBCO elevation and half the memory of float64 sums.
+        Tiles are reduced in nproc processes if nproc > 1 and each finished tile is
+        written into the tile-chunked output file, compressed at complevel.
+        Tiles are whole numbers of the elevation chunks where possible.
+        If nlevel > 1 a pyramid of scale factors scalefac, 2*scalefac, 4*scalefac ...
+        (as SMC cell levels) is built in one read of the source, each coarser level
+        from the finer one, and saved as nlevel groups of one netCDF file.  For a
+        cutout all levels cover the level 0 region (see reducepyramid).
+        If cachedir is given, the output file is cached there by bathycache under
+        the source file identity, parameters and code version, and a rerun with
+        the same key copies the cached file in place of a new reduction.  The cache
+        is kept within cachesize GiB.
     """
+    import time
+    from readbathy import ncchunks, tilesize
+    from bathycache import cachecopy, cacheput
+
+##  Reduced bathymetry and obstruction ratio file or pyramid file.
+    name = region if( region is not None ) else 'GEBCO'
+    nlevel = max(1, int(nlevel))
+    if( nlevel > 1 ):
+        outfile = workdir+name+'_pyramid_%d_%d_L%d' % (scalefac[0], scalefac[1], nlevel) + '.nc'
+    else:
+        outfile = workdir+name+'_reduced_%d_%d' % (scalefac[0], scalefac[1]) + '.nc'
+
+    key = None
+    if( cachedir is not None ):
+        params = {'action': 'reduce', 'scalefac': list(scalefac), 'depthmin': depthmin,
+                  'cutout': None if cutout is None else list(cutout),
+                  'float32': float32, 'nlevel': nlevel, 'complevel': complevel}
+        key, hit = cacheproduct(gebcofile, params, cachedir)
+        if( hit is not None ):
+            print('[INFO] Cached reduced data copied to %s' %cachecopy(hit, outfile))
+            return  0 
+
     print('[INFO] Reading data from %s' %gebcofile)
     print('[INFO] Running reduction of GEBCO data at scale factor ', scalefac)
     print('[INFO] Water point criterion is depth < %f ' %depthmin)
@@ -207,65 +443,162 @@ def reduceGEBCObstr(gebcofile='./GEBCO_2022.nc', scalefac=[8,6], depthmin=0.0,
     print( " New bathymetry domain:", xlon[iffx*nfax], ylat[jffy*nfay], 
                         xlon[(iffx+ndmx)*nfax-1], ylat[(jffy+ndmy)*nfay-1] ) 
 
-##  Declare new bathy array
-    depth = np.zeros([ndmy, ndmx], dtype=float)
-    obstr = np.zeros([ndmy, ndmx], dtype=float)
+##  Pyramid tiles hold whole blocks of the coarsest level.
+    MFct = 2**(nlevel-1)
+    if( ndmx % MFct != 0 or ndmy % MFct != 0 ):
+        print( " New dimension not a multiple of pyramid factor:", ndmx, ndmy, MFct)
+        dh.close()
+        return
+
+##  Declare new bathy coordinates
     nwlat = np.zeros(ndmy)
     nwlon = np.zeros(ndmx)
 
-##  Break raw data into roughly 400-cell tiles to speed up process.
-    ntlx=400
-    while (ntlx > 0):
-        if( int(ndmx/ntlx)*ntlx == ndmx ): break
-        ntlx -= 1
-
-    ntly=400
-    while (ntly > 0):
-        if( int(ndmy/ntly)*ntly == ndmy ): break
-        ntly -= 1
+##  Break raw data into roughly 400-cell tiles to speed up process,
+##  aligned to the elevation chunks if possible.
+    chunks = ncchunks(dh.variables['elevation'])
+    if( chunks is None ): chunks = (None, None)
+    ntlx = tilesize(ndmx//MFct, nfax*MFct, chunks[1], max(1, 400//MFct))*MFct
+    ntly = tilesize(ndmy//MFct, nfay*MFct, chunks[0], max(1, 400//MFct))*MFct
 
-    print(' Tile size ntlx, ntly =', ntlx, ntly )
+    print(' Tile size ntlx, ntly and raw chunks =', ntlx, ntly, chunks )
     nhtx=ntlx*nfax
     nhty=ntly*nfay
 
-##  Loop over merged sub-arrays to calculate new depth and obstruction ratio
-    print (" Reduction loop started at ", datetime.now().strftime('%F %H:%M:%S') )
+##  New tile longitudes and latitudes from the raw coordinates.
     for ix in range(0,ndmx,ntlx):
         ihx = (ix+iffx)*nfax
-        tmplon = dh.variables['lon'][ihx:ihx+nhtx]
-        nwlon[ix:ix+ntlx] = rebin(tmplon, [ntlx]) 
-
-        if( ix % ntlx*10 == 0 ):
-            print(" ... processing ix =", ix, ' at ', datetime.now().strftime('%H:%M:%S') )
-        for jy in range(0,ndmy,ntly):
-            jhy = (jy+jffy)*nfay
-##  Calculate new latitude only when ix == 0
-            tmplat = dh.variables['lat'][jhy:jhy+nhty]
-            nwlat[jy:jy+ntly] = rebin(tmplat, [ntly]) 
-            if( ix == 0 and jy % ntly*100 == 0):
-                print(" ... processing jy = ", jy )
-
-##  Loop over depth sub-arrays to calculate new depth and obstruction ratio.
-            tmpdep = dh.variables['elevation'][jhy:jhy+nhty,ihx:ihx+nhtx]
-
-            for iix in range(ntlx):
-                irx=iix*nfax
-                for jjy in range(ntly):
-                    jry=jjy*nfay
-                    depth[jy+jjy,ix+iix], obstr[jy+jjy,ix+iix] =  \
-                        depthobstr(tmpdep[jry:jry+nfay,irx:irx+nfax], depmin=depthmin)
-
-##  End of sub-array loop and close raw data file.
+        nwlon[ix:ix+ntlx] = rebin(xlon[ihx:ihx+nhtx], [ntlx]) 
+    for jy in range(0,ndmy,ntly):
+        jhy = (jy+jffy)*nfay
+        nwlat[jy:jy+ntly] = rebin(ylat[jhy:jhy+nhty], [ntly]) 
     dh.close()
+
+    prm = {'nfax': nfax, 'nfay': nfay, 'ntlx': ntlx, 'ntly': ntly, 'iffx': iffx,
+           'jffy': jffy, 'depthmin': depthmin, 'float32': float32, 'nlevel': nlevel}
+    tasks = [ (ix, jy, prm) for ix in range(0,ndmx,ntlx) for jy in range(0,ndmy,ntly) ]
+    if( nlevel > 1 ):
+        reducepyramid(gebcofile, tasks, prm, nwlat, nwlon, xlon, ylat, depthmin, 
+                      outfile, timer, nproc, complevel)
+        if( key is not None ):
+            cacheput(cachedir, key, outfile, maxsize=int(cachesize*2**30))
+        return  0 
+
+##  Reduced file chunked as the tiles.
+    print('[INFO] Writing reduced grid data to %s' %outfile)
+    attrs = {'description': 'Reduced GEBCO bathymetry grid: mean depth values over cell',
+             'reduction_lon_factor': scalefac[0], 'reduction_lat_factor': scalefac[1],
+             'minimum_depth': depthmin}
+    nbg = createdepthobstrNC(outfile, nwlat, nwlon, attrs, chunks=(ntly, ntlx),
+                             complevel=complevel)
+
+##  Each finished tile is written straight into the file.
+    nland = [0]
+    def puttile(tile):
+        ix, jy, tread, tredu, depth, obstr = tile
+        twrit = time.perf_counter()
+        nbg.variables['elevation'  ][jy:jy+ntly,ix:ix+ntlx] = depth
+        nbg.variables['obstruction'][jy:jy+ntly,ix:ix+ntlx] = obstr
+        twrit = time.perf_counter() - twrit
+        nland[0] += int(np.sum(obstr >= 1.0))
+        if( timer is not None ):
+            timer.addtime('read', tread)
+            timer.addtime('reduce', tredu)
+            timer.addtime('write', twrit)
+            timer.record('tile', ix=ix, jy=jy, read=tread, reduce=tredu,
+                         write=twrit, cells=ntlx*ntly)
+
+##  Loop over merged sub-arrays to calculate new depth and obstruction ratio,
+##  with tiles shared out to nproc processes.
+    print (" Reduction loop started at ", datetime.now().strftime('%F %H:%M:%S'), 
+           " with nproc =", nproc )
+    try:
+        tilemap(reduceread, reducetile, tasks, gebcofile, puttile, nproc=nproc)
+    finally:
+        nbg.close()
     print (" Reduction loop finished at ", datetime.now().strftime('%F %H:%M:%S') )
 
-##  Save the reduced bathymetry and obstruction ratio.
-    if region is None:
-        outfile = workdir+'GEBCO_reduced_%d_%d' % (scalefac[0], scalefac[1]) + '.nc'
-    else:
-        outfile = workdir+region+'_reduced_%d_%d' % (scalefac[0], scalefac[1]) + '.nc'
+    if( timer is not None ):
+        timer.count('cells', ndmx*ndmy)
+        timer.count('land', nland[0])
 
-    writeReducedNCxy(outfile, scalefac, depthmin, nwlat, nwlon, depth, obstr)    
+    if( key is not None ):
+        cacheput(cachedir, key, outfile, maxsize=int(cachesize*2**30))
+
+    return  0 
+
+
+def reducepyramid(gebcofile, tasks, prm, nwlat, nwlon, xlon, ylat, depthmin, 
+                  outfile, timer, nproc, complevel):
+    """ Reduce tiles of reduceGEBCObstr into a pyramid of prm['nlevel'] levels and
+        save them as groups 'reduced_<lon factor>_<lat factor>' of netCDF file outfile.
+        All levels share the level 0 footprint, the cutout rounded with the level 0
+        scale factor.  A level equals a direct reduceGEBCObstr run at its own scale
+        factor only for a global grid, as a regional direct run rounds the cutout
+        with its own factor and may start and end at other raw points.
+    """
+    import time
+
+    nlevel = prm['nlevel']
+    nfax = prm['nfax'];  nfay = prm['nfay']
+    ntlx = prm['ntlx'];  ntly = prm['ntly']
+    i0 = prm['iffx']*nfax
+    j0 = prm['jffy']*nfay
+    nwx = nwlon.size;   nwy = nwlat.size
+
+    print('[INFO] Writing reduced grid pyramid to %s' %outfile)
+
+    if( os.path.exists(outfile) ): os.remove(outfile)
+    nbg = nc.Dataset(outfile, 'w')
+    nbg.description = 'Reduced GEBCO bathymetry pyramid: mean depth values over cell'
+    nbg.pyramid_levels = nlevel
+    nbg.minimum_depth = depthmin
+
+##  Level coordinates are reduced from the raw ones as single reductions.
+    grps = []
+    for k in range(nlevel):
+        mfac = 2**k
+        name = 'reduced_%d_%d' % (nfax*mfac, nfay*mfac)
+        if( k == 0 ):
+            latk, lonk = nwlat, nwlon
+        else:
+            latk = rebin(ylat[j0:j0+nwy*nfay], [nwy//mfac])
+            lonk = rebin(xlon[i0:i0+nwx*nfax], [nwx//mfac])
+        attrs = {'description': 'Reduced GEBCO bathymetry grid: mean depth values over cell',
+                 'reduction_lon_factor': nfax*mfac, 'reduction_lat_factor': nfay*mfac,
+                 'minimum_depth': depthmin}
+        grps.append( createdepthobstrNC(nbg, latk, lonk, attrs, 
+                     chunks=(ntly//mfac, ntlx//mfac), complevel=complevel, group=name) )
+        print(' Pyramid level', k+1, name, 'dimensions', lonk.size, latk.size)
+
+    nland = [0]*nlevel
+    def puttile(tile):
+        ix, jy, tread, tredu, levels = tile
+        twrit = time.perf_counter()
+        for k, (depth, obstr) in enumerate(levels):
+            jk = jy >> k;  ik = ix >> k
+            grps[k].variables['elevation'  ][jk:jk+depth.shape[0],ik:ik+depth.shape[1]] = depth
+            grps[k].variables['obstruction'][jk:jk+obstr.shape[0],ik:ik+obstr.shape[1]] = obstr
+            nland[k] += int(np.sum(obstr >= 1.0))
+        twrit = time.perf_counter() - twrit
+        if( timer is not None ):
+            timer.addtime('read', tread)
+            timer.addtime('reduce', tredu)
+            timer.addtime('write', twrit)
+            timer.record('tile', ix=ix, jy=jy, read=tread, reduce=tredu,
+                         write=twrit, cells=ntlx*ntly)
+
+    print (" Pyramid loop started at ", datetime.now().strftime('%F %H:%M:%S'), 
+           " with nproc =", nproc )
+    try:
+        tilemap(reduceread, pyramidtile, tasks, gebcofile, puttile, nproc=nproc)
+    finally:
+        nbg.close()
+    print (" Pyramid loop finished at ", datetime.now().strftime('%F %H:%M:%S') )
+
+    if( timer is not None ):
+        timer.count('cells', nwx*nwy)
+        timer.count('land', nland[0])
 
     return  0 
 
@@ -288,9 +621,96 @@ def reduceGEBCOxy(scalefac=[8,6], depthmin=0.0, cutout=None, region=None,
 
 
 
+def interpread(dh, ix, addx, tmplon, lonsub, ioutx, iy, addy, tmplat, latsub, iouty,
+               method='spline'):
+    """ Read the raw depth and obstruction tile at ix, iy. """
+
+    tmpdep = dh.variables['elevation'  ][iy:iy+addy,ix:ix+addx]
+    tmpobs = dh.variables['obstruction'][iy:iy+addy,ix:ix+addx]
+    return tmpdep, tmpobs
+
+def sepweights(xin, xout, method='linear'):
+    """ Weights (xout size, xin size) of linear or cubic (Keys cubic convolution)
+        interpolation from ascending and evenly spaced xin points to xout points.
+    """
+
+    nin = np.size(xin)
+    i = np.clip(np.searchsorted(xin, xout, side='right') - 1, 0, nin-2)
+    t = (xout - xin[i])/(xin[i+1] - xin[i])
+    if( method == 'linear' ):
+        near = [ (0, 1.0 - t), (1, t) ]
+    else:
+        near = [ (-1, (-t**3 + 2*t**2 - t)/2.0), (0, (3*t**3 - 5*t**2 + 2.0)/2.0),
+                 ( 1, (-3*t**3 + 4*t**2 + t)/2.0), (2, (t**3 - t**2)/2.0) ]
+
+##  Points beyond the ends take the end values.
+    wgts = np.zeros( (np.size(xout), nin) )
+    rows = np.arange(np.size(xout))
+    for k, w in near:
+        np.add.at(wgts, (rows, np.clip(i + k, 0, nin-1)), w)
+    return wgts
+
+def interptile(tile, ix, addx, tmplon, lonsub, ioutx, iy, addy, tmplat, latsub, iouty,
+               method='spline'):
+    """ Interpolate the raw tile read by interpread onto the output lonsub and latsub
+        points, by bicubic splines or by separable 'linear' or 'cubic' weights shared
+        by depth and obstruction.  Return the output tile start iouty, ioutx and its
+        depth and obstruction.
+    """
+
+    tmpdep, tmpobs = tile
+
+    if( method == 'spline' ):
+        splinedep = interp.RectBivariateSpline(tmplat,tmplon,tmpdep)
+        depout = splinedep(latsub,lonsub)
+        splineobs = interp.RectBivariateSpline(tmplat,tmplon,tmpobs)
+        obsout = splineobs(latsub,lonsub)
+    else:
+        wgty = sepweights(tmplat, latsub, method)
+        wgtx = sepweights(tmplon, lonsub, method).T
+        depout = wgty @ np.ma.getdata(tmpdep) @ wgtx
+        obsout = wgty @ np.ma.getdata(tmpobs) @ wgtx
+
+    # correct spline interpolation limits for obstruction ratio.
+    obsout[obsout < 0.001] = 0.0
+    obsout[obsout > 0.999] = 1.0
+
+    return iouty, ioutx, depout, obsout
+
 ##  Functions added to interpolate high resolution depth and obstruction ratios.
-def interpdepthobstr(hiresfile, dx=0.5, dy=0.5, depthmin=0.0, cutout=None, workdir='./'):
-    """ Interpolating depth and obstruction ratio into new resolution data. """
+def interpdepthobstr(hiresfile, dx=0.5, dy=0.5, depthmin=0.0, cutout=None, workdir='./',
+                     nproc=1, complevel=4, cachedir=None, cachesize=20.0, halo=8,
+                     method='spline'):
+    """ Interpolating depth and obstruction ratio into new resolution data.
+        Tiles are interpolated in nproc processes if nproc > 1 and each finished
+        tile is written into the chunked output file, compressed at complevel.
+        Each tile is read with halo extra raw points on each side so that the fit
+        near the tile edges matches that of its neighbours.  Method 'spline' uses
+        bicubic splines and 'linear' or 'cubic' cheaper separable weights.
+        If cachedir is given, the output file is named by its bathycache key in
+        place of the run time and cached in cachedir (within cachesize GiB), and
+        a rerun with the same key copies the cached file without interpolation.
+    """
+    from bathycache import cachecopy, cacheput
+
+##  Cutout longitudes within -180 to 180 before they key the cache.
+    if cutout is not None:
+        cutout = list(cutout)
+        if cutout[0] > 180.0: cutout[0] = cutout[0]-360.0
+        if cutout[2] > 180.0: cutout[2] = cutout[2]-360.0
+
+    outfile = workdir+'Bathy_interpolated_' + datetime.now().strftime('%F_%H%M') + '.nc'
+    key = None
+    if( cachedir is not None ):
+        params = {'action': 'interp', 'dx': dx, 'dy': dy, 'depthmin': depthmin,
+                  'cutout': cutout,
+                  'complevel': complevel, 'halo': halo, 'method': method}
+        key, hit = cacheproduct(hiresfile, params, cachedir)
+        outfile = workdir+'Bathy_interpolated_' + key[:16] + '.nc'
+        if( hit is not None ):
+            print('[INFO] Cached interpolated data copied to %s' %cachecopy(hit, outfile))
+            with nc.Dataset(outfile) as nbg:
+                return nbg.variables['lat'][:].data, nbg.variables['lon'][:].data
 
     print('[INFO] Reading data from %s' %hiresfile)
     print('[INFO] Interpolating data to resolution dx:%.6f, dy:%.6f' %(dx,dy))
@@ -317,8 +737,6 @@ def interpdepthobstr(hiresfile, dx=0.5, dy=0.5, depthmin=0.0, cutout=None, workd
         offsx = 0
         offsy = 0
     else:
-        if cutout[0] > 180.0: cutout[0] = cutout[0]-360.0
-        if cutout[2] > 180.0: cutout[2] = cutout[2]-360.0
         print('[INFO] Cutout region lon-lat range:', cutout )
         x0 = cutout[0]
         y0 = cutout[1]
@@ -333,8 +751,6 @@ def interpdepthobstr(hiresfile, dx=0.5, dy=0.5, depthmin=0.0, cutout=None, workd
     newx = int((xl-x0)/dx+1.001)
     print (" Interpolaton newx, newy, offsx, offsy = ", newx, newy, offsx, offsy )
 
-    depout = np.zeros([newy, newx])
-    obsout = np.zeros([newy, newx])
     latout = np.arange(y0, yl+dy/5.0, dy)
     lonout = np.arange(x0, xl+dx/5.0, dx)
 
@@ -349,79 +765,107 @@ def interpdepthobstr(hiresfile, dx=0.5, dy=0.5, depthmin=0.0, cutout=None, workd
 #       if( int(nlat/ntly)*ntly == nlat ): break
 #       ntly -= 1
 
-    print(' Tile size ntlx, ntly =', ntlx, ntly )
-
-    print (" Interpolaton loop started at ", datetime.now().strftime('%F %H:%M:%S') )
+##  Tile steps are kept whatever the input chunks, as they set the spline seams.
+    print(' Tile size ntlx, ntly and halo =', ntlx, ntly, halo )
 
     # using loops/tiles here to avoid memory problems with read in of full dataset.
+##  Tile columns and rows with their output points are worked out first from the
+##  coordinates, so that tiles could be interpolated in any order, and stop at the
+##  last output point of a cutout short of the raw bathy edges.  Output points up to
+##  the tile end are counted by searchsorted, as a floor of their distance over dx
+##  could drop the last one by rounding.
+    xtiles = []
     ix = offsx
     ioutx = 0
-    while ix < nlon-1:
-
+    while ix < nlon-1 and ioutx < np.size(lonout):
         addx = np.min([ntlx+1, nlon-ix])
         tmplon = xlon[ix:ix+addx]
-        print(' tmplog range ix, ix+addx = ', ix, ix+addx)
         tedlon = np.min( [tmplon[-1], lonout[-1]] )
-        addoutx = int(np.floor((tedlon - lonout[ioutx]) / dx))
-#       print('[INFO] Working on tile from x:%d' %ix)
-#       print('[INFO] Raw longitude range: %.8f to %.8f' %(tmplon[0],tmplon[-1]))
-#       print('[INFO] Number of processed grid cells in x dimension: %d' %addoutx)
-#       print('[INFO] Processed grid longitude range: %.8f to %.8f' 
-#             %(lonout[ioutx],lonout[ioutx+addoutx]))
-        print(" ... Processing ix =",ix,' with step',addoutx,' at ',datetime.now().strftime('%H:%M:%S'))
-
-        iy = offsy
-        iouty = 0        
-        while iy < nlat-1:
-#           print('[INFO] Working on tile from x:%d, y:%d' %(ix,iy))
-            addy = np.min([ntly+1, nlat-iy])
-            tmplat = dh.variables['lat'][iy:iy+addy]
-            tedlat = np.min( [tmplat[-1], latout[-1]] )
-            addouty = int(np.floor((tedlat - latout[iouty]) / dy))
-#           print('[INFO] GEBCO latitude range: %.8f to %.8f' %(tmplat[0],tmplat[-1]))
-#           print('[INFO] Number of processed grid cells in y dimension: %d' %addouty)
-#           print('[INFO] Processed grid latitude range: %.8f to %.8f' 
-#                 %(latout[iouty],latout[iouty+addouty]))
-#           print('[INFO]... read subdomain from file')
-            if( iouty == 0 ):
-                print(' ... Working on tile from x:%d, y:%d with step %d' %(ix,iy, addouty))
-            tmpdep = dh.variables['elevation'  ][iy:iy+addy,ix:ix+addx]
-            tmpobs = dh.variables['obstruction'][iy:iy+addy,ix:ix+addx]
-
-#           print('[INFO]... interpolated to new subdomain')
-            splinedep = interp.RectBivariateSpline(tmplat,tmplon,tmpdep)
-            depout[iouty:iouty+addouty+1,ioutx:ioutx+addoutx+1] = \
-              splinedep(latout[iouty:iouty+addouty+1],lonout[ioutx:ioutx+addoutx+1])
-            splineobs = interp.RectBivariateSpline(tmplat,tmplon,tmpobs)
-            obsout[iouty:iouty+addouty+1,ioutx:ioutx+addoutx+1] = \
-              splineobs(latout[iouty:iouty+addouty+1],lonout[ioutx:ioutx+addoutx+1])
-            iy = iy + addy - 1
-            iouty = iouty + addouty + 1
+        addoutx = int(np.searchsorted(lonout, tedlon, side='right')) - 1 - ioutx
+        ih = max(0, ix-halo)
+        addh = min(nlon, ix+addx+halo) - ih
+        xtiles.append( (ih, addh, xlon[ih:ih+addh], lonout[ioutx:ioutx+addoutx+1], ioutx) )
         ix = ix + addx - 1
         ioutx = ioutx + addoutx + 1
 
-    print (" Interpolation loop finished at ", datetime.now().strftime('%F %H:%M:%S') )
+    ytiles = []
+    iy = offsy
+    iouty = 0        
+    while iy < nlat-1 and iouty < np.size(latout):
+        addy = np.min([ntly+1, nlat-iy])
+        tmplat = ylat[iy:iy+addy]
+        tedlat = np.min( [tmplat[-1], latout[-1]] )
+        addouty = int(np.searchsorted(latout, tedlat, side='right')) - 1 - iouty
+        jh = max(0, iy-halo)
+        addh = min(nlat, iy+addy+halo) - jh
+        ytiles.append( (jh, addh, ylat[jh:jh+addh], latout[iouty:iouty+addouty+1], iouty) )
+        iy = iy + addy - 1
+        iouty = iouty + addouty + 1
+    dh.close()
+    print(' Tile numbers in x and y =', len(xtiles), len(ytiles) )
 
-    # correct spline interpolation limits for obstruction ratio.
-    obsout[obsout < 0.001] = 0.0
-    obsout[obsout > 0.999] = 1.0
+    # write out data to a new netCDF file, chunked as the output tiles.
+    print('[INFO] Writing depth and obstruction data to %s' %outfile)
+    attrs = {'description': ' Grided bathymetry and obstruction ratio. \n'+ 
+                            ' Mean depth values are at cell centre and \n'+ 
+                            ' obstruction ratio is land_area/cell_area.  ',
+             'longitude_increment': dx, 'latitude_increment': dy, 
+             'minimum_depth': depthmin}
+    nbg = createdepthobstrNC(outfile, latout, lonout, attrs, 
+                             chunks=(len(ytiles[0][3]), len(xtiles[0][3])), 
+                             complevel=complevel)
+
+    def puttile(tile):
+        iouty, ioutx, depout, obsout = tile
+        if( depout.size == 0 ): return
+        nbg.variables['elevation'  ][iouty:iouty+depout.shape[0],ioutx:ioutx+depout.shape[1]] = depout
+        nbg.variables['obstruction'][iouty:iouty+obsout.shape[0],ioutx:ioutx+obsout.shape[1]] = obsout
+
+    print (" Interpolaton loop started at ", datetime.now().strftime('%F %H:%M:%S'), 
+           " with nproc =", nproc, "and method", method )
+    tasks = [ xt + yt + (method,) for xt in xtiles for yt in ytiles ]
+    try:
+        tilemap(interpread, interptile, tasks, hiresfile, puttile, nproc=nproc)
+
+##  Output rows and columns beyond the last tile are kept zero.
+        nyout = ytiles[-1][4] + len(ytiles[-1][3])
+        nxout = xtiles[-1][4] + len(xtiles[-1][3])
+        for name in ('elevation', 'obstruction'):
+            if( nyout < np.size(latout) ):
+                nbg.variables[name][nyout:,:] = 0.0
+            if( nxout < np.size(lonout) ):
+                nbg.variables[name][:,nxout:] = 0.0
+    finally:
+        nbg.close()
+    print (" Interpolation loop finished at ", datetime.now().strftime('%F %H:%M:%S') )
 
-    dh.close()
+    if( key is not None ):
+        cacheput(cachedir, key, outfile, maxsize=int(cachesize*2**30))
  
 ##  Remove thin river points and straighten coastlines.  JGLi03Feb2023
 ##  Suspended for global tsunami model grid.   JGLi21Nov2023
 #   print (" Removing isolated river points or straightening coastline ... ")
 #   depout = remove_river(latout, lonout, depout, depmin=0.0)
 
-    # write out data to a new netCDF file
-    outfile = workdir+'Bathy_interpolated_' + datetime.now().strftime('%F_%H%M') + '.nc'
-    writedepthobstrNC(outfile, dx, dy, depthmin, latout, lonout, depout, obsout)
-
     return latout, lonout 
 
 
+def fillruns(nsid, lft0):
+    """ Filled points of a row of sea points with nsid land sides but the left one.
+        A point is filled with 3 land sides or after a run of filled 2-side points 
+        started by a 3-side point or by the land left of the first point if lft0.
+    """
+    kbrk = np.where(nsid != 2, np.arange(nsid.size), -1)
+    kbrk = np.maximum.accumulate(kbrk)
+    return np.where(kbrk >= 0, nsid[np.maximum(kbrk, 0)] >= 3, lft0)
+
 def remove_river(latout, lonout, depout, depmin=0.0):
-    """ Remove thin river heads to straighten coastlines. JGLi03Feb2023 """
+    """ Remove thin river heads to straighten coastlines. JGLi03Feb2023 
+        Each sweep checks the rows in order as the original point loops, with the
+        sea points of a row before its first land point checked at once from the
+        land counts of their shifted neighbours.  Only rows next to the rows
+        changed by the last sweep (the frontier) are checked again.
+    """
 
 ##  Check whether it is a global bathymetry.
     nlon=len(lonout); nlat=len(latout)
@@ -434,43 +878,59 @@ def remove_river(latout, lonout, depout, depmin=0.0):
         globl=False
         istr = 1; iend = nlon-1
 
+##  Rows to be checked, all in the first sweep.
+    todo = np.zeros(nlat, dtype=bool)
+    todo[1:nlat-1] = True
+
 ##  Start removal loop until all isolated cells are removed.
     nloop = 0
     irivr = 10
     while irivr > 0:
         irmvd = 0 
+        chgd = np.zeros(nlat, dtype=bool)
         for jy in range(1,nlat-1,1):
-            for ix in range(istr, iend, 1):
-##  Break if it is a land point or continue for a sea point.
-                if( depout[jy,ix] > depmin ): 
-                    break
-                else:
-                    nij=0
-                    bth=0.0
-                    if( depout[jy-1,ix] > depmin ):
-                        nij += 1
-                        bth = bth + depout[jy-1,ix]
-                    if( depout[jy+1,ix] > depmin ):
-                        nij += 1
-                        bth = bth + depout[jy+1,ix]
-                    if( depout[jy,ix-1] > depmin ):
-                        nij += 1
-                        bth = bth + depout[jy,ix-1]
-                    im = ix + 1
-                    if( im == nlon and globl ): im = 0
-                    if( depout[jy,im] > depmin ):
-                        nij += 1
-                        bth = bth + depout[jy,im]
+            if( not todo[jy] ): continue
+            row = depout[jy]
+
+##  Only sea points before the first land point are checked.
+            land = np.flatnonzero(row[istr:iend] > depmin)
+            nend = istr + land[0] if( land.size > 0 ) else iend
+            if( nend == istr ): continue
+            ix = np.arange(istr, nend)
+            im = ix + 1
+            if( globl ): im[im == nlon] = 0
+
+##  Land sides but the left one, which is land for a point after a filled one.
+            nsid = ( (depout[jy-1,ix] > depmin).astype(int) + 
+                     (depout[jy+1,ix] > depmin) + (row[im] > depmin) )
+            lft0 = row[istr-1] > depmin
+            filld = fillruns(nsid, lft0)
+##  Right side of the last global column is the first column of this sweep.
+            if( globl and nend == nlon and filld[0] ):
+                nsid[-1] += 1
+                filld = fillruns(nsid, lft0)
+            if( not np.any(filld) ): continue
 
 ##  Fill thin river point with average of all side land points bathy.
-                    if( nij >= 3 ):
-                        depout[jy,ix] = bth/float(nij) 
-                        irmvd += 1
+            for i in ix[filld]:
+                nij=0
+                bth=0.0
+                for d in (depout[jy-1,i], depout[jy+1,i], row[i-1], row[im[i-istr]]):
+                    if( d > depmin ):
+                        nij += 1
+                        bth = bth + d
+                row[i] = bth/float(nij) 
+
+            irmvd += int(np.sum(filld))
+            chgd[jy] = True
+            if( jy+1 < nlat-1 ): todo[jy+1] = True
 
-## End of one loop over all sea points, update nloop and irivr.
+## End of one loop over frontier rows, update nloop and irivr.
         nloop += 1
         irivr = irmvd 
         print( " nloop, irivr =", nloop, irivr )
+        todo[:] = False
+        todo[1:nlat-1] = chgd[:-2] | chgd[1:-1] | chgd[2:]
  
 ## Continue while loop if irivr > 0, otherwise return.
     return depout 
@@ -509,7 +969,12 @@ def main():
                           depthmin=cfginfo['depthmin'],
                             cutout=cfginfo['extents'],
                             region=cfginfo['region'],
-                           workdir=cfginfo['workdir'])
+                           workdir=cfginfo['workdir'],
+                           float32=cfginfo.get('float32', False),
+                             nproc=cfginfo.get('nproc', 1),
+                            nlevel=cfginfo.get('nlevel', 1),
+                          cachedir=cfginfo.get('cachedir'),
+                         cachesize=cfginfo.get('cachesize', 20.0))
 
     elif action.lower()[0:6] == 'interp':
 ##  Modified to use new interpdepthobstr function.  JGLi08Nov2022
@@ -518,7 +983,12 @@ def main():
                       dy=cfginfo['dylat'], 
                 depthmin=cfginfo['depthmin'],
                   cutout=cfginfo['extents'],
-                 workdir=cfginfo['workdir'])
+                 workdir=cfginfo['workdir'],
+                   nproc=cfginfo.get('nproc', 1),
+                    halo=cfginfo.get('halo', 8),
+                  method=cfginfo.get('method', 'spline'),
+                cachedir=cfginfo.get('cachedir'),
+               cachesize=cfginfo.get('cachesize', 20.0))
 
 
 ##  End of main program.
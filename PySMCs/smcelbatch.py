@@ -0,0 +1,202 @@
+"""
+## Function smcelbatch to generate cells for a batch of regional SMC
+## grids over the same bathymetry, such as the lakes in Lakes625Cells.
+## The bathy rows are read once and the summed-area tables of each
+## water level/depth threshold are built once for all jobs using it,
+## then each job calls smcellgen with the shared tables.  Jobs could
+## be run in nproc processes with the tables in shared memory.
+##
+## Each job is a dict with the grid name, region box [SW lon, SW lat,
+## NE lon, NE lat], water level, minimum and shallow water depths and
+## number of levels, i.e.
+##   {'GridNm':'Supr6125', 'region':[-93.0, 46.0, -83.5, 49.3],
+##    'wlevel':183.3, 'depmin':183.3, 'dshalw':183.3, 'NLvl':3}
+## Missing depmin is set to wlevel and missing dshalw to depmin.
+##
+## First created:    JGLi18Oct2026
+##
+"""
+
+def smcelbjob(args):
+    """
+    Pool worker to run one smcelbatch job with shared tables.
+    """
+
+    from smcelbatch import smcelbrun
+    from smcellsat import satattach
+
+    job, bsrc, tabdesc, ndzlonlat, x0y0, Wrkdir = args
+
+    shms, arrs = satattach( tabdesc )
+    if( isinstance(bsrc, dict) ):
+        bshm, barr = satattach( bsrc )
+        shms += bshm
+        Bathy = barr['bathy']
+    else:
+        Bathy = bsrc
+
+    try:
+        smcelbrun(Bathy, job, arrs, ndzlonlat, x0y0, Wrkdir)
+    finally:
+        del Bathy, arrs
+        if( isinstance(bsrc, dict) ): del barr
+        for shm in shms: shm.close()
+
+    return job['GridNm']
+
+## End of smcelbjob function.
+
+
+def smcelbrun(Bathy, job, trstabs, ndzlonlat, x0y0, Wrkdir):
+    """
+    Call smcellgen for one job with tables picked by its thresholds.
+    """
+
+    from smcellgen import smcellgen
+
+    sattabs = {'j0': job['j0'], 'j1': job['j1'], 'ipad': job['ipad'],
+               'depmin': job['depmin'], 'dshalw': job['dshalw'],
+               'sea': trstabs[ job['tkey'][0] ],
+               'shw': trstabs[ job['tkey'][1] ] }
+
+    mlvlxy0 = [ job['NLvl'], x0y0[0], x0y0[1] ] + list(job['region'])
+    print( job['GridNm']+" range and water level =", job['region'],
+           job['wlevel'] )
+    smcellgen(Bathy, ndzlonlat, mlvlxy0, FileNm=Wrkdir+job['GridNm'],
+              Global=False, depmin=job['depmin'], dshalw=job['dshalw'],
+              wlevel=job['wlevel'], sattabs=sattabs)
+    print( job['GridNm']+" cells saved in ",
+           Wrkdir+job['GridNm']+'Cels.dat')
+
+    return 0
+
+## End of smcelbrun function.
+
+
+def smcelbatch(Bathy, ndzlonlat, jobs, x0lon=0.0, y0lat=0.0,
+               Wrkdir='./', nproc=1, **kwargs):
+    """
+    Generate SMC cells for a list of regional grid jobs on one bathy.
+    """
+
+    import numpy  as np
+    from datetime import datetime
+    from multiprocessing import Pool
+    from smcelbatch import smcelbrun, smcelbjob
+    from smcellsat import smcelltrs, satshare
+
+## Bathy domain nlon and nlat and first point zlon zlat.
+    nlon = int(ndzlonlat[0])
+    nlat = int(ndzlonlat[1])
+    dlon = ndzlonlat[2]
+    dlat = ndzlonlat[3]
+    zlon = ndzlonlat[4]
+    zlat = ndzlonlat[5]
+
+## Wrapping bathy tables need padding as in smcellgen.
+    NCM = nlon
+    WrapLon = abs( (nlon-1)*dlon + dlon - 360.0 ) < 0.01*dlon
+    if( WrapLon ): NCM = int( round( 360.0/dlon ) )
+
+    prnlat=np.array([60.000000, 75.522486, 82.819245, 86.416678,
+                     88.209213, 89.104712, 89.552370, 89.776188,
+                     89.888094, 89.944047])
+
+## Work out thresholds, bathy rows and padding of each job.
+    bjobs = []
+    for job in jobs:
+        bjob = dict(job)
+        bjob['wlevel'] = job.get('wlevel', 0.0)
+        bjob['depmin'] = max([ job.get('depmin', bjob['wlevel']),
+                               bjob['wlevel'] ])
+        bjob['dshalw'] = job.get('dshalw', bjob['depmin'])
+        if( bjob['dshalw'] >= bjob['depmin'] ):
+            bjob['dshalw'] = bjob['depmin']
+        bjob['tkey'] = ( bjob['depmin'], bjob['dshalw'] )
+
+        MFct = 2**(int(job['NLvl'])-1)
+        ystart = job['region'][1]
+        yend   = job['region'][3]
+        j0 = int( np.floor( (ystart - zlat)/dlat ) ) - 2*MFct
+        j1 = int( np.ceil(  (yend   - zlat)/dlat ) ) + 2*MFct
+        bjob['jrng'] = [ max([0, j0]), min([nlat, j1]) ]
+
+        yrngmax = max([ abs(ystart), abs(yend) ])
+        Merg = 2**int( np.sum( yrngmax > prnlat ) )
+        bjob['ipad'] = 0
+        if( WrapLon ):
+## Regional loop end may go beyond bathy east end by 2 merged blocks.
+            iend = int( np.ceil( (job['region'][2] - zlon)/dlon ) )
+            bjob['ipad'] = max([ MFct*Merg, iend + 3*MFct*Merg - nlon ])
+        bjobs.append( bjob )
+
+## Group jobs with overlapping bathy rows to share one bathy read.
+    order = sorted( range(len(bjobs)), key=lambda k: bjobs[k]['jrng'][0] )
+    groups = []
+    for k in order:
+        if( len(groups) > 0 and bjobs[k]['jrng'][0] < groups[-1]['j1'] ):
+            grp = groups[-1]
+            grp['j1'] = max([ grp['j1'], bjobs[k]['jrng'][1] ])
+            grp['jobs'].append( bjobs[k] )
+        else:
+            groups.append( {'j0': bjobs[k]['jrng'][0],
+                            'j1': bjobs[k]['jrng'][1], 'jobs': [bjobs[k]]} )
+    print(" Batch jobs and bathy row groups =", len(bjobs), len(groups))
+
+    x0y0 = [ x0lon, y0lat ]
+    shms = []
+    args = []
+    try:
+        if( nproc > 1 ):
+            if( isinstance(Bathy, np.ndarray) ):
+                bshm, bsrc = satshare( {'bathy': np.asarray(Bathy)} )
+                shms += bshm
+            else:
+                bsrc = Bathy
+
+        for grp in groups:
+            ipad = max([ bjob['ipad'] for bjob in grp['jobs'] ])
+            thrs = []
+            for bjob in grp['jobs']:
+                thrs += list( bjob['tkey'] )
+                bjob['j0'] = grp['j0']
+                bjob['j1'] = grp['j1']
+                bjob['ipad'] = ipad
+
+## One bathy read and one table per threshold for all group jobs.
+            print(" Building tables for rows and thresholds", grp['j0'],
+                    grp['j1'], sorted(set(thrs)), " at ",
+                    datetime.now().strftime('%F %H:%M:%S'))
+            trstabs = smcelltrs(Bathy, thrs, jrange=[grp['j0'], grp['j1']],
+                                ipad=ipad, NCM=NCM)
+
+            if( nproc > 1 ):
+                tshm, tabdesc = satshare( trstabs )
+                shms += tshm
+                del trstabs
+                for bjob in grp['jobs']:
+                    args.append( (bjob, bsrc, tabdesc, ndzlonlat, x0y0,
+                                  Wrkdir) )
+            else:
+                for bjob in grp['jobs']:
+                    smcelbrun(Bathy, bjob, trstabs, ndzlonlat, x0y0, Wrkdir)
+                del trstabs
+
+        if( nproc > 1 ):
+            with Pool(processes=nproc) as pool:
+                done = pool.map(smcelbjob, args)
+            print(" Batch jobs done:", done)
+    finally:
+        for shm in shms:
+            shm.close()
+            shm.unlink()
+
+    print(" smcelbatch finished at",
+          datetime.now().strftime('%F %H:%M:%S') )
+
+    return 0
+
+## End of smcelbatch function.
+
+## End of smcelbatch.py program.
+
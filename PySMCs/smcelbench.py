@@ -0,0 +1,273 @@
+"""
+## Benchmark of the SMC cell generators on synthetic bathymetries.
+##
+## Function synbathy builds a global bathymetry with fractal coasts,
+## inland lakes below sea level and land (Antarctica) and ocean (Arctic)
+## polar caps at a given resolution, so no bathy file is needed.  The
+## benchmark runs smcellgen, smcellbdy, smcellSWE and smcellful on it
+## at several resolutions and records the wall time, cells per second
+## and peak resident memory of each case, and the wall time of each
+## latitude zone of the global smcellgen case.  Each case runs in its
+## own process so the peak memory is that of the case only.
+##
+## The cell arrays of each case are compared with reference arrays
+## stored by an earlier run with save, so any speed-up could be checked
+## for identical cells.  Results are saved as a JSON file.
+##
+## Usage:  python smcelbench.py [low,mid,high] [refdir] [save]
+##
+## First created:    JGLi18Oct2026
+##
+"""
+
+## Resolutions as bathy nlon and nlat.
+RESOLS = {'low': (1024, 768), 'mid': (2048, 1536), 'high': (4096, 3072)}
+
+## Benchmark cases.
+CASES = ['gen_glob', 'gen_regn', 'bdy_regn', 'swe', 'ful']
+
+
+def synbathy(nlon, nlat, seed=0):
+    """
+    Synthetic global bathymetry (elevation in m) at nlon x nlat points
+    and its ndzlonlat list for smcellgen and smcellbdy.
+    """
+    import numpy  as np
+
+    rng = np.random.default_rng(seed)
+    dlon = 360.0/nlon
+    dlat = 180.0/nlat
+    xlon = np.arange(nlon)*dlon - 180.0 + 0.5*dlon
+    ylat = np.arange(nlat)*dlat - 90.0 + 0.5*dlat
+
+## Fractal field from power-law spectrum noise, wrapping in longitude.
+    kk = np.sqrt( np.fft.fftfreq(nlat)[:,None]**2*(nlon/nlat)**2 +
+                  np.fft.fftfreq(nlon)[None,:]**2 )
+    kk[0,0] = 1.0
+    spec = ( rng.normal(size=(nlat,nlon)) +
+          1j*rng.normal(size=(nlat,nlon)) )*kk**(-1.6)
+    spec[0,0] = 0.0
+    frac = np.real( np.fft.ifft2(spec) )
+    frac = (frac - frac.mean())/frac.std()
+
+## About 30% land with ragged coasts, deep ocean and shelf seas.
+    Bathy = np.where( frac > 0.5, 1200.0*(frac - 0.5) + 5.0,
+                      -4000.0*np.tanh( 0.8*(0.5 - frac) ) - 20.0 )
+
+## Inland lakes below sea level as isolated sea areas.
+    yy, xx = np.meshgrid(ylat, xlon, indexing='ij')
+    land = np.argwhere( (frac > 1.2) & (np.abs(yy) < 60.0) )
+    nlak = min([ 12, land.shape[0] ])
+    for jl, il in land[ rng.choice(land.shape[0], nlak, replace=False) ]:
+        rlak = rng.uniform(0.5, 3.0)
+        dist = np.hypot( (xx - xlon[il])*np.cos(np.radians(ylat[jl])),
+                          yy - ylat[jl] )
+        Bathy[dist < rlak] = -30.0 - 100.0*rng.random()
+
+## Antarctic land cap and Arctic ocean cap with a few islands.
+    Bathy[ ylat < -72.0, : ] = np.maximum( 500.0,
+                               Bathy[ ylat < -72.0, : ] )
+    arct = ylat > 80.0
+    Bathy[ arct, : ] = np.where( frac[arct,:] > 1.5, 50.0,
+                                 np.minimum(-1000.0, Bathy[arct,:]) )
+
+    ndzlonlat = [ nlon, nlat, dlon, dlat, xlon[0], ylat[0] ]
+
+    return Bathy, ndzlonlat
+
+## End of synbathy function.
+
+
+def benchzones(Bathy, ndzlonlat, FileNm):
+    """
+    Wall time and cell number of smcellgen on regional latitude zones
+    between the size-changing parallels of the global case.
+    """
+    import time
+    import numpy  as np
+    from smcellgen import smcellgen
+
+    nlon, nlat, dlon, dlat, zlon, zlat = ndzlonlat
+    xlon = np.arange(nlon)*dlon + zlon
+    ylat = np.arange(nlat)*dlat + zlat
+    prnlat = [-82.819245, -75.522486, -60.0, 60.0, 75.522486, 82.819245]
+    edges = ( [ylat[32]] + [y for y in prnlat if ylat[32] < y < ylat[-32]]
+              + [ylat[-32]] )
+
+    zones = []
+    for y0, y1 in zip(edges[:-1], edges[1:]):
+        mlvlxy0 = [4, 0.0, 0.0, xlon[0], y0, xlon[-1], y1]
+        wall = time.time()
+        smcellgen(Bathy, ndzlonlat, mlvlxy0, FileNm=FileNm, Global=False,
+                  dshalw=-100.0)
+        wall = time.time() - wall
+        with open(FileNm+'Cels.dat', 'r') as flhdl:
+            ncel = int( flhdl.readline().split()[0] )
+        zones.append( {'lat': [round(y0, 4), round(y1, 4)],
+                       'wall': wall, 'cells': ncel} )
+
+    return zones
+
+## End of benchzones function.
+
+
+def benchcase(args):
+    """
+    Run one benchmark case in a worker process and compare its cells
+    with the reference arrays, or save them as the reference.
+    """
+    import os
+    import io
+    import time
+    import resource
+    import contextlib
+    import numpy  as np
+    from smcelbench import synbathy, benchzones
+    from smcellgen import smcellgen
+    from smcellbdy import smcellbdy
+    from smcellSWE import smcellSWE
+    from smcellful import smcellful
+
+    resol, case, Wrkdir, refdir, save = args
+    nlon, nlat = RESOLS[resol]
+    FileNm = os.path.join(Wrkdir, resol+'_'+case)
+    Bathy, ndzlonlat = synbathy(nlon, nlat)
+    zdlonlat = [0.0, 0.0, 360.0/nlon, 180.0/nlat]
+    region = [-40.0, 10.0, 30.0, 55.0]
+
+## Generator output is kept out of the benchmark log.
+    log = io.StringIO()
+    zones = []
+    wall = time.time()
+    with contextlib.redirect_stdout(log):
+        if( case == 'gen_glob' ):
+            smcellgen(Bathy, ndzlonlat, [4, 0.0, 0.0], FileNm=FileNm,
+                      Global=True, Arctic=True, dshalw=-100.0)
+            celfls = ['Cels.dat', 'BArc.dat']
+        elif( case == 'gen_regn' ):
+            smcellgen(Bathy, ndzlonlat, [3, 0.0, 0.0]+region,
+                      FileNm=FileNm, Global=False, depmin=5.0)
+            celfls = ['Cels.dat']
+        elif( case == 'bdy_regn' ):
+            smcellbdy(Bathy, ndzlonlat, [3, 0.0, 0.0]+region,
+                      FileNm=FileNm, Global=False, depmin=5.0)
+            celfls = ['Bdys.dat']
+        elif( case == 'swe' ):
+            smcellSWE(zdlonlat, [3, 100], FileNm=FileNm, ArcLat=77.0)
+            celfls = ['Cels.dat', 'BArc.dat']
+        elif( case == 'ful' ):
+            smcellful(zdlonlat, [1, 10], FileNm=FileNm)
+            celfls = ['Cels.dat']
+        wall = time.time() - wall
+        if( case == 'gen_glob' ):
+            zones = benchzones(Bathy, ndzlonlat, FileNm+'_zone')
+
+## Peak resident memory of this process in MB (ru_maxrss in kB).
+    rssmb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss/1024.0
+
+    cels = {}
+    ncel = 0
+    for celfl in celfls:
+        with open(FileNm+celfl, 'r') as flhdl:
+            hdr = flhdl.readline().strip()
+        cel = np.loadtxt(FileNm+celfl, dtype=int, skiprows=1, ndmin=2)
+        cels[celfl] = (hdr, cel)
+        ncel += cel.shape[0]
+
+## Compare with or save the reference cell arrays.
+    reffl = os.path.join(refdir, resol+'_'+case+'.npz')
+    if( save ):
+        refs = {}
+        for celfl, (hdr, cel) in cels.items():
+            refs[celfl] = cel
+            refs[celfl+'_hdr'] = np.array(hdr)
+        np.savez_compressed(reffl, **refs)
+        check = 'saved'
+    elif( os.path.exists(reffl) ):
+        refs = np.load(reffl)
+        check = 'identical'
+        for celfl, (hdr, cel) in cels.items():
+            if( celfl not in refs or str(refs[celfl+'_hdr']) != hdr ):
+                check = 'differ'
+            elif( refs[celfl].shape != cel.shape ):
+                check = 'differ'
+            elif( np.any( refs[celfl] != cel ) ):
+                check = 'differ'
+    else:
+        check = 'no reference'
+
+    return {'resol': resol, 'case': case, 'nlon': nlon, 'nlat': nlat,
+            'wall': wall, 'cells': ncel, 'cells_per_sec': ncel/wall,
+            'peak_rss_mb': rssmb, 'zones': zones, 'check': check}
+
+## End of benchcase function.
+
+
+def smcelbench(resols=['low'], refdir='./benchref/', save=False,
+               Wrkdir='./benchwrk/', JsonFl=None, cases=CASES):
+    """
+    Run all benchmark cases for the given resolutions.  Return a list
+    of case results, which are also saved in JsonFl if given.
+    """
+    import os
+    import json
+    from datetime import datetime
+    from multiprocessing import Pool
+    from smcelbench import benchcase
+
+    os.makedirs(Wrkdir, exist_ok=True)
+    os.makedirs(refdir, exist_ok=True)
+
+    results = []
+    for resol in resols:
+        for case in cases:
+            print(" Benchmark", resol, case, "started at",
+                  datetime.now().strftime('%F %H:%M:%S'))
+## A new process for each case to get its own peak memory.
+            with Pool(processes=1, maxtasksperchild=1) as pool:
+                res = pool.apply(benchcase,
+                                 ((resol, case, Wrkdir, refdir, save),))
+            print(" {:5s} {:9s} wall {:8.2f} s, cells {:8d}, "
+                  "cells/s {:10.0f}, peak RSS {:8.1f} MB, {:s}".format(
+                  resol, case, res['wall'], res['cells'],
+                  res['cells_per_sec'], res['peak_rss_mb'], res['check']))
+            for zone in res['zones']:
+                print("       zone {:9.4f} {:9.4f} wall {:8.2f} s, "
+                      "cells {:8d}".format(zone['lat'][0], zone['lat'][1],
+                      zone['wall'], zone['cells']))
+            results.append( res )
+
+    if( JsonFl is not None ):
+        with open(JsonFl, 'w') as flhdl:
+            json.dump({'date': datetime.now().strftime('%F %H:%M:%S'),
+                       'results': results}, flhdl, indent=1)
+        print(" Benchmark results saved in "+JsonFl)
+
+    return results
+
+## End of smcelbench function.
+
+
+def main():
+
+    import sys
+
+    Wrkdir = '../tmpfls/benchwrk/'
+    refdir = '../tmpfls/benchref/'
+    resols = ['low']
+    save = False
+
+    nagv = len(sys.argv)
+    if( nagv > 1 ): resols = sys.argv[1].split(',')
+    if( nagv > 2 ): refdir = sys.argv[2]
+    if( nagv > 3 ): save = sys.argv[3] == 'save'
+
+    smcelbench(resols=resols, refdir=refdir, save=save, Wrkdir=Wrkdir,
+               JsonFl=Wrkdir+'SMCelBench.json')
+
+## End of main program.
+
+if __name__ == '__main__':
+    main()
+
+## End of smcelbench.py program.
@@ -0,0 +1,159 @@
+"""
+## Bit-packed sea/land masks of bathymetry for SMC cell generation.
+##
+## A mask of bathy points below a threshold (i.e. sea points for
+## depmin) is stored with np.packbits as one bit per point, 8 times
+## smaller than a bool array and 64 times smaller than float64 bathy,
+## so the masks of a 15 arc-second global bathy (86400 x 43200) take
+## about 450 MB each.  Masks are built by smcelbits from an array or
+## a lazy readbathy source a few rows at a time, so the full float
+## bathy is never held in memory.
+##
+## Window counts come from popcounts of the packed bytes.  Function
+## bitcount gives the set bit number in windows of a constant height,
+## and satbits unpacks mask rows into the summed-area tables used by
+## smcellgen, in place of the float bathy rows of smcellsat.
+##
+## Packed rows are big-endian as np.packbits, i.e. bathy column i is
+## bit 7 - i%8 of byte i//8, with zero bits after the last column.
+##
+## First created:    JGLi18Oct2026
+##
+"""
+
+import numpy as np
+
+## Bit number of each byte value and the masks of its leading k bits.
+POPCNT = np.unpackbits( np.arange(256, dtype=np.uint8)[:,None],
+                        axis=1 ).sum(axis=1).astype(np.int32)
+LEADS  = np.array([ (0xFF << (8-k)) & 0xFF for k in range(8) ],
+                  dtype=np.uint8)
+
+
+def smcelbits(Bathy, thresholds, jrange=None, nrow=256):
+    """
+    Bit-packed masks (bathy < threshold) for a list of thresholds,
+    built from bathy rows in jrange read nrow rows at a time.
+    Return a dict with the row range, nlon, nlat and masks by threshold.
+    """
+    import numpy as np
+
+    nlat, nlon = Bathy.shape[0], Bathy.shape[1]
+    if( jrange is None ):
+        jrange = [0, nlat]
+    j0 = max([0, int(jrange[0])])
+    j1 = min([nlat, int(jrange[1])])
+    nbyt = (nlon + 7)//8
+
+    bits = {'j0': j0, 'j1': j1, 'nlon': nlon, 'nlat': nlat, 'masks': {}}
+    thrs = []
+    for thr in thresholds:
+        if( thr not in thrs ): thrs.append( thr )
+    for thr in thrs:
+        bits['masks'][thr] = np.zeros((j1-j0, nbyt), dtype=np.uint8)
+
+## Bathy may be a masked array or float32, so convert to float64 as
+## smcellsat does before any threshold comparison.
+    for jr in range(j0, j1, nrow):
+        jn = min([j1, jr+nrow])
+        bsub = np.asarray(Bathy[jr:jn,:], dtype=float)
+        for thr in thrs:
+            bits['masks'][thr][jr-j0:jn-j0] = np.packbits(bsub < thr,
+                                                          axis=1)
+
+    return bits
+
+## End of smcelbits function.
+
+
+def bitrows(bits, thr, j0, j1, ipad=0, NCM=0):
+    """
+    Unpack mask rows j0:j1 (bathy indexes) of threshold thr as a bool
+    array, with ipad wrapping columns padded on both sides.
+    """
+    import numpy as np
+
+    nlon = bits['nlon']
+## Rows beyond the bathy end are dropped as bathy row slicing does.
+    if( j0 < bits['j0'] or min([j1, bits['nlat']]) > bits['j1'] ):
+        raise ValueError(" Rows %d:%d out of mask rows %d:%d" %
+                         (j0, j1, bits['j0'], bits['j1']))
+    jb0 = j0 - bits['j0']
+    jb1 = max([jb0, j1 - bits['j0']])
+    msub = np.unpackbits(bits['masks'][thr][jb0:jb1], axis=1,
+                         count=nlon).view(bool)
+
+    if( ipad > 0 ):
+        if( NCM <= 0 ): NCM = nlon
+        icol = (np.arange(-ipad, nlon+ipad) + NCM) % NCM
+        msub = msub[:,icol]
+
+    return msub
+
+## End of bitrows function.
+
+
+def satbits(bits, depmin=0.0, dshalw=0.0, jrange=None, ipad=0,
+            NCM=0, **kwargs):
+    """
+    Build sea (< depmin) and deep (< dshalw) point count tables for
+    rows in jrange from bit-packed masks, same as smcellsat tables.
+    """
+    from smcellsat import satable
+    from smcelbits import bitrows
+
+    if( jrange is None ):
+        jrange = [bits['j0'], bits['j1']]
+    j0, j1 = int(jrange[0]), int(jrange[1])
+
+    tabs = {'j0': j0, 'j1': j1, 'ipad': ipad,
+            'depmin': depmin, 'dshalw': dshalw }
+    tabs['sea'] = satable( bitrows(bits, depmin, j0, j1, ipad, NCM) )
+    if( dshalw == depmin ):
+        tabs['shw'] = tabs['sea']
+    else:
+        tabs['shw'] = satable( bitrows(bits, dshalw, j0, j1, ipad, NCM) )
+
+    return tabs
+
+## End of satbits function.
+
+
+def bitcount(packed, j0, j1, i0, i1):
+    """
+    Set bit numbers of packed mask rows in windows j0:j1, i0:i1 of a
+    constant height j1-j0.  Window ends could be broadcastable integer
+    arrays, counted with running byte popcounts along each row.
+    """
+    import numpy as np
+
+    j0 = np.asarray(j0)
+    i0 = np.asarray(i0)
+    i1 = np.asarray(i1)
+    hgt = np.unique( np.asarray(j1) - j0 )
+    if( hgt.size != 1 ):
+        raise ValueError(" bitcount windows must have the same height.")
+
+## Running bit number before each byte, with one zero byte appended
+## so that a window could end at the last bathy column.
+    nrow, nbyt = packed.shape
+    pbyt = np.zeros((nrow, nbyt+1), dtype=np.uint8)
+    pbyt[:,:nbyt] = packed
+    rank = np.zeros((nrow, nbyt+2), dtype=np.int64)
+    np.cumsum(POPCNT[pbyt], axis=1, out=rank[:,1:])
+
+## Bit number before column i is the running number before its byte
+## plus the leading bits of its own byte.
+    def before(jr, ic):
+        return ( rank[jr, ic//8] +
+                 POPCNT[ pbyt[jr, ic//8] & LEADS[ic % 8] ] )
+
+    nset = 0
+    for k in range(int(hgt[0])):
+        nset = nset + before(j0+k, i1) - before(j0+k, i0)
+
+    return nset
+
+## End of bitcount function.
+
+## End of smcelbits.py program.
@@ -0,0 +1,303 @@
+"""
+## Fast estimate of SMC grid cell and face numbers from a bathymetry.
+##
+## Function smcelcount uses the same row bands, summed-area tables and
+## pooled sea mask pyramid as smcellgen but skips the cell mean depths,
+## sorting and saving, so the cell number of each level is found in a
+## fraction of the smcellgen time.  Each accepted cell is painted into
+## a cell index raster of the row band, from which the U (i) and V (j)
+## faces are counted as runs of different cell pairs along the column
+## and row lines, one face for each neighbouring cell pair or each
+## contiguous land segment along a cell side as SMCGSideMP does.
+##
+## With sample = k > 1 only every k-th row band (and the band below it
+## for the faces between bands) is checked and the numbers are scaled
+## by the band ratio, for a rough estimate in seconds on a large bathy.
+## The numbers are rounded up with a margin to size the NCL and NFC
+## parameters of PropInput.txt and SideMPInput.txt.  Arctic boundary
+## cells duplicated in the two cell files and the polar cell faces are
+## not counted, so the face numbers are a close estimate only.
+##
+##   est = smcelcount(Bathy, ndzlonlat, [4, 0.0, 0.0], Arctic=True)
+##   print( est['NCL'], est['NFC'] )
+##
+## Usage:  python smcelcount.py bathy.nc [NLvl] [depmin] [dshalw] [sample]
+##
+## First created:    JGLi18Oct2026
+##
+"""
+
+def facruns(sidA, sidB, wrap=False):
+    """
+    Number of faces along a line between cell index rows sidA and sidB
+    (-1 for land), counted as runs of the same cell pair with at least
+    one sea cell on either side.  Runs joined across a wrapping line
+    end are counted once.  Rows are counted along their last axis.
+    """
+    import numpy  as np
+
+    face = (sidA != sidB) & ( (sidA >= 0) | (sidB >= 0) )
+    news = face.copy()
+    news[...,1:] &= ( ~face[...,:-1] | (sidA[...,1:] != sidA[...,:-1]) |
+                      (sidB[...,1:] != sidB[...,:-1]) )
+    nface = int( np.sum(news) )
+
+    if( wrap ):
+        join = ( face[...,0] & face[...,-1] &
+                 (sidA[...,0] == sidA[...,-1]) &
+                 (sidB[...,0] == sidB[...,-1]) )
+        nface -= int( np.sum(join) )
+
+    return nface
+
+## End of facruns function.
+
+
+def smcelcids(tabs, j, ism, prm, ncid=0, lmask=None):
+    """
+    Cell numbers of each level and the cell index raster of the MFct-row
+    band at row j, checked as smcelrow but without cell depths.  Cell
+    indexes start from ncid so they differ from those of other bands.
+    """
+    import numpy  as np
+    from smcellsat import satsums
+    from smcellpyr import smcelpyr
+    from smcelrefn import refnrows, refnpyr, refnok
+
+    NLvl   = prm['NLvl']
+    MFct   = 2**(NLvl-1)
+    iFct   = ism*MFct
+    jpr1   = prm['jpr1']
+
+    iblk = np.arange(prm['istart'], prm['iend'], iFct)
+    Ns = np.zeros( (NLvl+1), dtype=int )
+    nshalw = 0
+    cids = np.full( (MFct, iblk.size*iFct), -1, dtype=np.int64 )
+
+    nleft = satsums(tabs, 'sea', j, j+MFct, iblk, iblk+iFct)
+    nsubdep = satsums(tabs, 'shw', j, j+MFct, iblk, iblk+iFct)
+    if( not np.any(nleft > 0) ):
+        return Ns, nshalw, cids
+
+    NCM = prm['NCM'] if( prm['WrapLon'] ) else 0
+    pyr = smcelpyr(None, tabs, j, ism, iblk, NLvl, NCM=NCM)
+    rpyr = None
+    if( lmask is not None ):
+        rpyr = refnpyr( refnrows(lmask, j, iblk, iFct, MFct, NCM=NCM),
+                        ism, NLvl )
+
+## Same level loop as smcelrow, with cells painted into the raster
+## in place of the taken mask.
+    for levl in range(NLvl, 0, -1):
+        active = nleft > 0
+        if( not np.any(active) ):
+            break
+        if( levl > prm['NLvshlw'] ):
+            skip = active & (nsubdep == 0)
+            nshalw += int( np.sum(skip) )
+            active = active & ~skip
+            if( not np.any(active) ):
+                continue
+
+        jchk = 2**(levl - 1)
+        irng = jchk*ism
+        jbs = np.arange(0, MFct, jchk)
+        if( levl == 1 ):
+            jbs = jbs[ (jpr1[0] <= j+jbs) & (j+jbs < jpr1[1]) ]
+            if( jbs.size == 0 ): continue
+        kblk = np.nonzero(active)[0]
+        ibs = ( kblk[:,None]*iFct + np.arange(0, iFct, irng)[None,:]
+              ).ravel()
+        jb = np.repeat(jbs, ibs.size)
+        ib = np.tile(ibs, jbs.size)
+
+        if( rpyr is None ):
+            ok = pyr[levl]['hsea'][jb//jchk, ib//irng]
+        else:
+            ok = refnok(pyr[levl], rpyr[levl], jb, ib)[0]
+        ok &= cids[jb, ib] < 0
+        if( not np.any(ok) ): continue
+        jb = jb[ok]
+        ib = ib[ok]
+        ncel = jb.size
+
+        jm = jb[:,None,None] + np.arange(jchk)[None,:,None]
+        im = ib[:,None,None] + np.arange(irng)[None,None,:]
+        cids[jm, im] = ( ncid + np.arange(ncel) )[:,None,None]
+        ncid += ncel
+        nleft -= np.bincount(ib//iFct, minlength=iblk.size, weights=
+                 pyr[levl]['nsea'][jb//jchk, ib//irng]).astype(int)
+        Ns[levl] += ncel
+
+    return Ns, nshalw, cids
+
+## End of smcelcids function.
+
+
+def smcelcount(Bathy, ndzlonlat, mlvlxy0, Global=True, Arctic=False,
+        depmin=0.0, dshalw=0.0, wlevel=0.0, GlbArcLat=84.4, sample=1,
+        margin=0.05, bits=None, refine=None, **kwargs):
+    """
+    Estimate SMC grid cell numbers of each level and U/V face numbers
+    for the smcellgen parameters, checking every sample-th row band.
+    Bit-packed smcelbits masks could be given as bits in place of
+    tables built from Bathy.  Refinement polygons or level mask refine
+    set cell levels as in smcellgen.  Return a dict of the numbers
+    and the NCL and NFC sizes rounded up with the margin fraction.
+    """
+
+    import time
+    import numpy  as np
+    from datetime import datetime
+    from smcellgen import smcelsetup
+    from smcelcount import smcelcids, facruns
+    from smcellsat import smcellsat
+    from smcelbits import satbits
+
+    wall = time.perf_counter()
+    grid = smcelsetup(ndzlonlat, mlvlxy0, Global=Global, Arctic=Arctic,
+                      depmin=depmin, dshalw=dshalw, wlevel=wlevel,
+                      GlbArcLat=GlbArcLat)
+    NLvl, MFct = grid['NLvl'], grid['MFct']
+    prm = dict( grid['prm'] )
+    bands = grid['bands']
+    nband = len(bands)
+
+## Global grid rows wrap at the 360 deg meridian.
+    wrap = Global and prm['WrapLon']
+
+    lmask = refine
+    if( refine is not None and not isinstance(refine, np.ndarray) ):
+        from smcelrefn import refnmask
+        lmask = refnmask(refine, ndzlonlat, NLvl)
+
+## Sampled bands and the bands below them for faces between bands.
+    sample = max([1, int(sample)])
+    kbnds = list( range(0, nband, sample) )
+    if( sample > 1 and nband > 1 and kbnds[-1] != nband-1 ):
+        kbnds.append( nband-1 )
+
+    Ns = np.zeros( (NLvl+1), dtype=int )
+    nshalw = 0
+    NU = 0
+    NV = 0
+    prvtop = None
+    kprv = -2
+    ncid = 0
+    print(" Counting cells and faces on", len(kbnds), "of", nband,
+          "row bands at", datetime.now().strftime('%H:%M:%S'))
+
+    for k in kbnds:
+        klst = [k] if( k == kprv+1 or k == 0 ) else [k-1, k]
+        j0 = bands[klst[0]][0] - MFct
+        j1 = bands[k][0] + MFct*2
+        if( bits is not None ):
+            tabs = satbits(bits, depmin=prm['depmin'], dshalw=prm['dshalw'],
+                           jrange=[j0, j1], ipad=prm['ipad'], NCM=prm['NCM'])
+        else:
+            tabs = smcellsat(Bathy, depmin=prm['depmin'],
+                             dshalw=prm['dshalw'], jrange=[j0, j1],
+                             ipad=prm['ipad'], NCM=prm['NCM'])
+
+        for kb in klst:
+            j, ism, jpr0, jprn = bands[kb]
+            prm['jpr1'] = [jpr0, jprn]
+            bNs, bshw, cids = smcelcids(tabs, j, ism, prm, ncid, lmask)
+            ncid += int( np.sum(bNs) )
+            if( kb < k ):
+                prvtop = cids[-1]
+                continue
+
+## U faces on the column lines, with land beyond regional edges.
+            land = np.full( (MFct, 1), -1, dtype=cids.dtype )
+            if( wrap ):
+                cext = np.hstack( [cids, cids[:,:1]] )
+            else:
+                cext = np.hstack( [land, cids, land] )
+            NU += facruns(cext[:,:-1].T, cext[:,1:].T)
+
+## V faces on the row lines within the band and below the band.
+            if( prvtop is None ):
+                prvtop = np.full( cids.shape[1], -1, dtype=cids.dtype )
+            rows = np.vstack( [prvtop[None,:], cids] )
+            NV += facruns(rows[:-1], rows[1:], wrap=wrap)
+            if( kb == nband-1 ):
+                NV += facruns(cids[-1], np.full_like(cids[-1], -1),
+                              wrap=wrap)
+            prvtop = cids[-1]
+            Ns += bNs
+            nshalw += bshw
+        kprv = k
+
+## Scale sampled band numbers to all bands.
+    scale = nband/float( max([1, len(kbnds)]) )
+    Ns = np.rint( Ns*scale ).astype(int)
+    NU = int( round(NU*scale) )
+    NV = int( round(NV*scale) )
+    nshalw = int( round(nshalw*scale) )
+
+## Global grid with Arctic part has one more polar cell.
+    if( Global and Arctic ): Ns[NLvl] += 1
+    Ns[0] = np.sum( Ns[1:] )
+
+    def roundup(n):
+        return int( np.ceil( n*(1.0 + margin)/1000.0 )*1000 )
+
+    est = {'Ns': Ns.tolist(), 'NU': NU, 'NV': NV, 'nshalw': nshalw,
+           'bands': nband, 'sampled': len(kbnds),
+           'NCL': roundup( Ns[0] ), 'NFC': roundup( max([NU, NV]) ),
+           'MRL': NLvl, 'wall': time.perf_counter() - wall }
+
+    print(" Estimated Ns =", est['Ns'])
+    print(" Estimated NU, NV =", NU, NV)
+    print(f" {est['NCL']:7d} {est['NFC']:7d} {NLvl:3d}"
+          "     # NCL,  NFC,  MRL")
+    print(" smcelcount finished in", round(est['wall'], 2), "s")
+
+    return est
+
+## End of smcelcount function.
+
+
+def main():
+
+    import sys
+    import netCDF4 as nc
+    from smcelcount import smcelcount
+
+    bathyf='../Bathys/Bathy088_059deg.nc'
+    NLvl = 4
+    depmin = 0.0
+    dshalw = 0.0
+    sample = 1
+
+    nagv = len(sys.argv)
+    if( nagv > 1 ): bathyf = sys.argv[1]
+    if( nagv > 2 ): NLvl = int(sys.argv[2])
+    if( nagv > 3 ): depmin = float(sys.argv[3])
+    if( nagv > 4 ): dshalw = float(sys.argv[4])
+    if( nagv > 5 ): sample = int(sys.argv[5])
+
+## Reduced bathy dimensions and first point as smcellgen main.
+    datas = nc.Dataset(bathyf)
+    nlat = datas.dimensions['lat'].size
+    nlon = datas.dimensions['lon'].size
+    dlat = 180.0 / float(nlat)
+    dlon = 360.0 / float(nlon)
+    xlon = datas.variables['lon'][:]
+    ylat = datas.variables['lat'][:]
+    Bathy= datas.variables['elevation'][:,:]
+    datas.close()
+
+    ndzlonlat=[ nlon, nlat, dlon, dlat, xlon[0], ylat[0] ]
+    mlvlxy0 = [ NLvl, 0.0, 0.0 ]
+
+    smcelcount(Bathy, ndzlonlat, mlvlxy0, Global=True, Arctic=True,
+               depmin=depmin, dshalw=dshalw, sample=sample)
+
+## End of main program.
+
+if __name__ == '__main__':
+    main()
+
+## End of smcelcount.py program.
@@ -2,17 +2,99 @@
 ## Function smcellSWE to generate a global SMC grid for SWEs model. 
 ## The main() function uses the SMC1R3 grid as an example.
 ##
+## Cells are built zone by zone with numpy broadcasting as the full grid
+## is determined by the size-changing parallels only.  Set Save=False
+## to skip the cell files and use the returned SMCCells object.
+## JGLi18Oct2026
+##
+## Refined areas are given as smcelrefn refinement polygons (or a level
+## mask) on the northern hemisphere size-1 grid and rasterised once by
+## refnmask.  Blocks holding finer mask levels are split into 4 cells
+## of the next level until each cell meets its mask level.  The SMC1R3
+## refined and relaxation boxes are used by default, as a mask from
+## smc1r3refn refining blocks by their first points in each zone.
+## JGLi18Oct2026
+##
 ##  First created:        JGLi06Oct2021
-##  Last modified:        JGLi12May2025
+##  Last modified:        JGLi18Oct2026
 ##
 """
 
+def smczones(jrows, jprasn, Merg):
+    """
+    Group rows into latitude zones of the same x-size merging factor.
+    Return a list of (zone rows, ism) in row order.
+    """
+    import numpy  as np
+
+## Row j in zone jprset if jprasn[jprset-1] <= j < jprasn[jprset], 
+## or zone 0 for rows below the first size-changing parallel.
+    jprset = np.searchsorted(jprasn, jrows, side='right')
+    ism = np.minimum( 2**jprset, Merg )
+
+    zones = []
+    if( jrows.size == 0 ): return zones
+    kz = np.nonzero( np.diff(ism) )[0] + 1
+    for jz in np.split( np.arange(jrows.size), kz ):
+        zones.append( (jrows[jz], int(ism[jz[0]])) )
+
+    return zones
+
+## End of smczones function.
+
+
+def smc1r3refn(nlon, nla2, zones, NLvel):
+    """
+    SMC1R3 refinement level mask of (nla2, nlon) size-1 rows, with 
+    NLvel-2 cells from 15N to 50N and roughly 14E to 84E, in a relaxation
+    zone of 8 size-1 cells of NLvel-1 cells.  Blocks and their 4 
+    sub-blocks are refined by their first points, with the block sizes
+    of each latitude zone in zones.  Return None for NLvel < 3.
+    """
+    import numpy  as np
+
+    if( NLvel < 3 ): return None
+    MFct = 2**(NLvel-1)
+
+## Box i, j ranges of the relaxation zone and of the refined area.
+    ijsn = [40, 60, 240, 200] 
+    ijs1 = [48, 68, 232, 192] 
+
+## Block and sub-block first rows and columns of each size-1 point.
+    lmask = np.full( (nla2, nlon), NLvel, dtype=np.int8 )
+    icol = np.arange(nlon)
+    for jz, ism in zones:
+        iFct = ism*MFct
+        jrow = np.arange(jz[0], jz[-1]+MFct)
+        jb = jrow - jrow % MFct
+        js = jrow - jrow % (MFct//2)
+        ib = icol - icol % iFct
+        isb = icol - icol % (iFct//2)
+        inbk = ( ((ijsn[1] <= jb) & (jb < ijsn[3]))[:,None] & 
+                 ((ijsn[0] <= ib) & (ib < ijsn[2]))[None,:] )
+        insb = ( ((ijs1[1] <= js) & (js < ijs1[3]))[:,None] & 
+                 ((ijs1[0] <= isb) & (isb < ijs1[2]))[None,:] )
+        lmask[jrow] -= inbk*( 1 + insb )
+
+    return lmask
+
+## End of smc1r3refn function.
+
+
 def smcellSWE(zdlonlat, nlvlmdep, FileNm='./SMC1R3', 
-              Global=True, Arctic=True, ArcLat=77.0):
-    """ Generate SMC full grid cells from given size-1 info. """
+              Global=True, Arctic=True, ArcLat=77.0, Save=True, refine=None):
+    """ 
+    Generate SMC full grid cells from given size-1 info. 
+    Northern hemisphere cells are refined by refine, a list of smcelrefn
+    refinement polygons or a level mask of (nlat//2, nlon) size-1 rows,
+    or by the SMC1R3 boxes of smc1r3refn if refine is None.
+    Return an SMCCells object with global 'Cels' and Arctic 'BArc' parts.
+    """
 
     import numpy  as np
-    import pandas as pd
+    from smcellSWE import smczones, smc1r3refn
+    from smcelrefn import refnmask
+    from smcells import SMCCells
 
 ## Bathy domain nlon and nlat and reference point zlon zlat.
     zlon = zdlonlat[0] 
@@ -67,8 +149,6 @@ def smcellSWE(zdlonlat, nlvlmdep, FileNm='./SMC1R3',
     if( Arctic ):
         jArc   = int( round( (ArcLat-zlat)/dlat/MFct )*MFct )
         print(' Arctic and boundary j and latitude =', jArc, jArc*dlat+zlat, ArcLat)
-        smcbdy=[]
-        smcArc=[]
     
 ## Longitude number needs to be multiple of MFct*Merg due to zonal merging.
 ## Global i will be consistent to global model and wrap at 360 deg or NCM.
@@ -82,135 +162,127 @@ def smcellSWE(zdlonlat, nlvlmdep, FileNm='./SMC1R3',
 ## Initialise cell count variables
     Ns = np.zeros( (NLvel+1), dtype=int )
 
-## Size zone parallel index
-    jprold=0
-    jprset=0
-    ism=1
-   
-## Initial smcels as a list to append cell arrays.
+## Rows of each MFct rows except for the last MFct rows are grouped into 
+## latitude zones of the same merging size ism.  JGLi18Oct2026
+    jrows = np.arange(0, nla2-MFct, MFct)
+    zones = smczones(jrows, jprasn, Merg)
+
+## Refinement level mask of the northern hemisphere rows.
+    lmask = None
+    if( refine is None ):
+        lmask = smc1r3refn(nlon, nla2, zones, NLvel)
+    elif( isinstance(refine, np.ndarray) ):
+        lmask = refine
+    elif( len(refine) > 0 ):
+        lmask = refnmask(refine, [nlon, nla2, dlon, dlat, zlon, zlat], NLvel)
+
+## Initial cell lists to append cell arrays of each zone.
     smcels = []
+    if( Arctic ):
+        smcbdy=[ np.zeros((0,5), dtype=int) ]
+        smcArc=[]
 
-## Define refined area i, j ranges for SMC1R3 grid if NLvel==3.
-## Latitude from 15N (j=60) to 50N (j=200), relaxing width 8.
-## Longitude range is roughly from 14E (i=40) to 84E (i=240).
-    ijsn = [40, 60, 240, 200] 
-    ijs1 = [48, 68, 232, 192] 
-
-## For each MFct rows except for the last MFct rows.
-    for j in range(0, nla2-MFct, MFct):
-
-## Full grid jj and latitude for this row
-        yj=ylat[j]
-        if( j % 10*MFct == 0 ):
-            print ( j, "row reached." )
-
-## Find j size-changing zone and work out merging sizes ims.
-        for jpr in range(10): 
-            if( j >= jprasn[jpr] and j < jprasn[jpr+1] ):
-                jprset = jpr+1
-                ism = 2**abs(jprset)
-## Set maximum merging to be Merg.
-        if( ism > Merg ): ism = Merg
-
-        if( jprset != jprold ): 
-            jprold = jprset
-            print ("Row j, x-size ism and latitude yj=", j, ism, yj)
+## All cells of a zone are built at once by broadcasting rows over 
+## columns.  JGLi18Oct2026
+    iFct = MFct
+    for jz, ism in zones:
 
 ## Set i-merging factor for i-loop step.
         iFn=ism*MFn
         iFct=iFn[-1]
-        print(" j, ism, iFn =", j, ism, iFn)
-
-## For global grid, loop over all longitude point.
-        for i in range(0, nlon, iFct):
-
-## North hemisphere refined areas if NLevel >= 3.
-            if( ( NLvel >= 3 ) and \
-                (ijsn[0] <= i < ijsn[2]) and \
-                (ijsn[1] <= j < ijsn[3]) ):
-                for jk in range(0,2*MFn[-2], MFn[-2]):
-                    for ik in range(0,2*iFn[-2], iFn[-2]):
-                        if( (ijs1[0] <= i+ik < ijs1[2]) and \
-                            (ijs1[1] <= j+jk < ijs1[3]) ):
-## NLevel-2 (size-1) cells wihtin refined zone.
-                            for jm in range(0, 2*MFn[-3], MFn[-3]):
-                                for im in range(0,2*iFn[-3], iFn[-3]):
-                                    subcel=[i+ik+im, j+jk+jm, \
-                                            iFn[-3], MFn[-3], MDeep]
-                                    smcels.append( subcel )
-                                    Ns[-3] += 1
-                        else:
-## NLevel-1 (size-2) cells within relaxation zone.
-                            subcel=[i+ik, j+jk, \
-                                    iFn[-2], MFn[-2], MDeep]
-                            smcels.append( subcel )
-                            Ns[-2] += 1
-
-            else:
-## Base resolution northern hemisphere cells.
-                subcel=[i, j, iFct, MFct, MDeep]
-
-                if( Arctic and j >= jArc ):
-## Append cells to Arctic part.
-                    smcArc.append( subcel )
-                    if( j < jArc + 4*MFct ): 
-## Also append boundary cells to smcbdy for 4 rows. 
-                        smcbdy.append( subcel )
-                else:
+        print ("Row j, x-size ism and latitude yj=", jz[0], ism, ylat[jz[0]])
+        print(" j0, jn, ism, iFn =", jz[0], jz[-1], ism, iFn)
+
+## Block i, j of all cells in the zone.
+        ib = np.arange(0, nlon, iFct)
+        ii = np.tile(ib, jz.size)
+        jj = np.repeat(jz, ib.size)
+
+## North hemisphere blocks refined if any mask level is finer.
+        refn = np.zeros(ii.size, dtype=bool)
+        if( lmask is not None ):
+            lrow = np.asarray( lmask[jz[0]:jz[-1]+MFct] ).reshape(jz.size, 
+                               MFct, -1).min(axis=1)
+            refn = ( np.minimum.reduceat(lrow, ib, axis=1) < NLvel ).ravel()
+        isb = ii[refn]
+        jsb = jj[refn]
+        for levl in range(NLvel-1, 0, -1):
+            if( isb.size == 0 ): break
+## Split blocks into 4 level levl cells, which are split again if
+## their mask asks for a finer level.
+            ik = np.array([0, iFn[levl-1], 0, iFn[levl-1]])
+            jk = np.array([0, 0, MFn[levl-1], MFn[levl-1]])
+            isb = ( isb[:,None] + ik[None,:] ).ravel()
+            jsb = ( jsb[:,None] + jk[None,:] ).ravel()
+            jm = jsb[:,None,None] + np.arange(MFn[levl-1])[None,:,None]
+            im = ( isb[:,None,None] + 
+                   np.arange(iFn[levl-1])[None,None,:] ) % nlon
+            splt = np.asarray(lmask)[jm, im].min(axis=(1,2)) < levl
+            subcel = np.zeros((np.sum(~splt), 5), dtype=int)
+            subcel[:,0] = isb[~splt]
+            subcel[:,1] = jsb[~splt]
+            subcel[:,2:] = [iFn[levl-1], MFn[levl-1], MDeep]
+            smcels.append( subcel )
+            Ns[levl] += subcel.shape[0]
+            isb = isb[splt]
+            jsb = jsb[splt]
+
+## Base resolution northern cell followed by southern one at each i, 
+## as southern hemisphere are all base resolution cells.
+        subcel = np.zeros((ii.size, 2, 5), dtype=int)
+        subcel[:,:,0] = ii[:,None]
+        subcel[:,0,1] = jj
+        subcel[:,1,1] = -jj-MFct
+        subcel[:,:,2:] = [iFct, MFct, MDeep]
+        keep = np.ones((ii.size, 2), dtype=bool)
+        keep[:,0] = ~refn
+        jnth = np.repeat(jj[:,None], 2, axis=1)[keep]
+        subcel = subcel[keep]
+
+        if( Arctic ):
+## Append cells to Arctic part and boundary cells to smcbdy for 4 rows.
+            inarc = jnth >= jArc
+            smcArc.append( subcel[inarc] )
+            smcbdy.append( subcel[inarc & (jnth < jArc + 4*MFct)] )
+            subcel = subcel[~inarc]
 ## Append the cells to global part. 
-                    smcels.append( subcel )
-                    Ns[-1] += 1
-
-## Southern hemisphere are all base resolution cells, no refinement. 
-            substh=[i, -j-MFct, iFct, MFct, MDeep]
-            if( Arctic and j >= jArc ):
-                smcArc.append( substh )
-                if( j < jArc + 4*MFct ): 
-                    smcbdy.append( substh )
-            else:
-                smcels.append( substh )
-                Ns[-1] += 1
-## End of i, j loops. 
+        smcels.append( subcel )
+        Ns[-1] += subcel.shape[0]
+
+## End of zone loop. 
 
 ## Two polar cells with the same size as the last row cells.
     npl=2
     j=nla2-MFct
-    subcel=[0,  j, iFct, MFct, MDeep]
-    substh=[0, -j-MFct, iFct, MFct, MDeep]
+    subcel=[[0,  j, iFct, MFct, MDeep], 
+            [0, -j-MFct, iFct, MFct, MDeep]]
 
     if( Arctic ):
-        smcArc.append( subcel )
-        smcArc.append( substh )
+        smcArc.append( np.array(subcel) )
     else:
-        smcels.append( subcel )
-        smcels.append( substh )
+        smcels.append( np.array(subcel) )
         Ns[-1] += 2
 
-## Cell array output format for each cell.
-    fmtcel='%6d %5d %4d %3d %5d'
     nArct = 0
 
     if( Arctic ):
 ## Conversion to np.array is needed for array operations. 
-        smcArcnp = np.array(smcArc)
-        smcbdynp = np.array(smcbdy)
+        smcArcnp = np.vstack(smcArc)
+        smcbdynp = np.vstack(smcbdy)
         jbdy = MFct*2
         nArct = smcArcnp.shape[0]
 
 ## Count boundary cells for global and Arctic parts.
         nbGlo = smcbdynp[ np.abs(smcbdynp[:,1]+0.5) > jArc+jbdy ].shape[0]
         nbArc = smcbdynp.shape[0] - nbGlo
-        hdr = f'{nArct:8d} {nbArc:5d} {nbGlo:5d} {npl:5d}'
-
-        ArcFl = FileNm +'BArc.dat'
-        print(' ... saving BArc.dat with header '+hdr )
-        np.savetxt(ArcFl, smcArcnp, fmt=fmtcel, header=hdr, \
-                   comments='')
+        hdrArc = f'{nArct:8d} {nbArc:5d} {nbGlo:5d} {npl:5d}'
 
-## Using pandas data frame to sort global part smcels before save it.
-    smcelsdf = pd.DataFrame(smcels, columns=['i','j','di','dj','kdp'])
-    smcelsdf.sort_values(by=['dj','j','i'], inplace=True)
-    smcelsnp = np.array(smcelsdf)
+## Sort global part smcels by dj, j, i as the pandas sort_values in
+## other cell generators.  Cell j, i pairs are unique so the order is 
+## the same.
+    smcelsnp = np.vstack(smcels)
+    smcelsnp = smcelsnp[ np.lexsort( (smcelsnp[:,0], smcelsnp[:,1], 
+                                      smcelsnp[:,3]) ) ]
 
 ## Append unsorted boundary cells to end of global part.
     if( Arctic ):
@@ -218,17 +290,17 @@ def smcellSWE(zdlonlat, nlvlmdep, FileNm='./SMC1R3',
          Ns[-1] += (nbArc + nbGlo)
 
 ## Save all or global part cells.
-    GloFl = FileNm +'Cels.dat'
     Ns[0] = sum(Ns[1:])
     hdr = ''.join( [f"{n:8d}" for n in Ns] ) 
-    print(' ... saving Cels.dat with header '+hdr )
-    np.savetxt(GloFl, smcelsnp, fmt=fmtcel, header=hdr, \
-                   comments='')
+    cells = SMCCells( FileNm )
+    cells.add('Cels', smcelsnp, hdr)
+    if( Arctic ): cells.add('BArc', smcArcnp, hdrArc)
+    if( Save ): cells.save()
 
 ## All done, total cell number.
     print( " smcellSWE finished. Total cell NC=", Ns[0]+nArct )
 
-    return 0
+    return cells
 
 ## End of smcellSWE function.
 
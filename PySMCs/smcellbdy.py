@@ -3,8 +3,13 @@
 ## It is a complimentary function to smcellgen, which generates the inner 
 ## cells for a regional model, apart of its global grid capacity.
 ##
+## Boundary row bands vectorised with summed-area tables by smcelbdrow,
+## which is also used by smcellreg for a fused inner/boundary pass.
+## Return boundary cells as an SMCCells object.  JGLi18Oct2026
+## Cell obstruction and depth statistics in the same pass. JGLi18Oct2026
+##
 ## First created:    JGLi07Jul2023
-## Last modified:    JGLi16Jun2025
+## Last modified:    JGLi18Oct2026
 ##
 """
 
@@ -20,16 +25,141 @@ def recursion_add(n):
 ##  End of recusion_add function.
 
 
+def smcelbdrow(Bathy, tabs, j, ism, prm, bband=None, obstr=None):
+    """
+    Generate boundary cells of all levels in the MFct-row band at row j.
+    Only the boundary edge blocks are checked, level by level, with 
+    look-ups in the pooled sea mask pyramid from smcelpyr.
+    If obstr is given, the cellstat obstruction ratio and depth minimum,
+    maximum and variance are appended as 4 more columns of the cells.
+    """
+
+    import numpy  as np
+    from smcellsat import satsums
+    from smcellpyr import smcelpyr, cellstat
+
+    NLvl   = prm['NLvl']
+    MFct   = 2**(NLvl-1)
+    NCM    = prm['NCM']
+    iFct   = ism*MFct
+
+    Ns = np.zeros( (NLvl+1), dtype=int )
+    rowcels = []
+    ncol = 5 if( obstr is None ) else 9
+
+## Boundary rows use all blocks, otherwise only the edge blocks.
+    iblk = np.arange(prm['istart'], prm['iend'], iFct)
+    if( j != prm['jbdy0'] and j != prm['jbdyn'] ):
+        iblk = iblk[ (iblk == prm['ibdy0']) | (iblk == prm['ibdyn']) ]
+    if( iblk.size == 0 ):
+        return np.zeros((0,ncol), dtype=int), Ns
+
+    if( prm['WrapLon'] ):
+        iiblk = (iblk + prm['ishft'] + NCM) % NCM
+    else:
+        iiblk = iblk + prm['ishft']
+
+## Sea points left within each block and those taken by a cell.
+    nleft = satsums(tabs, 'sea', j, j+MFct, iblk, iblk+iFct)
+    taken = np.zeros( (MFct, iblk.size*iFct), dtype=bool )
+    if( not np.any(nleft > 0) ):
+        return np.zeros((0,ncol), dtype=int), Ns
+
+## Pooled sea mask pyramid of the edge blocks without halo checks and 
+## mean depth summed as over a subathy block of iFct columns.
+    if( bband is None ):
+        bband = np.asarray(Bathy[j:j+MFct,:], dtype=float)
+    pyr = smcelpyr(bband, tabs, j, ism, iblk, NLvl, 
+                   NCM=NCM if( prm['WrapLon'] ) else 0, halo=False, 
+                   iwide=iFct, levels=range(2, NLvl+1))
+    oband = None
+    if( obstr is not None ):
+        oband = np.ma.filled( obstr[j:j+MFct,:], 0.0 )
+
+## Level 1 cells are not used for boundary cells.
+    for levl in range(NLvl, 1, -1):
+        active = nleft > 0
+        if( not np.any(active) ):
+            break
+
+        jchk = 2**(levl - 1)
+        irng = jchk*ism
+
+        kblk = np.nonzero(active)[0]
+        ibs = ( kblk[:,None]*iFct + np.arange(0, iFct, irng)[None,:]
+              ).ravel()
+        jbs = np.arange(0, MFct, jchk)
+        jb = np.repeat(jbs, ibs.size)
+        ib = np.tile(ibs, jbs.size)
+
+## Cell area all sea points or at level 2 with msea or more sea points
+## not yet taken by a larger cell to define a boundary cell.
+        nsea = pyr[levl]['nsea'][jb//jchk, ib//irng]
+        if( levl == 2 ):
+            jm = jb[:,None,None] + np.arange(jchk)[None,:,None]
+            im = ib[:,None,None] + np.arange(irng)[None,None,:]
+            nsea = nsea - np.sum( taken[jm, im], axis=(1,2) )
+            ok = (nsea == irng*jchk) | (nsea >= prm['msea'])
+        else:
+            ok = pyr[levl]['allsea'][jb//jchk, ib//irng] & ~taken[jb, ib]
+        if( not np.any(ok) ): continue
+        jb = jb[ok]
+        ib = ib[ok]
+        nsea = nsea[ok]
+        ncel = jb.size
+
+## Mark the cell points as taken and reduce left sea points.
+        jm = jb[:,None,None] + np.arange(jchk)[None,:,None]
+        im = ib[:,None,None] + np.arange(irng)[None,None,:]
+        taken[jm, im] = True
+        nleft -= np.bincount(ib//iFct, weights=nsea, 
+                             minlength=iblk.size).astype(int)
+
+## Use ceilling diffence from water level to define water depth.
+        kdepth = np.ceil( prm['wlevel'] - 
+                 pyr[levl]['mdep'][jb//jchk, ib//irng] ).astype(int)
+        subcel = np.zeros((ncel, 5), dtype=int)
+        subcel[:,0] = iiblk[ib//iFct] + ib % iFct
+        subcel[:,1] = j + prm['jequt'] + jb
+        subcel[:,2] = irng
+        subcel[:,3] = jchk
+        subcel[:,4] = np.maximum(1, kdepth)
+        if( obstr is not None ):
+            subcel = np.hstack( (subcel, cellstat(bband, oband, jb, 
+                     iblk[ib//iFct] + ib % iFct, jchk, irng, 
+                     prm['depmin'], prm['wlevel'], 
+                     NCM=NCM if( prm['WrapLon'] ) else 0)) )
+        rowcels.append( subcel )
+        Ns[levl] += ncel
+
+    if( len(rowcels) > 0 ):
+        rowcels = np.vstack( rowcels )
+    else:
+        rowcels = np.zeros((0,ncol), dtype=int)
+
+    return rowcels, Ns
+
+## End of smcelbdrow function.
+
+
 def smcellbdy(Bathy, ndzlonlat, mlvlxy0, FileNm='./SMC61250', 
         Global=True, Arctic=False, depmin=0.0, dshalw=0.0, 
-        wlevel=0.0, msea=1, GlbArcLat=84.4, **kwargs ):
+        wlevel=0.0, msea=1, GlbArcLat=84.4, Save=True, obstr=None,
+        **kwargs ):
     """ 
     Generate SMC grid boudarny cells from regional bathy. 
+    Bathy could be an array or a lazy row band source from readbathy.
+    Cells are returned as an SMCCells object with the 'Bdys' part and
+    saved in FileNm+'Bdys.dat' if Save is True.  Obstruction field
+    obstr on the bathy grid gives the cell obstruction and depth
+    statistics saved as FileNm+'BdyObst.dat' and 'BdyDsts.dat'.
     """
 
     import numpy   as np
     import pandas  as pd
-    from smcellbdy import recursion_add
+    from smcellbdy import recursion_add, smcelbdrow
+    from smcellsat import smcellsat
+    from smcells import SMCCells
     from datetime import datetime
 
 ## Bathy domain nlon and nlat and south-west first point zlon zlat.
@@ -148,18 +278,37 @@ def smcellbdy(Bathy, ndzlonlat, mlvlxy0, FileNm='./SMC61250',
     print(' Water level, minimum and shallow water depths, and NLvshlw = \n',
             wlevel, depmin, dshalw, NLvshlw)
 
-## Size zone parallel index
-    jprold=0
-   
 ## Loop ends of i/j-loop ends at bathy data end.
     iend = istart + iexpnd
     jend = jstart + jexpnd
 
+## Wrapping bathy tables are padded with the maximum i-step, or
+## more if the grid goes beyond the bathy east end.
+    ipad = 0
+    if( WrapLon ): ipad = max([ MFct*Merg, iend - nlon ])
+    else: NCM = nlon
+
+## Row band constants shared by smcelbdrow calls.
+    prm = {'NLvl': NLvl, 'istart': istart, 'iend': iend, 
+           'ishft': ishft, 'jequt': jequt, 'WrapLon': WrapLon, 
+           'NCM': NCM, 'wlevel': wlevel, 'depmin': depmin, 'msea': msea,
+           'ibdy0': ibdy0, 'ibdyn': ibdyn, 'jbdy0': jbdy0, 'jbdyn': jbdyn}
+
+## Size zone parallel index
+    jprold=0
+
 ## Initial smcels as a list to append cell arrays.
-    smcels = []
+    smcels = [ np.zeros((0,5 if( obstr is None ) else 9), dtype=int) ]
 
     print( " Cell generating started at "+ datetime.now().strftime('%F %H:%M:%S') )
 
+## Sea point tables for all rows of an in-memory Bathy or for each 
+## row band of a lazy bathy source.  JGLi18Oct2026
+    inmem = isinstance(Bathy, np.ndarray)
+    if( inmem ):
+        tabs = smcellsat(Bathy, depmin=depmin, dshalw=depmin, 
+                         jrange=[jstart, jend], ipad=ipad, NCM=NCM)
+
 ## For each MFct rows except for the last MFct rows and the bottom MFct rows
     for j in range(jstart, jend, MFct):
 
@@ -181,65 +330,18 @@ def smcellbdy(Bathy, ndzlonlat, mlvlxy0, FileNm='./SMC61250',
             jprold = jprset
             print ("Row j, jj, x-size ism and latitude yj=", j, jj, ism, yj)
 
-## Set i-merging factor for i-loop step.
-        iFct=ism*MFct
-
-## For global grid, loop over all longitude point.
-        for i in range(istart, iend, iFct):
-
-## Declare a sub-array for cell generating.
-            subathy = np.zeros((MFct, iFct), dtype=float)
-
-            if( WrapLon ):
-                ii = (i + ishft + NCM) % NCM
-            else:
-                ii = i + ishft
-
-## Extract a sub-array from Bathy for cell generating.
-            if( (j == jbdy0 or j == jbdyn) ):
-                subathy[:,:] = Bathy[j:j+MFct,i:i+iFct]
-            elif( i == ibdy0 or i == ibdyn ):
-                subathy[:,:] = Bathy[j:j+MFct,i:i+iFct]
-            else:
-## None boundary area set bathy to be land above depmin.
-                subathy[:,:] = 999.0
-
-## Define a logical array in central area to control loop
-            subchck = subathy[:,:] < depmin
-
-## Loop over NLvl to define different sized cells according to open sea area,
-## starting with base level of size-MFct cell but exclude level 1 cells.
-            levl = NLvl
-            while( levl > 1 ):
-                if( np.sum(subchck) == 0 ):
-                    break
-                else:
-                    jchk = 2**(levl - 1)
-                    irng = jchk*ism
-                    jdk = recursion_add(levl)
-                    idg = jdk*ism 
-
-                    for jb in range(0,MFct,jchk):
-                        for ib in range(0,iFct,irng):
-## Check cell area and its surrounding points are all sea points or 
-## at level one 2 and there are 2 or more sea points to define a boundary cell. 
-                            nsea = np.sum( subchck[jb:jb+jchk,ib:ib+irng] ) 
-                            if( ( nsea == irng*jchk ) or ( levl == 2 and nsea >= msea ) ): 
-                                bsum = np.sum( subathy[jb:jb+jchk, ib:ib+irng] )
-## Use ceilling diffence from water level to define water depth.  JGLi02Nov2023
-                                kdepth = np.ceil( wlevel - bsum/float(irng*jchk) ).astype(int)
-                                subcel=[ii+ib, jj+jb, irng, jchk, max( [1,kdepth] )]
-                                subchck[jb:jb+jchk,ib:ib+irng] = False
-                                smcels.append( subcel )
-                                Ns[levl] += 1
-                                if( Ns[levl] < 3 ):  
-                                    print( jchk, ' size i, j, yj, kdepth= \n',
-                                           ii+ib, jj+jb, yj, kdepth )
-
-## Down one level if any sea points left.
-                levl -= 1 
-
-## End of i, j loops. 
+        if( not inmem ):
+            tabs = smcellsat(Bathy, depmin=depmin, dshalw=depmin, 
+                             jrange=[j, j+MFct], ipad=ipad, NCM=NCM)
+
+## Boundary cells of all levels in this row band.
+        rowcels, rowNs = smcelbdrow(Bathy, tabs, j, ism, prm, 
+                                    obstr=obstr)
+        smcels.append( rowcels )
+        Ns += rowNs
+
+## End of j loop. 
+    smcels = np.vstack( smcels )
 
 ## All cells are done.
     print(  " *** Done all cells Ns =", Ns )
@@ -247,26 +349,36 @@ def smcellbdy(Bathy, ndzlonlat, mlvlxy0, FileNm='./SMC61250',
     print(  " *** Total cells Numbr =", NL )
 
 ## Follow Qingxiang Liu's method to sort smcels before save it.
-    smcelsdf = pd.DataFrame(smcels, columns=['i','j','di','dj','kdp'])
+    columns = ['i','j','di','dj','kdp']
+    if( obstr is not None ): columns += ['obs','dmin','dmax','dvar']
+    smcelsdf = pd.DataFrame(smcels, columns=columns)
     smcelsdf.sort_values(by=['dj','j','i'], inplace=True)
     smcels = np.array(smcelsdf)
-
-## Cell array output format for each cell.
-    fmtcel='%6d %5d %4d %3d %5d'
+    if( obstr is not None ):
+        celstt = smcels[:,5:]
+        smcels = smcels[:,:5].astype(int)
 
 ## Recount global part cell numbers and deduct size-8 Arctic cells.
     Ns[0] = smcels.shape[0]
     if( sum(Ns[1:]) != Ns[0] ):
         print( "*** Warning total cell number does not match sub-cell sum:", Ns[0], sum(Ns[1:]) )
     
-## Save the cell array, anyway.
+## Save the cell array if required.
     hdr = ''.join( [f"{n:8d}" for n in Ns] ) 
-    print(' ... saving Cels.dat with header '+hdr )
-    Cell_file = FileNm+'Bdys.dat'
-    np.savetxt(Cell_file, smcels, fmt=fmtcel, header=hdr, comments='')
+    cells = SMCCells( FileNm )
+    cells.add('Bdys', smcels, hdr)
+    if( obstr is not None ):
+        nb = smcels.shape[0]
+        Kobstr = np.minimum( 90, np.rint( 100.0*celstt[:,0] ) ).astype(int)
+        cells.addinfo('BdyObst', Kobstr, "{:8d} {:5d}".format(nb, 1), '%4d')
+        cells.addinfo('BdyDsts', celstt[:,1:], "{:8d} {:5d}".format(nb, 3),
+                      '%9.2f %9.2f %12.3f')
+    if( Save ): cells.save()
 
     print( " smcellbdy finished at %s " % datetime.now().strftime('%F %H:%M:%S') )
 
+    return cells
+
 ## End of smcellbdy function.
 
 
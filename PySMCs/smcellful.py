@@ -2,8 +2,13 @@
 ##  Function smcellful to generate a full global SMC grid. 
 ##  The main() function uses the SMC1d grid as an example.
 ##
+##  Cells are built zone by zone with numpy broadcasting, using the
+##  zones of smcellSWE.smczones.  Rows at or above the last merging
+##  parallel stay in the last zone.  Set Save=False to skip the cell 
+##  files and use the returned SMCCells object.  JGLi18Oct2026
+##
 ##  First created:        JGLi06Oct2021
-##  Last modified:        JGLi03Feb2025
+##  Last modified:        JGLi18Oct2026
 ##
 """
 
@@ -39,11 +44,15 @@ def main():
 
 
 def smcellful(zdlonlat, nlvlmdep, FileNm='./SMC1d', 
-              Global=True, Arctic=False,  **kwargs ): 
-    """ Generate SMC full grid cells from given size-1 info. """
+              Global=True, Arctic=False, Save=True, **kwargs ): 
+    """ 
+    Generate SMC full grid cells from given size-1 info. 
+    Return an SMCCells object with global 'Cels' and Arctic 'BArc' parts.
+    """
 
     import numpy   as np
-    import pandas  as pd
+    from smcellSWE import smczones
+    from smcells import SMCCells
 
 ##  Bathy domain nlon and nlat and south-west first point zlon zlat.
     zlon = zdlonlat[0] 
@@ -111,61 +120,37 @@ def smcellful(zdlonlat, nlvlmdep, FileNm='./SMC1d',
 ##  Initialise cell count variables
     Ns = np.zeros( (NLvel+1), dtype=int )
 
-##  Size zone parallel index
-    jprold=0
-    jprset=0
-    ism=1
-   
-##  Initial smcels as a list to append cell arrays.
+##  Rows of each MFct rows are grouped into latitude zones of the same 
+##  merging size ism and all cells of a zone are built at once, with 
+##  the northern row followed by its mirror southern row for j > 0.
+    jrows = np.arange(0, nla2, MFct)
     smcels = []
+    ism = 1
+    for jz, ism in smczones(jrows, jprasn, Merg):
 
-##  For each MFct rows except for the last MFct rows and the bottom MFct rows
-    for j in range(0, nla2, MFct):
-
-##  Full grid jj and latitude for this row
-        yj=ylat[j]
-        if( j % 10*MFct == 0 ):
-            print ( j, "row reached." )
-
-##  Find j size-changing zone and work out merging sizes ims in the zone 
-        for jpr in range(10): 
-            if( j >= jprasn[jpr] and j < jprasn[jpr+1] ):
-                jprset = jpr+1
-                ism = 2**abs(jprset)
-##  Set maximum merging to be 64 or 2**6
-        if( ism > Merg ): ism = Merg
-
-        if( jprset != jprold ): 
-            jprold = jprset
-            print ("Row j, x-size ism and latitude yj=", j, ism, yj)
-
-##  Set i-merging factor for i-loop step.
         iFct=ism*MFct
-        print(" j, ism, iFct =", j, ism, iFct)
-
-##  For global grid, loop over all longitude point.
-        for i in range(0, nlon, iFct):
-            subcel=[i, j, ism, 1, MDeep]
-            smcels.append( subcel )
-            Ns[1] += 1
-
-##  Mirror southern hemisphere row for all j > 0
-        if( j > 0 ):
-            for i in range(0, nlon, iFct):
-                subcel=[i, -j, ism, 1, MDeep]
-                smcels.append( subcel )
-                Ns[1] += 1
-
-##  End of i, j loops. 
+        print ("Row j, x-size ism and latitude yj=", jz[0], ism, ylat[jz[0]])
+        print(" j0, jn, ism, iFct =", jz[0], jz[-1], ism, iFct)
+
+        ib = np.arange(0, nlon, iFct)
+        subcel = np.zeros((jz.size, 2, ib.size, 5), dtype=int)
+        subcel[:,:,:,0] = ib
+        subcel[:,0,:,1] = jz[:,None]
+        subcel[:,1,:,1] = -jz[:,None]
+        subcel[:,:,:,2:] = [ism, 1, MDeep]
+        keep = np.ones((jz.size, 2, ib.size), dtype=bool)
+        keep[:,1,:] = (jz > 0)[:,None]
+        smcels.append( subcel[keep] )
+        Ns[1] += np.sum(keep)
+
+##  End of zone loop. 
 
 ##  Two polar cells with the same size as the last row cells.
     j=nla2
-    subcel=[0,  j, ism, 1, MDeep]
-    smcels.append( subcel )
-    Ns[1] += 1
-    subcel=[0, -j, ism, 1, MDeep]
-    smcels.append( subcel )
-    Ns[1] += 1
+    smcels.append( np.array([[0,  j, ism, 1, MDeep], 
+                             [0, -j, ism, 1, MDeep]]) )
+    Ns[1] += 2
+    smcels = np.vstack( smcels )
 
 ##  All cells are done.
     print(  " *** Done all cells Ns =", Ns )
@@ -178,9 +163,6 @@ def smcellful(zdlonlat, nlvlmdep, FileNm='./SMC1d',
 #   smcels = np.array(smcelsdf)
 ## Sorting is not required for 1 level 2 polar cell grids.
 
-## Cell array output format for each cell.
-    fmtcel='%6d %5d %4d %3d %5d'
-
 ## Separate Arctic part out of the cells and work out boundary 
 ## cell numbers.
     if( Arctic ):
@@ -191,26 +173,22 @@ def smcellful(zdlonlat, nlvlmdep, FileNm='./SMC1d',
                 nbArc
         nArct = smcArc.shape[0]
         smcArcnp = np.array(smcArc)
-        hdr = f'{nArct:8d} {nbArc:5d} {nbGlo:5d}'
-        ArcFl = FileNm +'BArc.dat'
-        print(' ... saving BArc.dat with header '+hdr )
-        np.savetxt(ArcFl, smcArc, fmt=fmtcel, header=hdr, \
-                   comments='')
+        hdrArc = f'{nArct:8d} {nbArc:5d} {nbGlo:5d}'
 ## Separate Global part out of the cells by jArc value
         smcels = smcels[smcels[:,1]<jArc+2*jbdy]
         Ns[NLvel] = Ns[NLvel] - nArct + nbArc + nbGlo
 
 ## Save all or global part cells.
     smcelsnp = np.array(smcels)
-    GloFl = FileNm +'Cels.dat'
     Ns[0] = sum(Ns[1:])
     hdr = ''.join( [f"{n:8d}" for n in Ns] ) 
-    print(' ... saving Cels.dat with header '+hdr )
-    np.savetxt(GloFl, smcelsnp, fmt=fmtcel, header=hdr, \
-                   comments='')
+    cells = SMCCells( FileNm )
+    cells.add('Cels', smcelsnp, hdr)
+    if( Arctic ): cells.add('BArc', smcArcnp, hdrArc)
+    if( Save ): cells.save()
     print( " smcellful finished." )
 
-    return 0
+    return cells
 
 ## End of smcellful function.
 
@@ -6,7 +6,19 @@
 ##
 ## First created:    JGLi18Sep2014
 ## Converted into Python.    JGLi14Feb2019 
-## Last modified:    JGLi18Jun2025
+## Summed-area tables and row band function smcelrow.  JGLi18Oct2026
+## Multi-process row bands with shared memory Bathy.   JGLi18Oct2026
+## Accept lazy row band bathy source from readbathy.    JGLi18Oct2026
+## Incremental update of row bands within a changed box.  JGLi18Oct2026
+## Use summed-area tables shared by smcelbatch jobs.     JGLi18Oct2026
+## Opt-in stage, row band and level timing with SMCTimer. JGLi18Oct2026
+## Band tables from bit-packed sea masks of smcelbits.    JGLi18Oct2026
+## Checkpoint completed row bands and resume a broken run. JGLi18Oct2026
+## Return cells as an SMCCells object, optionally unsaved. JGLi18Oct2026
+## Grid setup in smcelsetup, shared with smcelcount and smcellreg.  JGLi18Oct2026
+## Cell levels set by refinement polygon level masks.      JGLi18Oct2026
+## Cell obstruction and depth statistics in the same pass. JGLi18Oct2026
+## Last modified:    JGLi18Oct2026
 ##
 """
 
@@ -22,17 +34,474 @@ def recursion_add(n):
 ## End of recusion_add function.
 
 
-def smcellgen(Bathy, ndzlonlat, mlvlxy0, FileNm='./SMC61250', 
-        Global=True, Arctic=False, depmin=0.0, dshalw=0.0, 
-        wlevel=0.0, GlbArcLat=84.4, **kwargs): 
-    """ 
-    Generate SMC grid cells from size-1 resolution bathy.
+def smcelrow(Bathy, tabs, j, ism, jpr1, prm, timer=None, lmask=None,
+             obstr=None):
+    """
+    Generate cells of all levels in the MFct-row band starting at row j.
+    All size-MFct blocks in the band are checked level by level together
+    with window counts from the summed-area tables in tabs.
+    Band and level wall times are recorded in timer if given.
+    Cell levels are set by the refinement level mask lmask if given.
+    If obstr is given, the cellstat obstruction ratio and depth minimum,
+    maximum and variance of each cell are appended as 4 extra columns,
+    from the obstruction field obstr on the bathy grid.
+    """
+
+    import time
+    import numpy  as np
+    from smcellsat import satsums
+    from smcellpyr import smcelpyr, cellstat
+    from smcelrefn import refnrows, refnpyr, refnok, refndep
+    from smctimer import timing
+
+    NLvl   = prm['NLvl']
+    MFct   = 2**(NLvl-1)
+    NCM    = prm['NCM']
+    istart = prm['istart']
+    iFct   = ism*MFct
+
+    Ns = np.zeros( (NLvl+1), dtype=int )
+    nshalw = 0
+    rowcels = []
+    ncol = 5 if( obstr is None ) else 9
+    tband = time.perf_counter()
+    tlevl = [ 0.0 ]*(NLvl+1)
+
+## Block start i and SMC grid i index of the block.
+    iblk = np.arange(istart, prm['iend'], iFct)
+    if( prm['WrapLon'] ):
+        iiblk = (iblk + prm['ishft'] + NCM) % NCM
+    else:
+        iiblk = iblk + prm['ishft']
+
+## Sea points left and deep points (< dshalw) within each block.
+    nleft = satsums(tabs, 'sea', j, j+MFct, iblk, iblk+iFct)
+    nsubdep = satsums(tabs, 'shw', j, j+MFct, iblk, iblk+iFct)
+    if( not np.any(nleft > 0) ):
+        if( timer is not None ):
+            timer.record('band', j=int(j), ism=int(ism),
+                         wall=time.perf_counter()-tband, 
+                         levels=tlevl[1:], Ns=Ns[1:].tolist(), nshalw=0)
+        return np.zeros((0,ncol), dtype=int), Ns, nshalw
+
+## Points already taken by a larger cell within the row band.
+    taken = np.zeros( (MFct, iblk.size*iFct), dtype=bool )
+
+## Pooled sea mask pyramid of the band with halo checks and mean depth
+## of the blocks at each level, so cell checks are array look-ups.
+    with timing(timer, 'pyramid'):
+        bband = np.asarray(Bathy[j:j+MFct,:], dtype=float)
+        pyr = smcelpyr(bband, tabs, j, ism, iblk, NLvl, 
+                       NCM=NCM if( prm['WrapLon'] ) else 0)
+    oband = None
+    if( obstr is not None ):
+        oband = np.ma.filled( obstr[j:j+MFct,:], 0.0 )
+
+## Split and forced level blocks from the refinement level mask.
+    rpyr = None
+    if( lmask is not None ):
+        rpyr = refnpyr( refnrows(lmask, j, iblk, iFct, MFct, 
+                        NCM=NCM if( prm['WrapLon'] ) else 0), ism, NLvl )
+
+## Loop over NLvl to define different sized cells according to
+## open sea area, starting with base level of size-MFct cell.
+    tchck = time.perf_counter()
+    tmark = []
+    for levl in range(NLvl, 0, -1):
+        tmark.append( (levl, time.perf_counter()) )
+        active = nleft > 0
+        if( not np.any(active) ):
+            break
+        if( levl > prm['NLvshlw'] ):
+            skip = active & (nsubdep == 0)
+            nshalw += int( np.sum(skip) )
+            active = active & ~skip
+            if( not np.any(active) ):
+                continue
+
+        jchk = 2**(levl - 1)
+        irng = jchk*ism
+
+## Candidate cell row and column offsets within the band.
+        jbs = np.arange(0, MFct, jchk)
+        if( levl == 1 ):
+            jbs = jbs[ (jpr1[0] <= j+jbs) & (j+jbs < jpr1[1]) ]
+            if( jbs.size == 0 ): continue
+        kblk = np.nonzero(active)[0]
+        ibs = ( kblk[:,None]*iFct + np.arange(0, iFct, irng)[None,:]
+              ).ravel()
+        jb = np.repeat(jbs, ibs.size)
+        ib = np.tile(ibs, jbs.size)
+
+## Check cell and its surrounding points are all sea points
+## to define the cell, excluding those inside a larger cell.
+        if( rpyr is None ):
+            ok = pyr[levl]['hsea'][jb//jchk, ib//irng] & ~taken[jb, ib]
+        else:
+            ok, part = refnok(pyr[levl], rpyr[levl], jb, ib)
+            ok &= ~taken[jb, ib]
+            part = part[ok]
+        if( not np.any(ok) ): continue
+        jb = jb[ok]
+        ib = ib[ok]
+        ncel = jb.size
+
+## Mark the cell points as taken and reduce left sea points.
+        jm = jb[:,None,None] + np.arange(jchk)[None,:,None]
+        im = ib[:,None,None] + np.arange(irng)[None,None,:]
+        taken[jm, im] = True
+        if( rpyr is None ):
+            nleft -= np.bincount(ib//iFct, minlength=iblk.size)*(irng*jchk)
+        else:
+            nleft -= np.bincount(ib//iFct, minlength=iblk.size, weights=
+                     pyr[levl]['nsea'][jb//jchk, ib//irng]).astype(int)
+
+## Use difference from water level to define water depth.
+        mdep = pyr[levl]['mdep'][jb//jchk, ib//irng]
+        if( rpyr is not None and np.any(part) ):
+            mdep[part] = refndep(bband, jb[part], iblk[ib[part]//iFct] + 
+                                 ib[part] % iFct, jchk, irng, prm['depmin'],
+                                 NCM=NCM if( prm['WrapLon'] ) else 0)
+        kdepth = np.ceil( prm['wlevel'] - mdep ).astype(int)
+        subcel = np.zeros((ncel, 5), dtype=int)
+        subcel[:,0] = iiblk[ib//iFct] + ib % iFct
+        subcel[:,1] = j + prm['jequt'] + jb
+        subcel[:,2] = irng
+        subcel[:,3] = jchk
+        subcel[:,4] = kdepth
+        if( obstr is not None ):
+            subcel = np.hstack( (subcel, cellstat(bband, oband, jb, 
+                     iblk[ib//iFct] + ib % iFct, jchk, irng, 
+                     prm['depmin'], prm['wlevel'], 
+                     NCM=NCM if( prm['WrapLon'] ) else 0)) )
+        rowcels.append( subcel )
+        Ns[levl] += ncel
+
+## Level wall time is the time to the start of the next level.
+    tmark.append( (0, time.perf_counter()) )
+    for (levl, t0), (_, t1) in zip(tmark[:-1], tmark[1:]):
+        tlevl[levl] = t1 - t0
+
+    if( len(rowcels) > 0 ):
+        rowcels = np.vstack( rowcels )
+    else:
+        rowcels = np.zeros((0,ncol), dtype=int)
+
+    if( timer is not None ):
+        timer.addtime('checks', time.perf_counter() - tchck)
+        timer.record('band', j=int(j), ism=int(ism),
+                     wall=time.perf_counter()-tband, levels=tlevl[1:],
+                     Ns=Ns[1:].tolist(), nshalw=int(nshalw))
+
+    return rowcels, Ns, nshalw
+
+## End of smcelrow function.
+
+
+def smcelbands(Bathy, bands, prm, tabs=None, timer=None, bits=None,
+               lmask=None, obstr=None):
+    """
+    Generate cells for a list of consecutive row bands [j, ism, jpr1].
+    Summed-area tables only cover the band rows plus MFct-row halos,
+    unless prebuilt tables covering all the bands are given in tabs.
+    Band tables are unpacked from smcelbits masks if bits is given.
+    Refinement level mask lmask and obstruction field obstr are passed
+    to smcelrow.
     """
 
     import numpy  as np
-    import pandas as pd
-    from smcellgen import recursion_add 
     from datetime import datetime
+    from smcellgen import smcelrow
+    from smcellsat import smcellsat
+    from smcelbits import satbits
+    from smctimer import timing
+
+    NLvl = prm['NLvl']
+    MFct = 2**(NLvl-1)
+    Ns = np.zeros( (NLvl+1), dtype=int )
+    nshalw = 0
+    smcels = [ np.zeros((0,5 if( obstr is None ) else 9), dtype=int) ]
+    if( len(bands) == 0 ):
+        return smcels[0], Ns, nshalw
+
+## In-memory Bathy has tables built for all bands at once but a 
+## lazy bathy source, such as readbathy BathyRows, is read one band 
+## of 3*MFct rows (with halo) at a time to bound the memory use.
+## Bit-packed masks are unpacked one band at a time as well.
+    nbtab = len(bands) if isinstance(Bathy, np.ndarray) else 1
+    if( bits is not None ): nbtab = 1
+    if( tabs is not None ): nbtab = len(bands)
+
+    for k in range(0, len(bands), nbtab):
+        j0 = bands[k][0] - MFct
+        j1 = bands[min([k+nbtab, len(bands)])-1][0] + MFct*2
+        if( k > 0 or tabs is None ):
+            with timing(timer, 'tables'):
+                if( bits is not None ):
+                    tabs = satbits(bits, depmin=prm['depmin'], 
+                                   dshalw=prm['dshalw'], jrange=[j0, j1],
+                                   ipad=prm['ipad'], NCM=prm['NCM'])
+                else:
+                    tabs = smcellsat(Bathy, depmin=prm['depmin'], 
+                                     dshalw=prm['dshalw'], jrange=[j0, j1],
+                                     ipad=prm['ipad'], NCM=prm['NCM'])
+
+        for j, ism, jpr0, jprn in bands[k:k+nbtab]:
+            if( j % 10*MFct == 0 ):
+                print( j, "row started at ", 
+                     datetime.now().strftime('%H:%M:%S'))
+            rowcels, rowNs, rowshw = smcelrow(Bathy, tabs, j, ism,
+                                              [jpr0, jprn], prm, timer,
+                                              lmask=lmask, obstr=obstr)
+            smcels.append( rowcels )
+            Ns += rowNs
+            nshalw += rowshw
+
+    return np.vstack( smcels ), Ns, nshalw
+
+## End of smcelbands function.
+
+
+def smcelwork(args):
+    """
+    Pool worker to run smcelbands on Bathy held in shared memory or
+    on a lazy bathy source opened again in this process.  A timed run 
+    returns the worker timer dict as an extra result item.  Shared 
+    bit-packed masks and refinement level mask are attached if their
+    descriptors are given, and the obstruction field as the Bathy.
+    """
+
+    import numpy as np
+    from multiprocessing import shared_memory
+    from smcellgen import smcelbands
+    from smcellsat import satattach
+    from smctimer import SMCTimer
+
+    bsrc, shape, dtype, bands, prm, timed, bitdesc, lmdesc, osrc = args
+    timer = SMCTimer('smcelwork') if( timed ) else None
+    shms = []
+    bits = None
+    lmask = None
+    if( bitdesc is not None ):
+        shms, masks = satattach( bitdesc[1] )
+        bits = dict( bitdesc[0], masks=masks )
+    if( lmdesc is not None ):
+        lshm, larr = satattach( lmdesc )
+        shms += lshm
+        lmask = larr['lmask']
+    obstr = osrc
+    if( isinstance(osrc, dict) ):
+        oshm, oarr = satattach( osrc )
+        shms += oshm
+        obstr = oarr['obstr']
+    try:
+        if( not isinstance(bsrc, str) ):
+            result = smcelbands(bsrc, bands, prm, timer=timer, bits=bits,
+                                lmask=lmask, obstr=obstr)
+        else:
+            shm = shared_memory.SharedMemory(name=bsrc)
+            shms.append( shm )
+            Bathy = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+            result = smcelbands(Bathy, bands, prm, timer=timer, bits=bits,
+                                lmask=lmask, obstr=obstr)
+            del Bathy
+    finally:
+        del bits, lmask, obstr
+        for shm in shms: shm.close()
+
+    if( timed ):
+        result = result + ( timer.todict(), )
+    return result
+
+## End of smcelwork function.
+
+
+def smcelpool(Bathy, bands, prm, nproc, timer=None, bits=None,
+              lmask=None, obstr=None):
+    """
+    Share row bands out to a pool of nproc processes.  Bathy array is
+    copied once into shared memory instead of being pickled for every 
+    chunk, while a lazy bathy source is passed to and read by workers.
+    Bit-packed masks in bits, the refinement level mask lmask and an
+    obstruction field array obstr are shared in memory as well.
+    """
+
+    import numpy as np
+    from multiprocessing import Pool, shared_memory
+    from smcellgen import smcelwork
+    from smcellsat import satshare
+
+## A few chunks per process to balance land and sea rows.
+    nchnk = max([1, len(bands)//(4*nproc)])
+    chunks = [ bands[k:k+nchnk] for k in range(0, len(bands), nchnk) ]
+    print(" Row bands and chunks for", nproc, "processes =", 
+            len(bands), len(chunks))
+
+    shms = []
+    bitdesc = None
+    lmdesc = None
+    try:
+        if( bits is not None ):
+            shms, mdesc = satshare( bits['masks'] )
+            bitdesc = ( {key: bits[key] for key in bits if key != 'masks'},
+                        mdesc )
+        if( lmask is not None ):
+            lshm, lmdesc = satshare( {'lmask': np.asarray(lmask)} )
+            shms += lshm
+        osrc = None
+        if( obstr is not None ):
+            oshm, osrc = satshare( {'obstr': np.ma.filled(obstr, 0.0)} )
+            shms += oshm
+
+        if( not isinstance(Bathy, np.ndarray) ):
+            args = [ (Bathy, Bathy.shape, Bathy.dtype, chunk, prm, 
+                      timer is not None, bitdesc, lmdesc, osrc) 
+                      for chunk in chunks ]
+        else:
+            barr = np.asarray(Bathy)
+            shm = shared_memory.SharedMemory(create=True, 
+                                             size=max([1,barr.nbytes]))
+            shms.append( shm )
+            sbathy = np.ndarray(barr.shape, dtype=barr.dtype, 
+                                buffer=shm.buf)
+            sbathy[:,:] = barr
+            del sbathy
+            args = [ (shm.name, barr.shape, barr.dtype.str, chunk, prm,
+                      timer is not None, bitdesc, lmdesc, osrc) 
+                      for chunk in chunks ]
+
+        with Pool(processes=nproc) as pool:
+            results = pool.map(smcelwork, args)
+    finally:
+        for shm in shms:
+            shm.close()
+            shm.unlink()
+
+## Merge chunk results in band order.
+    smcels = np.vstack( [ rst[0] for rst in results ] )
+    Ns = np.sum( [ rst[1] for rst in results ], axis=0 )
+    nshalw = sum( [ rst[2] for rst in results ] )
+    if( timer is not None ):
+        for rst in results: timer.merge( rst[3] )
+
+    return smcels, Ns, nshalw
+
+## End of smcelpool function.
+
+
+def smcelsplice(celfls, newcels, jrows, jArcBdy=None):
+    """
+    Replace cells of existing cell files within the given j row ranges
+    by newly generated cells.  If Arctic part file is included, its
+    cells duplicated in the global part (j < jArcBdy) are dropped.
+    """
+
+    import numpy as np
+    from readcell import readcell
+
+    headrs, oldcels = readcell( celfls )
+    oldcels = oldcels.reshape(-1, 5)
+    if( len(celfls) > 1 and jArcBdy is not None ):
+        ng = int( headrs[0].split()[0] )
+        oldarc = oldcels[ng:]
+        oldcels = np.vstack( (oldcels[:ng], oldarc[oldarc[:,1] >= jArcBdy]) )
+
+## Drop old cells within regenerated j rows.
+    keep = np.ones( oldcels.shape[0], dtype=bool )
+    for jr0, jr1 in jrows:
+        keep &= ~( (oldcels[:,1] >= jr0) & (oldcels[:,1] < jr1) )
+    print(" Old cells kept, dropped and new cells =", np.sum(keep),
+            np.sum(~keep), newcels.shape[0])
+
+    return np.vstack( (oldcels[keep], newcels) ).astype(int)
+
+## End of smcelsplice function.
+
+
+def smcelckpt(ckfile, ckkey, smcels, Ns, nshalw, jdone):
+    """
+    Save cells, counters and start rows of completed row bands into a
+    checkpoint file, replacing the old one only when fully written.
+    """
+
+    import os
+    import numpy as np
+
+    with open(ckfile+'.tmp', 'wb') as flhdl:
+        np.savez_compressed(flhdl, key=np.array(ckkey), 
+                            cels=np.asarray(smcels, dtype=np.int32 if(
+                                 np.shape(smcels)[1] == 5 ) else float),
+                            Ns=np.asarray(Ns), nshalw=np.array(nshalw),
+                            jdone=np.asarray(jdone, dtype=int))
+    os.replace(ckfile+'.tmp', ckfile)
+
+    return 0
+
+## End of smcelckpt function.
+
+
+def smcelresume(ckfile, ckkey):
+    """
+    Load a checkpoint file saved by smcelckpt.  None is returned if 
+    the file is missing or saved with other grid parameters.
+    """
+
+    import os
+    import numpy as np
+
+    if( not os.path.exists(ckfile) ):
+        print(" No checkpoint file "+ckfile+" and all bands are run.")
+        return None
+
+    with np.load(ckfile) as ckdat:
+        if( str(ckdat['key']) != ckkey ):
+            print(" *** Checkpoint "+ckfile+" unfit and is ignored.")
+            return None
+        cels = ckdat['cels']
+        ckpt = { 'cels': cels.astype(int) if( cels.shape[1] == 5 ) else cels,
+                 'Ns': ckdat['Ns'], 'nshalw': int(ckdat['nshalw']), 
+                 'jdone': ckdat['jdone'].tolist() }
+    print(" Resumed row bands and cells from "+ckfile+" =", 
+            len(ckpt['jdone']), ckpt['cels'].shape[0])
+
+    return ckpt
+
+## End of smcelresume function.
+
+
+def smcelband(j, jprasn, Merg):
+    """
+    Row band [j, ism, jpr0, jprn] at row j, with the x-size merging
+    factor ism of its size zone between merging parallel rows jprasn,
+    at most Merg, and the zone rows jpr0 to jprn for size-1 cells.
+    """
+
+## Find j size-changing zone and merging number, ims. 
+    jprset = 0 if( j < jprasn[0] ) else 18
+    for jpr in range(19): 
+        if( j >= jprasn[jpr] and j < jprasn[jpr+1] ): 
+            jprset = jpr
+    ism = 2**abs(9-jprset)
+## Set maximum merging to be Merg.
+    if( ism > Merg ): ism = Merg
+
+## No size-1 cells within 2 rows of size-changing parallel. 
+    return [j, ism, jprasn[jprset]+2, jprasn[jprset+1]-2]
+
+## End of smcelband function.
+
+
+def smcelsetup(ndzlonlat, mlvlxy0, Global=True, Arctic=False, 
+        depmin=0.0, dshalw=0.0, wlevel=0.0, GlbArcLat=84.4):
+    """
+    Work out SMC grid loop ranges, merging factors and MFct-row bands
+    [j, ism, jpr0, jprn] for smcellgen and smcelcount.  Return a dict
+    of the row band constants prm, the bands and the grid parameters.
+    """
+
+    import numpy  as np
+    from smcellgen import recursion_add, smcelband
+
 
 ## Bathy domain nlon and nlat and first point zlon zlat.
     nlon = int(ndzlonlat[0])
@@ -58,7 +527,6 @@ def smcellgen(Bathy, ndzlonlat, mlvlxy0, FileNm='./SMC61250',
     y0lat = mlvlxy0[2]
     MFct = 2**(NLvl-1)
     MFc2 = MFct*2
-    MFc3 = MFct*3
 
 ## Find out row numbers of merging parallels of sizs-1 grid.
 ## It must be multiple of MFct as SMC grid level requires.
@@ -169,9 +637,6 @@ def smcellgen(Bathy, ndzlonlat, mlvlxy0, FileNm='./SMC61250',
 
     if( Abrt ): exit()
 
-## Initialise cell count variables
-    Ns = np.zeros( (NLvl+1), dtype=int )
-
 ## Bathy is assumed to be elevation above sea level so depth below sea level 
 ## is negative.  Minimum depth, depmin, must be >= water level, wlevel.
     if( depmin < wlevel ):
@@ -188,19 +653,28 @@ def smcellgen(Bathy, ndzlonlat, mlvlxy0, FileNm='./SMC61250',
 
     print(' WLevel, depmin, dshalw, NLvshlw = \n', 
             wlevel, depmin, dshalw, NLvshlw)
-    nshalw = 0
 
-## Size zone parallel index
-    jprold=0
+## Size zone parallel row
+    jprold=None
    
 ## Loop ends of i/j-loop at bathy data end.
     iend = istart + iexpnd
     jend = jstart + jexpnd - MFct
-    
-## Initial smcels as a list to append cell arrays.
-    smcels = []
-    print(" Cell generating started at ",
-            datetime.now().strftime('%F %H:%M:%S'))
+
+## Wrapping bathy is padded with the maximum i-step on both sides,
+## or more if a regional grid goes beyond the bathy east end.
+    ipad = 0
+    if( WrapLon ): ipad = max([ MFct*Merg, iend + MFct*Merg - nlon ])
+    else: NCM = nlon
+
+## Row band constants shared by smcelrow calls.
+    prm = {'NLvl': NLvl, 'NLvshlw': NLvshlw, 'istart': istart, 
+           'iend': iend, 'ishft': ishft, 'jequt': jequt, 
+           'WrapLon': WrapLon, 'NCM': NCM, 'ipad': ipad,
+           'wlevel': wlevel, 'depmin': depmin, 'dshalw': dshalw }
+
+## Work out x-size merging factor for each MFct-row band first.
+    bands = []
 
 ## latitude j loop at step of MFct rows. 
     for j in range(jstart, jend, MFct):
@@ -208,99 +682,215 @@ def smcellgen(Bathy, ndzlonlat, mlvlxy0, FileNm='./SMC61250',
 ## Full grid jj and latitude for this row
         jj=j + jequt
         yj=ylat[j]
-        if( j % 10*MFct == 0 ):
-            print( j, "row started at ", 
-                 datetime.now().strftime('%H:%M:%S'))
-
-## Find j size-changing zone and merging number, ims. 
-        for jpr in range(19): 
-            if( j >= jprasn[jpr] and j < jprasn[jpr+1] ): 
-                jprset = jpr
-                ism = 2**abs(9-jprset)
-## Set maximum merging to be Merg.
-        if( ism > Merg ): ism = Merg
 
-        if( jprset != jprold ): 
-            jprold = jprset
+        band = smcelband(j, jprasn, Merg)
+        if( band[2] != jprold ): 
+            jprold = band[2]
             print ("Row j, jj, x-size ism and latitude yj=", 
-                        j, jj, ism, yj)
+                        j, jj, band[1], yj)
 
-## Set i-merging factor for i-loop step.
-        iFct=ism*MFct
-        iFc2=iFct*2
-        iFc3=iFct*3
+        bands.append( band )
 
-## For global grid, loop over all longitude point.
-        for i in range(istart, iend, iFct):
+## End of j loop. 
 
-## Extract a sub-array from Bathy for cell generating loop.
-            subathy = np.zeros((MFc3, iFc3), dtype=float) 
+    grid = {'nlon': nlon, 'nlat': nlat, 'dlon': dlon, 'dlat': dlat, 
+            'zlon': zlon, 'zlat': zlat, 'ylat': ylat, 'NLvl': NLvl, 
+            'MFct': MFct, 'MFc2': MFc2, 'Merg': Merg, 'jequt': jequt, 
+            'jArc': jArc if( Arctic ) else None, 'depmin': depmin, 
+            'dshalw': dshalw, 'jstart': jstart, 'jend': jend, 
+            'ipad': ipad, 'jprasn': jprasn, 'prm': prm, 'bands': bands }
 
-            if( WrapLon ): 
-                ii = (i + ishft + NCM) % NCM
-                for ib in range(iFc3):
-                    ik = (i+ib-iFct+NCM ) % NCM
-                    subathy[:,ib] = Bathy[j-MFct:j+MFc2,ik] 
-            else:
-                ii = i + ishft 
-                subathy[:,:] = Bathy[j-MFct:j+MFc2, 
-                                     i-iFct:i+iFc2]
+    return grid
 
-## Define a logical array in central area to control loop
-            subchck=subathy[MFct:MFc2,iFct:iFc2]<depmin 
+## End of smcelsetup function.
 
-## Count any sea points within subathy deeper than dshalw. 
-            nsubdep=np.sum(subathy[MFct:MFc2,iFct:iFc2] < \
-                           dshalw )
 
-## Loop over NLvl to define different sized cells according to 
-## open sea area, starting with base level of size-MFct cell.
-            levl = NLvl
-            while( levl > 0 ):
-                if( np.sum(subchck) == 0 ):
-                    break
-                elif( nsubdep == 0 and levl > NLvshlw ):
-                    nshalw += 1
-#                   print(' Shallow water skip levl, i, j =', 
-#                                              levl, i, j) 
-                else:
-                    jchk = 2**(levl - 1)
-                    irng = jchk*ism
-                    jdk = recursion_add(levl)
-                    idg = jdk*ism 
+def smcellgen(Bathy, ndzlonlat, mlvlxy0, FileNm='./SMC61250', 
+        Global=True, Arctic=False, depmin=0.0, dshalw=0.0, 
+        wlevel=0.0, GlbArcLat=84.4, nproc=1, update=None, 
+        sattabs=None, timer=None, bitmask=None, checkpoint=0, 
+        resume=False, Save=True, refine=None, obstr=None, **kwargs): 
+    """ 
+    Generate SMC grid cells from size-1 resolution bathy.
+    Bathy could be an array or a lazy row band source from readbathy.
+    Row bands are shared out to nproc processes if nproc > 1.
+    If update=[lon0, lat0, lon1, lat1] box of changed bathy is given,
+    only row bands affected by the box are regenerated and spliced 
+    into the existing FileNm cell files.
+    Summed-area tables prebuilt by smcelbatch could be given as sattabs.
+    Band tables are unpacked from bit-packed sea masks if bitmask is
+    True, when the masks are built from Bathy, or smcelbits masks.
+    If checkpoint > 0, cells of completed row bands are saved every 
+    checkpoint bands into FileNm+'Ckpt.npz' and a run with resume=True
+    skips the saved bands.  The file is removed when cells are saved.
+    Stage, row band and level times and cell counts are recorded in
+    timer if a smctimer SMCTimer object is given.
+    Cells are returned as an smcells SMCCells object and the cell files
+    are only saved if Save is True.
+    Cell levels are set by refine, a list of smcelrefn refinement
+    polygon dicts or a level index mask built by smcelrefn refnmask.
+    If obstr is given, as an obstruction ratio field on the bathy grid,
+    the obstruction ratio and sea depth minimum, maximum and variance
+    of each cell are worked out in the same pass and kept as 'Obst' and
+    'Dsts' infos of the global part cells, saved as FileNm+'Obst.dat'
+    (as SMC61250Obstr) and 'Dsts.dat'.
+    """
 
-                    for jb in range(0,MFct,jchk):
-## No size-1 cells within 2 rows of size-changing parallel. 
-                        if( ( levl > 1 ) or ( levl==1 and \
-                             (jprasn[jprset]+2 <= j+jb < jprasn[jprset+1]-2) ) ):
-                            for ib in range(0,iFct,irng):
-## Check cell and its surrounding points are all sea points 
-## to define the cell. 
-                                if( (np.sum( subchck[ \
-       jb:jb+jchk, ib:ib+irng] )==irng*jchk) and (np.sum( \
-       subathy[jb+MFct-jdk:jb+MFct+jchk+jdk, \
-       ib+iFct-idg:ib+iFct+irng+idg]<depmin ) == \
-       (irng+2*idg)*(jchk+2*jdk)) ):
-                                    bsum=np.sum( subathy[ \
-       jb+MFct:jb+MFct+jchk, ib+iFct:ib+iFct+irng] )
+    import os
+    import time
+    import json
+    import numpy  as np
+    import pandas as pd
+    from smcellgen import recursion_add, smcelbands, smcelpool
+    from smcellgen import smcelsplice, smcelckpt, smcelresume
+    from smcellgen import smcelsetup
+    from smcellpyr import cellstat
+    from smctimer import timing
+    from smcells import SMCCells
+    from datetime import datetime
 
-## Use difference from water level to define water depth.
-                                    kdepth=np.ceil( wlevel \
-       -bsum/float(irng*jchk) ).astype(int)
-                                    subcel=[ii+ib, jj+jb, \
-                                      irng, jchk, kdepth]
-                                    subchck[jb:jb+jchk, \
-                                      ib:ib+irng]=False
-                                    smcels.append( subcel )
-                                    Ns[levl] += 1
-                                    if( Ns[levl] < 3 ):  
-                                        print( jchk, 
-       ' size i, j, yj, kdepth=', ii+ib, jj+jb, yj, kdepth) 
-
-## Down one level if any sea points left.
-                levl -= 1 
-
-## End of i, j loops. 
+## Grid loop ranges and row bands, shared with smcelcount.
+    grid = smcelsetup(ndzlonlat, mlvlxy0, Global=Global, Arctic=Arctic,
+                      depmin=depmin, dshalw=dshalw, wlevel=wlevel, 
+                      GlbArcLat=GlbArcLat)
+    nlon, nlat, dlat = grid['nlon'], grid['nlat'], grid['dlat']
+    zlat, ylat, jequt = grid['zlat'], grid['ylat'], grid['jequt']
+    NLvl, MFct, MFc2 = grid['NLvl'], grid['MFct'], grid['MFc2']
+    Merg, jArc, ipad = grid['Merg'], grid['jArc'], grid['ipad']
+    depmin, dshalw = grid['depmin'], grid['dshalw']
+    jstart, jend = grid['jstart'], grid['jend']
+    prm, bands = grid['prm'], grid['bands']
+    Ns = np.zeros( (NLvl+1), dtype=int )
+    nshalw = 0
+
+## Incremental mode only regenerates the row bands whose cell checks 
+## see any bathy rows within the update box, including the halo width
+## of the largest cells.  JGLi18Oct2026
+    if( update is not None ):
+        jbox0 = int( np.floor( (update[1] - zlat)/dlat ) )
+        jbox1 = int( np.ceil( (update[3] - zlat)/dlat ) ) + 1
+        jhalo = recursion_add(NLvl)
+        bands = [ bnd for bnd in bands if( bnd[0] - jhalo < jbox1 
+                  and bnd[0] + MFct + jhalo > jbox0 ) ]
+        print(" Update box and bathy rows =", update, jbox0, jbox1)
+        print(" Number of row bands to regenerate =", len(bands))
+        if( obstr is not None ):
+            print(" *** Cell obstruction is not updated in update mode.")
+            obstr = None
+
+## Summed-area tables shared by smcelbatch jobs are only used if they 
+## are built with the same thresholds and cover all the row bands.
+    if( sattabs is not None and len(bands) > 0 ):
+        if( sattabs['depmin'] != depmin or sattabs['dshalw'] != dshalw 
+            or sattabs['ipad'] < ipad or sattabs['j0'] > bands[0][0]-MFct 
+            or sattabs['j1'] < bands[-1][0]+MFc2 ):
+            print(" *** Given sattabs unfit and tables will be rebuilt.")
+            sattabs = None
+
+## Bit-packed masks hold 1 bit per point for each threshold, so only 
+## the masks and one row band of float bathy are in memory at a time.
+    if( isinstance(bitmask, dict) and len(bands) > 0 ):
+        if( depmin not in bitmask['masks'] or 
+            dshalw not in bitmask['masks'] or 
+            bitmask['j0'] > bands[0][0]-MFct or 
+            bitmask['j1'] < min([nlat, bands[-1][0]+MFc2]) ):
+            print(" *** Given bitmask unfit and masks will be rebuilt.")
+            bitmask = True
+    if( bitmask is True ):
+        from smcelbits import smcelbits
+        with timing(timer, 'bitmask'):
+            bitmask = smcelbits(Bathy, [depmin, dshalw], 
+                                jrange=[jstart-MFct, jend+MFc2])
+    if( bitmask is False ): bitmask = None
+
+## Refinement polygons are rasterised once into a level index mask.
+    lmask = None
+    if( refine is not None ):
+        if( isinstance(refine, np.ndarray) ):
+            lmask = refine
+        else:
+            from smcelrefn import refnmask
+            with timing(timer, 'refine'):
+                lmask = refnmask(refine, ndzlonlat, NLvl)
+        if( lmask.shape != (nlat, nlon) ):
+            print(" *** Refinement mask shape unfit:", lmask.shape)
+            exit()
+
+## Checkpoint is only valid for the same grid and row bands.
+    ckfile = FileNm+'Ckpt.npz'
+    ckdic = {'ndzlonlat': [float(x) for x in ndzlonlat], 
+             'mlvlxy0': [float(x) for x in mlvlxy0],
+             'prm': prm, 'Global': Global, 
+             'bands': [int(bnd[0]) for bnd in bands]}
+    if( obstr is not None ):
+        import hashlib
+        ckdic['obstr'] = hashlib.md5( np.ascontiguousarray(
+                             np.ma.filled(obstr, 0.0)) ).hexdigest()
+    if( lmask is not None ):
+        import hashlib
+        ckdic['refine'] = hashlib.md5( np.ascontiguousarray(lmask) 
+                                       ).hexdigest()
+    ckkey = json.dumps( ckdic, sort_keys=True, default=float )
+    celist = [ np.zeros((0,5 if( obstr is None ) else 9), dtype=int) ]
+    jdone = []
+    if( resume ):
+        ckpt = smcelresume(ckfile, ckkey)
+        if( ckpt is not None ):
+            celist.append( ckpt['cels'] )
+            Ns += ckpt['Ns']
+            nshalw = ckpt['nshalw']
+            jdone = ckpt['jdone']
+    jskip = set( jdone )
+    todo = [ bnd for bnd in bands if( bnd[0] not in jskip ) ]
+
+    print(" Cell generating started at ",
+            datetime.now().strftime('%F %H:%M:%S'))
+
+## Row bands are shared out to nproc processes in chunks, with the
+## Bathy array in shared memory.  Chunk results are merged in band
+## order so the sorted cells are the same as a single process run.
+## Bands are run in groups of checkpoint bands if it is set.
+    nbck = checkpoint if( checkpoint > 0 ) else max([1, len(todo)])
+    with timing(timer, 'bands'):
+        for k in range(0, len(todo), nbck):
+            grp = todo[k:k+nbck]
+            if( sattabs is not None ):
+                gcels, gNs, gshw = smcelbands(Bathy, grp, prm, 
+                                      tabs=sattabs, timer=timer, 
+                                      lmask=lmask, obstr=obstr)
+            elif( nproc > 1 and len(grp) > 1 ):
+                gcels, gNs, gshw = smcelpool(Bathy, grp, prm, nproc,
+                                      timer=timer, bits=bitmask, 
+                                      lmask=lmask, obstr=obstr)
+            else:
+                gcels, gNs, gshw = smcelbands(Bathy, grp, prm, 
+                                      timer=timer, bits=bitmask,
+                                      lmask=lmask, obstr=obstr)
+            celist.append( gcels )
+            Ns += gNs
+            nshalw += gshw
+            jdone += [ int(bnd[0]) for bnd in grp ]
+            if( checkpoint > 0 ):
+                smcelckpt(ckfile, ckkey, np.vstack(celist), Ns, nshalw,
+                          jdone)
+                print(" Checkpoint saved after row bands", len(jdone), 
+                      "at", datetime.now().strftime('%H:%M:%S'))
+    smcels = np.vstack( celist )
+
+## Splice new row band cells into existing cells, removing the old 
+## polar cell as it is defined again below.
+    if( update is not None ):
+        jrows = [ [bnd[0]+jequt, bnd[0]+jequt+MFct] for bnd in bands ]
+        if( Global and Arctic ):
+            jrows.append( [nlat-MFct+jequt, nlat+jequt] )
+        celfls = [ FileNm+'Cels.dat' ]
+        if( Arctic ): celfls.append( FileNm+'BArc.dat' )
+        with timing(timer, 'splice'):
+            smcels = smcelsplice(celfls, smcels, jrows, jArc+2*MFc2 
+                                 if( Arctic ) else None)
+        for levl in range(1, NLvl+1):
+            Ns[levl] = np.sum( smcels[:,3] == 2**(levl-1) )
+    smcels = smcels.tolist()
 
 ## For global grid with Arctic part, define north polar cell. 
     if( Global and Arctic ):
@@ -319,6 +909,11 @@ def smcellgen(Bathy, ndzlonlat, mlvlxy0, FileNm='./SMC61250',
         dsum = np.sum( Bathy[j:nlat,:] )
         kdepth = int( round( wlevel - dsum/(MFct*nlon) ) )
         smcels.append( [0, jj, MFct*ism, MFct, kdepth] )
+        if( obstr is not None ):
+            oband = np.ma.filled( obstr[j:nlat,:], 0.0 )
+            smcels[-1] += cellstat(np.asarray(Bathy[j:nlat,:], dtype=float),
+                                   oband, [0], [0], MFct, nlon, depmin,
+                                   wlevel)[0].tolist()
         Ns[NLvl] += 1
 
 ## All cells are done.
@@ -326,27 +921,34 @@ def smcellgen(Bathy, ndzlonlat, mlvlxy0, FileNm='./SMC61250',
     NL = sum(Ns[:])
     print(" *** Total cells Number =", NL)
     print(" *** Shallow water number in all sizes =", nshalw) 
+    if( timer is not None ):
+        timer.count('Ns', Ns[1:])
+        timer.count('nshalw', nshalw)
+        timer.count('bands', len(bands))
 
 ## Follow Qingxiang's method to sort smcels before save it.
-    smcelsdf=pd.DataFrame(smcels, columns=['i','j','di','dj','kdp'])
-    smcelsdf.sort_values(by=['dj','j','i'], inplace=True)
-    smcels = np.array(smcelsdf)
-
-## Cell array output format for each cell.
-    fmtcel='%6d %5d %4d %3d %5d'
+    with timing(timer, 'sort'):
+        columns = ['i','j','di','dj','kdp']
+        if( obstr is not None ): columns += ['obs','dmin','dmax','dvar']
+        smcelsdf=pd.DataFrame(smcels, columns=columns)
+        smcelsdf.sort_values(by=['dj','j','i'], inplace=True)
+        smcels = np.array(smcelsdf)
+
+## Cell statistics columns are split off in the sorted cell order.
+    if( obstr is not None ):
+        celstt = smcels[:,5:]
+        smcels = smcels[:,:5].astype(int)
 
 ## Separate Arctic and global parts out of full global cells. 
+    twrite = time.perf_counter()
     if( Arctic ):
         jbdy = MFc2
+        if( obstr is not None ): celstt = celstt[smcels[:,1]<jArc+2*jbdy]
         smcArc= smcels[smcels[:,1]>=jArc]
         nbglo = smcArc[smcArc[:,1]< jArc+jbdy].shape[0]
         nbArc = smcArc[smcArc[:,1]< jArc+2*jbdy].shape[0]-nbglo
         nArct = smcArc.shape[0]
-        hdr = f'{nArct:8d} {nbglo:5d} {nbArc:5d}'
-        Cell_Arct = FileNm +'BArc.dat'
-        print(' ... saving BArc.dat with header '+hdr )
-        np.savetxt(Cell_Arct, smcArc, fmt=fmtcel, header=hdr, 
-                   comments='')
+        hdrArc = f'{nArct:8d} {nbglo:5d} {nbArc:5d}'
 ## Separate Global part out of the cells by jArc value
         smcels = smcels[smcels[:,1]<jArc+2*jbdy]
         Ns[NLvl] = Ns[NLvl] - nArct + nbArc + nbglo
@@ -357,16 +959,30 @@ def smcellgen(Bathy, ndzlonlat, mlvlxy0, FileNm='./SMC61250',
     if( Nsum != Ns[0] ):
         print(" *** Total number not matching sub-sum:", Ns[0], Nsum)
     
-## Save the cell array, anyway.
+## Keep the global and Arctic parts as they are saved in cell files.
     hdr = ''.join( [f"{n:8d}" for n in Ns] ) 
-    print(' ... saving Cels.dat with header '+hdr )
-    Cell_file = FileNm+'Cels.dat'
-    np.savetxt(Cell_file, smcels, fmt=fmtcel, header=hdr, comments='')
+    cells = SMCCells( FileNm )
+    cells.add('Cels', smcels, hdr)
+    if( Arctic ): cells.add('BArc', smcArc, hdrArc)
+
+## Obstruction as SMC61250Obstr with maximum 90% blocking, and depth 
+## statistics of the global part cells.
+    if( obstr is not None ):
+        ng = smcels.shape[0]
+        Kobstr = np.minimum( 90, np.rint( 100.0*celstt[:,0] ) ).astype(int)
+        cells.addinfo('Obst', Kobstr, "{:8d} {:5d}".format(ng, 1), '%4d')
+        cells.addinfo('Dsts', celstt[:,1:], "{:8d} {:5d}".format(ng, 3),
+                      '%9.2f %9.2f %12.3f')
+    if( Save ): cells.save()
+    if( (checkpoint > 0 or resume) and os.path.exists(ckfile) ):
+        os.remove(ckfile)
+    if( timer is not None ):
+        timer.addtime('write', time.perf_counter() - twrite)
 
     print( " smcellgen finished at", 
           datetime.now().strftime('%F %H:%M:%S') )
 
-    return 0
+    return cells
 
 ## End of smcellgen function.
 
@@ -426,8 +1042,11 @@ def main():
     y0lat = 0.0
     mlvlxy0 = [ NLvl, x0lon, y0lat ]
 
+## Number of processes to share out the row bands.
+    nproc = 1
+
     smcellgen(Bathy, ndzlonlat, mlvlxy0, FileNm=Wrkdir+GridNm, 
-              Global=Global, Arctic=Arctic)
+              Global=Global, Arctic=Arctic, nproc=nproc)
     
 ## End of main program.
 
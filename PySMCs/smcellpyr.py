@@ -0,0 +1,148 @@
+"""
+## Per-level pooled sea mask and mean value pyramid for SMC cells.
+##
+## For each resolution level levl the row band of MFct rows is divided
+## into blocks of jchk = 2**(levl-1) rows and irng = jchk*ism columns,
+## the same blocks as the cells of that level.  The pyramid holds for
+## each level the sea point count of each block, an "all sea" mask,
+## an "all sea" mask of the block dilated by its halo check width and
+## the block mean depth, so that cell acceptance in smcellgen and
+## smcellbdy becomes a lookup.  Block means of any other field, such as
+## the obstruction ratio in SMC61250Obstr, are given by pyrmean.  The
+## obstruction ratio and depth statistics of accepted cells are given
+## by cellstat during cell generation.
+##
+## Level arrays are laid out as the taken arrays of smcelrow, with
+## MFct//jchk rows and the blocks of the given MFct-blocks iblk side by
+## side, so level array column c is the band column c*irng.
+##
+## Block sums are added in the same order as np.sum over a subathy
+## window in the loop versions of the cell generators, so the mean
+## depths and the cell depths are identical to those versions.
+##
+## First created:    JGLi18Oct2026
+##
+"""
+
+def pyrmean(field, jchk, irng, jrows, icols, iwide=None, NCM=0):
+    """
+    Block means of field over blocks of jchk rows and irng columns,
+    starting at rows jrows and columns icols, wrapped at NCM if > 0.
+    Full rows of iwide wide blocks are summed as contiguous arrays.
+    """
+    import numpy  as np
+
+    jrows = np.asarray(jrows)
+    icols = np.asarray(icols)
+    nJ, nI = jrows.size, icols.size
+
+    jm = jrows[:,None] + np.arange(jchk)[None,:]
+    im = icols[:,None] + np.arange(irng)[None,:]
+    if( NCM > 0 ): im = im % NCM
+    sub = np.asarray(field[jm.ravel()][:, im.ravel()], dtype=float)
+    sub = sub.reshape(nJ, jchk, nI, irng).transpose(0, 2, 1, 3)
+
+## A window narrower than its sub-array is not contiguous and np.sum
+## over it is matched by summing a padded copy.
+    if( iwide is not None and irng == iwide ):
+        blk = np.ascontiguousarray( sub )
+    else:
+        blk = np.zeros((nJ, nI, jchk, irng+1), dtype=float)
+        blk[:,:,:,:irng] = sub
+    bsum = np.sum( blk[:,:,:,:irng], axis=(2,3) )
+
+    return bsum/float(irng*jchk)
+
+## End of pyrmean function.
+
+
+def smcelpyr(bband, tabs, j, ism, iblk, NLvl, NCM=0, halo=True,
+             iwide=None, levels=None):
+    """
+    Pooled sea mask pyramid of the MFct-row band at row j over the
+    MFct-blocks starting at columns iblk, for levels 1 to NLvl.
+    Counts use the 'sea' summed-area table in tabs.  Mean depths use
+    band rows bband (full bathy rows j:j+MFct) if it is not None.
+    Return a list indexed by level of dicts of the level arrays.
+    """
+    import numpy  as np
+    from smcellgen import recursion_add
+    from smcellsat import satsums
+
+    MFct = 2**(NLvl-1)
+    iFct = ism*MFct
+    iblk = np.asarray(iblk)
+    if( levels is None ):
+        levels = range(1, NLvl+1)
+
+    pyr = [ None ]*(NLvl+1)
+    for levl in levels:
+        jchk = 2**(levl - 1)
+        irng = jchk*ism
+        area = irng*jchk
+
+## Block start rows and absolute columns in bathy indexes.
+        jbs = np.arange(0, MFct, jchk)
+        ibs = ( np.arange(iblk.size)[:,None]*iFct +
+                np.arange(0, iFct, irng)[None,:] ).ravel()
+        icel = iblk[ibs//iFct] + ibs % iFct
+        jj = (j + jbs)[:,None]
+        ii = icel[None,:]
+
+        lvl = {'jchk': jchk, 'irng': irng}
+        lvl['nsea'] = satsums(tabs, 'sea', jj, jj+jchk, ii, ii+irng)
+        lvl['allsea'] = lvl['nsea'] == area
+
+## Block and its surrounding check edge are all sea points.
+        if( halo ):
+            jdk = recursion_add(levl)
+            idg = jdk*ism
+            nhlo = satsums(tabs, 'sea', jj-jdk, jj+jchk+jdk,
+                           ii-idg, ii+irng+idg)
+            lvl['hsea'] = nhlo == (irng+2*idg)*(jchk+2*jdk)
+
+        if( bband is not None ):
+            lvl['mdep'] = pyrmean(bband, jchk, irng, jbs, icel,
+                                  iwide=iwide, NCM=NCM)
+        pyr[levl] = lvl
+
+    return pyr
+
+## End of smcelpyr function.
+
+
+def cellstat(bband, oband, jb, icel, jchk, irng, depmin=0.0, wlevel=0.0,
+             NCM=0):
+    """
+    Obstruction ratio and sea point depth minimum, maximum and variance
+    of cells of jchk rows and irng columns at band rows jb and bathy
+    columns icel of the band rows bband.  The obstruction ratio is the
+    mean of the band rows oband of an obstruction field.
+    Return an array of the 4 values of each cell.
+    """
+    import numpy  as np
+
+    jb = np.asarray(jb)
+    icel = np.asarray(icel)
+    jm = jb[:,None,None] + np.arange(jchk)[None,:,None]
+    im = icel[:,None,None] + np.arange(irng)[None,None,:]
+    if( NCM > 0 ): im = im % NCM
+    sub = np.asarray(bband[jm, im], dtype=float)
+    sea = sub < depmin
+
+    obs = np.sum( oband[jm, im], axis=(1,2) )/float(irng*jchk)
+
+## Depth statistics of sea points, all points for all-sea cells.
+    nsea = np.maximum( 1, np.sum(sea, axis=(1,2)) )
+    dep = wlevel - sub
+    dmin = np.min( np.where(sea, dep,  np.inf), axis=(1,2) )
+    dmax = np.max( np.where(sea, dep, -np.inf), axis=(1,2) )
+    dmea = np.sum( np.where(sea, dep, 0.0), axis=(1,2) )/nsea
+    dvar = np.sum( np.where(sea, (dep - dmea[:,None,None])**2, 0.0),
+                   axis=(1,2) )/nsea
+
+    return np.column_stack( (obs, dmin, dmax, dvar) )
+
+## End of cellstat function.
+
+## End of smcellpyr.py program.
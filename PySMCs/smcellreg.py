@@ -0,0 +1,214 @@
+"""
+## Function smcellreg to generate the inner cells and boundary cells of
+## a rectangular regional SMC grid in one sweep over the bathymetry.
+## It does the work of smcellgen and smcellbdy for a regional grid with
+## one set of summed-area tables and one bathy read per row band, and
+## saves the same Cels.dat and Bdys.dat files as the two functions.
+##
+## The combined cells are the boundary cells plus the inner cells not
+## in any boundary edge blocks, sorted as the other cell files and saved
+## in FileNm+'Comb.dat' with the cell counts of each level as header.
+##
+## First created:    JGLi18Oct2026
+##
+"""
+
+def smcellreg(Bathy, ndzlonlat, mlvlxy0, FileNm='./SMC61250',
+        depmin=0.0, dshalw=0.0, wlevel=0.0, msea=1, Save=True, **kwargs ):
+    """
+    Generate regional SMC grid inner, boundary and combined cells.
+    Bathy could be an array or a lazy row band source from readbathy.
+    Return an SMCCells object with the sorted 'Cels', 'Bdys' and 'Comb'
+    parts, which are saved as cell files if Save is True.
+    """
+
+    import numpy   as np
+    import pandas  as pd
+    from datetime import datetime
+    from smcellgen import smcelsetup, smcelband, smcelrow
+    from smcellbdy import smcelbdrow
+    from smcellsat import smcellsat
+    from smcells import SMCCells
+
+## Grid constants, inner cell loop ranges and row bands as smcellgen.
+    grid = smcelsetup(ndzlonlat, mlvlxy0, Global=False, Arctic=False,
+                      depmin=depmin, dshalw=dshalw, wlevel=wlevel)
+    prm = dict( grid['prm'] )
+    nlon = grid['nlon'];  nlat = grid['nlat']
+    dlon = grid['dlon'];  dlat = grid['dlat']
+    NLvl = grid['NLvl'];  MFct = grid['MFct'];  Merg = grid['Merg']
+    ishft = prm['ishft'];  NCM = prm['NCM']
+    depmin = prm['depmin'];  dshalw = prm['dshalw']
+    MFMG = Merg*MFct
+
+## Boundary cell loop start/end numbers as in smcellbdy.
+    xlon0 = grid['zlon'];  ylat0 = grid['zlat']
+    xstart = mlvlxy0[3];  ystart = mlvlxy0[4]
+    xend   = mlvlxy0[5];  yend   = mlvlxy0[6]
+    ibstart = int(round( (xstart-xlon0)/(MFMG*dlon) ))*MFMG
+    jbstart = int(round( (ystart-ylat0)/(MFct*dlat) ))*MFct
+    ibexpnd = int(round( (xend - xstart + dlon)/(MFMG*dlon) ))*MFMG
+    jbexpnd = int(round( (yend - ystart + dlat)/(MFct*dlat) ))*MFct
+    if( ibstart < 0 ): ibstart = ibstart + MFMG
+    if( jbstart < 0 ): jbstart = jbstart + MFct
+    ibdy0 = ibstart; ibdyn = ibstart + ibexpnd - MFMG
+    jbdy0 = jbstart; jbdyn = jbstart + jbexpnd - MFct
+    print(' Boundary edge i0, in, j0, jn =', ibdy0, ibdyn, jbdy0, jbdyn)
+
+## Wrapping bathy tables cover the boundary loop beyond the east end too.
+    if( prm['WrapLon'] ):
+        prm['ipad'] = max([ prm['ipad'], ibstart + ibexpnd - nlon ])
+    ipad = prm['ipad']
+
+## Row band constants for smcelbdrow calls.
+    prb = {'NLvl': NLvl, 'istart': ibstart, 'iend': ibstart+ibexpnd,
+           'ishft': ishft, 'jequt': prm['jequt'], 'WrapLon': prm['WrapLon'],
+           'NCM': NCM, 'wlevel': prm['wlevel'], 'msea': msea,
+           'ibdy0': ibdy0, 'ibdyn': ibdyn, 'jbdy0': jbdy0, 'jbdyn': jbdyn}
+
+## Inner and boundary row bands, both at step of MFct rows, with the
+## size zone of boundary only bands found as for the inner ones.
+    bands = { bnd[0]: bnd for bnd in grid['bands'] }
+    jinner = set( bands )
+    jbndry = range(jbstart, jbstart+jbexpnd, MFct)
+    for j in jbndry:
+        if( j not in bands ): bands[j] = smcelband(j, grid['jprasn'], Merg)
+    jbands = sorted( bands )
+    if( len(jbands) == 0 ):
+        print(" *** No row bands in regional range.")
+        return None
+
+## Tables of all rows, inner cell halos included, for in-memory Bathy
+## or of each band rows for a lazy bathy source.
+    inmem = isinstance(Bathy, np.ndarray)
+    if( inmem ):
+        tabs = smcellsat(Bathy, depmin=depmin, dshalw=dshalw,
+                         jrange=[max([0, jbands[0]-MFct]),
+                                 min([nlat, jbands[-1]+2*MFct])],
+                         ipad=ipad, NCM=NCM)
+
+    Ns = np.zeros( (NLvl+1), dtype=int )
+    Nb = np.zeros( (NLvl+1), dtype=int )
+    nshalw = 0
+    incels = [ np.zeros((0,5), dtype=int) ]
+    bdcels = [ np.zeros((0,5), dtype=int) ]
+    cbcels = [ np.zeros((0,5), dtype=int) ]
+
+    print(" Cell generating started at ",
+            datetime.now().strftime('%F %H:%M:%S'))
+
+    for j in jbands:
+
+        if( j % 10*MFct == 0 ):
+            print( j, "row started at ",
+                 datetime.now().strftime('%H:%M:%S'))
+
+        ism = bands[j][1]
+        iFct = ism*MFct
+
+        if( not inmem ):
+            tabs = smcellsat(Bathy, depmin=depmin, dshalw=dshalw,
+                             jrange=[max([0, j-MFct]),
+                                     min([nlat, j+2*MFct])],
+                             ipad=ipad, NCM=NCM)
+        bband = None
+
+## Boundary cells of this band, if it is a boundary band.
+        if( j in jbndry ):
+            bband = np.asarray(Bathy[j:j+MFct,:], dtype=float)
+            rowcels, rowNs = smcelbdrow(Bathy, tabs, j, ism, prb,
+                                        bband=bband)
+            bdcels.append( rowcels )
+            cbcels.append( rowcels )
+            Nb += rowNs
+
+## Inner cells of this band, if it is an inner band.
+        if( j in jinner ):
+            jpr1 = bands[j][2:4]
+            rowcels, rowNs, rowshw = smcelrow(Bathy, tabs, j, ism,
+                                              jpr1, prm)
+            incels.append( rowcels )
+            Ns += rowNs
+            nshalw += rowshw
+
+## Inner cells in boundary edge blocks are replaced by boundary cells
+## in the combined cells.
+            if( j in jbndry ):
+                if( j == jbdy0 or j == jbdyn ):
+                    rowcels = rowcels[:0]
+                else:
+                    ib = (rowcels[:,0] - ishft + NCM) % NCM
+                    inbdy = ( ((ib - ibdy0 + NCM) % NCM < iFct) |
+                              ((ib - ibdyn + NCM) % NCM < iFct) )
+                    rowcels = rowcels[~inbdy]
+            cbcels.append( rowcels )
+
+    print(" *** Done inner cells Ns =", Ns, " Total =", sum(Ns))
+    print(" *** Shallow water number in all sizes =", nshalw)
+    print(" *** Done boundary cells Nb =", Nb, " Total =", sum(Nb))
+
+## Sort each set of cells as Qingxiang's method and save them.
+    cellout = SMCCells( FileNm )
+    for cels, Nc, cpart in [ (incels, Ns, 'Cels'),
+                             (bdcels, Nb, 'Bdys'),
+                             (cbcels, None, 'Comb') ]:
+        smcelsdf=pd.DataFrame(np.vstack(cels),
+                              columns=['i','j','di','dj','kdp'])
+        smcelsdf.sort_values(by=['dj','j','i'], inplace=True)
+        smcels = np.array(smcelsdf)
+        if( Nc is None ):
+            Nc = np.zeros( (NLvl+1), dtype=int )
+            for levl in range(1, NLvl+1):
+                Nc[levl] = np.sum( smcels[:,3] == 2**(levl-1) )
+        Nc[0] = smcels.shape[0]
+        if( sum(Nc[1:]) != Nc[0] ):
+            print(" *** Total number not matching sub-sum:",
+                    Nc[0], sum(Nc[1:]))
+        hdr = ''.join( [f"{n:8d}" for n in Nc] )
+        cellout.add(cpart, smcels, hdr)
+    if( Save ): cellout.save()
+
+    print(" smcellreg finished at ",
+            datetime.now().strftime('%F %H:%M:%S') )
+
+    return cellout
+
+## End of smcellreg function.
+
+
+def main():
+
+## Import relevant modules and functions
+    import numpy   as np
+    from readbathy import readbathy
+
+    Wrkdir='../Bathys/'
+    bathyf='Amm15Bathy.nc'
+    GridNm='AMM153km'
+
+## Open bathymetry for row band reading, converting depth to elevation.
+    Bathy = readbathy(Wrkdir+bathyf, varname='Bathymetry', factor=-1.0)
+    nlat, nlon = Bathy.shape
+    zlat = -7.2942; zlon = -10.8895
+    dlat =  0.0135; dlon = 0.0135
+    ylat = zlat + np.arange(nlat)*dlat
+    xlon = zlon + np.arange(nlon)*dlon
+    ndzlonlat=[ nlon, nlat, dlon, dlat, zlon, zlat ]
+
+## Reference point at the SW corner of the AMM15 rotated grid and the
+## last odd row is dropped for even number of size-1 rows.
+    NLvl = 2
+    x0lon = xlon[0] - 0.5*dlon
+    y0lat = ylat[0] - 0.5*dlat
+    mlvlxy0 = [ NLvl, x0lon, y0lat, xlon[0], ylat[0], xlon[-1], ylat[-2] ]
+
+    smcellreg(Bathy, ndzlonlat, mlvlxy0, FileNm=Wrkdir+GridNm,
+              depmin=5.0, dshalw=-150.0)
+    Bathy.close()
+
+## End of main program.
+
+if __name__ == '__main__':
+    main()
+
+## End of smcellreg.py program.
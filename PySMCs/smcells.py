@@ -0,0 +1,104 @@
+"""
+## SMC grid cells held in memory as the cell files would be saved.
+##
+## The cell generators (smcellgen, smcellbdy, smcellSWE, smcellful,
+## smcellreg) and smcelsplit return an SMCCells object with each cell
+## file part, such as 'Cels', 'BArc' or 'Bdys', kept as its header line
+## and sorted cell array.  The object could be passed in place of the
+## cell file names to readcell, smcelsplit, smcelvrts and the obstruction
+## function, so a full grid build runs without text file round-trips.
+##
+##   cells = smcellgen(Bathy, ndzlonlat, mlvlxy0, ..., Save=False)
+##   headrs, cel = readcell( cells )
+##   cells.save()     ## Save FileNm+'Cels.dat' and FileNm+'BArc.dat'.
+##
+## Per-cell values worked out with the cells, such as the obstruction
+## ratios 'Obst' of smcellgen, are kept as infos and saved with them.
+##
+## First created:    JGLi18Oct2026
+##
+"""
+
+class SMCCells:
+    """
+    Cell array parts of an SMC grid with their header lines.
+    """
+
+    fmtcel = '%6d %5d %4d %3d %5d'
+
+    def __init__(self, FileNm='./SMC'):
+        self.FileNm = FileNm
+        self.parts = {}
+        self.infos = {}
+
+    def add(self, part, cels, hdr=None):
+        """ Add cell array part, hdr None for a file without header. """
+        import numpy as np
+        self.parts[part] = ( hdr, np.asarray(cels, dtype=int).reshape(-1,5) )
+
+    def addinfo(self, name, vals, hdr, fmt):
+        """ Add per-cell values saved as FileNm+name+'.dat' with fmt. """
+        self.infos[name] = ( hdr, vals, fmt )
+
+    def __getitem__(self, part):
+        return self.parts[part]
+
+    def __contains__(self, part):
+        return part in self.parts
+
+    def __len__(self):
+        return sum( [ cel.shape[0] for hdr, cel in self.parts.values() ] )
+
+    @property
+    def Ns(self):
+        """ Cell numbers of all levels in the 'Cels' header. """
+        return [ int(n) for n in self.parts['Cels'][0].split() ]
+
+    @property
+    def NArB(self):
+        """ Arctic part header numbers as smcelvrts NArB, or []. """
+        if( 'BArc' not in self.parts ): return []
+        return self.parts['BArc'][0].split()
+
+    def readcell(self, parts=None):
+        """ Header lines and merged cells as readcell of the files. """
+        import numpy as np
+
+        if( parts is None ): parts = list(self.parts)
+        headrs = []
+        cels = []
+        for part in parts:
+            hdr, cel = self.parts[part]
+            headrs.append( '' if( hdr is None ) else hdr+'\n' )
+            cels.append( cel )
+
+        return headrs, np.vstack( cels )
+
+    def save(self, parts=None, FileNm=None):
+        """ Save cell parts as FileNm+part+'.dat' text files. """
+        import numpy as np
+
+        if( parts is None ): parts = list(self.parts)
+        if( FileNm is None ): FileNm = self.FileNm
+        for part in parts:
+            hdr, cel = self.parts[part]
+            celfl = FileNm+part+'.dat'
+            if( hdr is None ):
+                np.savetxt(celfl, cel, fmt=self.fmtcel, comments='')
+            else:
+                print(' ... saving '+part+'.dat with header '+hdr )
+                np.savetxt(celfl, cel, fmt=self.fmtcel, header=hdr,
+                           comments='')
+
+## Infos are saved with all parts only.
+        if( parts == list(self.parts) ):
+            for name, (hdr, vals, fmt) in self.infos.items():
+                print(' ... saving '+name+'.dat with header '+hdr )
+                np.savetxt(FileNm+name+'.dat', vals, fmt=fmt, header=hdr,
+                           comments='')
+
+        return 0
+
+## End of SMCCells class.
+
+## End of smcells.py program.
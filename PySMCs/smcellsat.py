@@ -0,0 +1,178 @@
+"""
+## Summed-area tables (integral images) of bathymetry masks for fast
+## window counts in SMC cell generation.  The tables are built once
+## per bathymetry (or per row band) so that the number of sea points,
+## shallow points or the elevation sum inside any rectangular window
+## is obtained with 4 table look-ups instead of a np.sum over a slice.
+##
+## Table rows/columns are shifted by one with a zero first row/column
+## so that window [j0:j1, i0:i1] sum is
+##     T[j1,i1] - T[j0,i1] - T[j1,i0] + T[j0,i0]
+## For bathymetry wrapping in longitude, ipad columns from the other
+## side are padded on both ends so that windows could go beyond the
+## 0/360 deg edge without any modulo operation.
+##
+## Tables of several thresholds from one bathy read are built by
+## smcelltrs for batch jobs and could be passed to worker processes
+## in shared memory with satshare and satattach.
+##
+## First created:    JGLi18Oct2026
+##
+"""
+
+def satable(arr, dtype=None):
+    """
+    Summed-area table of a 2-D array with a zero first row and column.
+    """
+    import numpy as np
+
+    ny, nx = arr.shape
+## Integer counts are exact and int32 is enough for most bathymetry.
+    if( dtype is None ):
+        if( arr.dtype == bool ):
+            dtype = np.int32 if ny*nx < 2**31 else np.int64
+        else:
+            dtype = float
+
+    tab = np.zeros((ny+1, nx+1), dtype=dtype)
+    np.cumsum(arr, axis=0, dtype=dtype, out=tab[1:,1:])
+    np.cumsum(tab[1:,1:], axis=1, out=tab[1:,1:])
+
+    return tab
+
+## End of satable function.
+
+
+def satrows(Bathy, jrange=None, ipad=0, NCM=0):
+    """
+    Read Bathy rows in jrange as float64 with ipad wrapping columns.
+    """
+    import numpy as np
+
+    nlat, nlon = Bathy.shape[0], Bathy.shape[1]
+    if( jrange is None ):
+        jrange = [0, nlat]
+    j0, j1 = int(jrange[0]), int(jrange[1])
+
+## Bathy may be a masked array or float32, so convert to float64 as
+## smcellgen subathy does before any threshold comparison.
+    bsub = np.asarray(Bathy[j0:j1,:], dtype=float)
+
+## Pad ipad columns on both sides for longitude wrapping bathy.
+    if( ipad > 0 ):
+        if( NCM <= 0 ): NCM = nlon
+        icol = (np.arange(-ipad, nlon+ipad) + NCM) % NCM
+        bsub = bsub[:,icol]
+
+    return j0, j1, bsub
+
+## End of satrows function.
+
+
+def smcellsat(Bathy, depmin=0.0, dshalw=0.0, jrange=None, ipad=0,
+              NCM=0, elev=False, **kwargs):
+    """
+    Build sea (< depmin) and deep (< dshalw) point count tables,
+    and optionally the elevation sum table, for rows in jrange.
+    """
+    from smcellsat import satrows
+
+    j0, j1, bsub = satrows(Bathy, jrange=jrange, ipad=ipad, NCM=NCM)
+
+    tabs = {'j0': j0, 'j1': j1, 'ipad': ipad,
+            'depmin': depmin, 'dshalw': dshalw }
+    tabs['sea'] = satable( bsub < depmin )
+## Same table is used if shallow water refinement is off.
+    if( dshalw == depmin ):
+        tabs['shw'] = tabs['sea']
+    else:
+        tabs['shw'] = satable( bsub < dshalw )
+    if( elev ):
+        tabs['elv'] = satable( bsub )
+
+    return tabs
+
+## End of smcellsat function.
+
+
+def smcelltrs(Bathy, thresholds, jrange=None, ipad=0, NCM=0, **kwargs):
+    """
+    Build point count tables (< threshold) for a list of thresholds
+    from one read of rows in jrange.  Tables are returned in a dict
+    keyed by threshold so that jobs sharing a threshold share a table.
+    """
+    from smcellsat import satrows
+
+    j0, j1, bsub = satrows(Bathy, jrange=jrange, ipad=ipad, NCM=NCM)
+
+    trstabs = {}
+    for thr in thresholds:
+        if( thr not in trstabs ):
+            trstabs[thr] = satable( bsub < thr )
+
+    return trstabs
+
+## End of smcelltrs function.
+
+
+def satshare(arrs):
+    """
+    Copy a dict of arrays into shared memory blocks.  Return the blocks,
+    to be closed and unlinked by the caller, and a picklable descriptor.
+    """
+    import numpy as np
+    from multiprocessing import shared_memory
+
+    shms = []
+    desc = {}
+    for key, arr in arrs.items():
+        shm = shared_memory.SharedMemory(create=True, 
+                                         size=max([1, arr.nbytes]))
+        shms.append( shm )
+        np.ndarray(arr.shape, dtype=arr.dtype, buffer=shm.buf)[...] = arr
+        desc[key] = (shm.name, arr.shape, arr.dtype.str)
+
+    return shms, desc
+
+## End of satshare function.
+
+
+def satattach(desc):
+    """
+    Attach arrays shared by satshare in a worker process.  The returned
+    blocks are to be closed after all the arrays are deleted.
+    """
+    import numpy as np
+    from multiprocessing import shared_memory
+
+    shms = []
+    arrs = {}
+    for key, (name, shape, dtype) in desc.items():
+        shm = shared_memory.SharedMemory(name=name)
+        shms.append( shm )
+        arrs[key] = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+
+    return shms, arrs
+
+## End of satattach function.
+
+
+def satsums(tabs, key, j0, j1, i0, i1):
+    """
+    Window sums over rows j0:j1 and columns i0:i1 in bathy indexes.
+    Arguments can be integers or broadcastable integer arrays.
+    """
+    import numpy as np
+
+    tab = tabs[key]
+    jb0 = np.asarray(j0) - tabs['j0']
+    jb1 = np.asarray(j1) - tabs['j0']
+    ib0 = np.asarray(i0) + tabs['ipad']
+    ib1 = np.asarray(i1) + tabs['ipad']
+
+    return tab[jb1,ib1] - tab[jb0,ib1] - tab[jb1,ib0] + tab[jb0,ib0]
+
+## End of satsums function.
+
+## End of smcellsat.py program.
+
@@ -0,0 +1,211 @@
+"""
+## Polygon-driven refinement level masks for SMC cell generation.
+##
+## Each refinement polygon is a dict of its lon-lat vertices, a target
+## level and a relaxation width in size-1 bathy points, i.e.
+##   {'poly':[[lon0, lat0], [lon1, lat1], ...], 'level':1, 'relax':8}
+## Function refnmask rasterises the polygons once into a level index
+## mask on the bathy grid, holding the target cell level of each bathy
+## point.  Points inside a polygon take its level, which is relaxed by
+## one level for every relax points away from the polygon, and all
+## other points take the outside level lvlout (NLvl by default).
+##
+## In smcellgen and smcelcount the mask of each row band is pooled by
+## refnpyr into the same level blocks as the sea mask pyramid and laid
+## on the usual cell checks.  A block holding any point of a finer
+## target level is split, so cells of a polygon are refined to its
+## level even in open water.  A block of its own target level below
+## NLvl is taken if it is all sea with its halo, or for levl > 1 if at
+## least half of its points are sea points, when it takes the mean depth
+## of its sea points only.  Other blocks go through the unchanged sea,
+## halo and shallow water checks, so an empty polygon list or a mask of
+## NLvl only gives the unrefined cells.  In smcellSWE the same mask splits
+## its all-sea blocks, i.e. the SMC1R3 refined boxes.
+##
+## First created:    JGLi18Oct2026
+##
+"""
+
+def polyfill(poly, ndzlonlat, nrow=4096):
+    """
+    Bathy points with centres inside a lon-lat polygon (even-odd rule),
+    wrapped in longitude for a wrapping bathy.  Return a bool array.
+    """
+    import numpy  as np
+
+    nlon = int(ndzlonlat[0])
+    nlat = int(ndzlonlat[1])
+    dlon, dlat, zlon, zlat = ndzlonlat[2:6]
+    ylat = np.arange(nlat)*dlat + zlat
+    WrapLon = abs( nlon*dlon - 360.0 ) < 0.01*dlon
+
+    xy = np.asarray(poly, dtype=float)
+    x0, y0 = xy[:,0], xy[:,1]
+    x1, y1 = np.roll(x0, -1), np.roll(y0, -1)
+
+    inside = np.zeros( (nlat, nlon), dtype=bool )
+    jrow = np.nonzero( (ylat >= y0.min()) & (ylat <= y0.max()) )[0]
+
+## Spans between crossing pairs are marked in an extended row of
+## 3*nlon columns for a wrapping bathy and folded back.
+    ioff = nlon if( WrapLon ) else 0
+    nwid = nlon + 2*ioff
+    for k in range(0, jrow.size, nrow):
+        jr = jrow[k:k+nrow]
+        yy = ylat[jr][:,None]
+        cros = ( ((y0 <= yy) & (yy < y1)) | ((y1 <= yy) & (yy < y0)) )
+        with np.errstate(divide='ignore', invalid='ignore'):
+            xc = x0 + (yy - y0)*(x1 - x0)/(y1 - y0)
+        xc = np.sort( np.where(cros, xc, np.inf), axis=1 )
+        npar = xc.shape[1]//2
+        xa = xc[:,0:2*npar:2]
+        xb = xc[:,1:2*npar:2]
+        pair = np.isfinite(xb)
+        if( not np.any(pair) ): continue
+
+        krow = np.nonzero(pair)[0]
+        ia = np.ceil( (xa[pair] - zlon)/dlon ).astype(int)
+        ib = np.ceil( (xb[pair] - zlon)/dlon ).astype(int)
+        ia = np.clip(ia + ioff, 0, nwid)
+        ib = np.clip(ib + ioff, 0, nwid)
+        edge = np.zeros( (jr.size, nwid+1), dtype=np.int32 )
+        np.add.at(edge, (krow, ia),  1)
+        np.add.at(edge, (krow, ib), -1)
+        ins = np.cumsum(edge, axis=1)[:,:nwid] > 0
+        if( WrapLon ):
+            ins = ins[:,:nlon] | ins[:,nlon:2*nlon] | ins[:,2*nlon:]
+        inside[jr] = ins
+
+    return inside
+
+## End of polyfill function.
+
+
+def refnmask(polys, ndzlonlat, NLvl, lvlout=None):
+    """
+    Level index mask of the target cell level of each bathy point from
+    a list of refinement polygon dicts, relaxed outside each polygon,
+    and lvlout (NLvl if None) at other points.
+    """
+    import numpy  as np
+    from smcelrefn import polyfill
+    from smcellsat import satable
+
+    nlon = int(ndzlonlat[0])
+    nlat = int(ndzlonlat[1])
+    dlon = ndzlonlat[2]
+    WrapLon = abs( nlon*dlon - 360.0 ) < 0.01*dlon
+    if( lvlout is None ): lvlout = NLvl
+
+    lmask = np.full( (nlat, nlon), lvlout, dtype=np.int8 )
+    for pg in polys:
+        level = max([ 1, int(pg.get('level', 1)) ])
+        relax = int( pg.get('relax', 0) )
+        inside = polyfill(pg['poly'], ndzlonlat)
+        lmask[inside] = np.minimum( lmask[inside], level )
+        print(" Refinement polygon level, relax and points =", level,
+              relax, int( np.sum(inside) ))
+        if( relax <= 0 or level >= lvlout - 1 ): continue
+
+## Relaxation levels from point counts of the polygon raster within
+## square windows of half width k*relax.
+        dmax = min([ (lvlout - level - 1)*relax, nlon ])
+        ipad = dmax if( WrapLon ) else 0
+        icol = (np.arange(-ipad, nlon+ipad) + nlon) % nlon
+        tab = satable( inside[:,icol] )
+        jj = np.arange(nlat)[:,None]
+        ii = np.arange(nlon)[None,:] + ipad
+        for k in range(1, lvlout - level):
+            dk = min([ k*relax, dmax ])
+            j0 = np.clip(jj - dk, 0, nlat)
+            j1 = np.clip(jj + dk + 1, 0, nlat)
+            i0 = np.clip(ii - dk, 0, nlon + 2*ipad)
+            i1 = np.clip(ii + dk + 1, 0, nlon + 2*ipad)
+            near = (tab[j1,i1] - tab[j0,i1] - tab[j1,i0] + tab[j0,i0]) > 0
+            lmask[near] = np.minimum( lmask[near], level + k )
+
+    return lmask
+
+## End of refnmask function.
+
+
+def refnrows(lmask, j, iblk, iFct, MFct, NCM=0):
+    """
+    Level mask rows of the MFct-row band at row j over the MFct-blocks
+    starting at columns iblk, wrapped at NCM if > 0.
+    """
+    import numpy  as np
+
+    icol = ( np.asarray(iblk)[:,None] + np.arange(iFct)[None,:] ).ravel()
+    if( NCM > 0 ): icol = icol % NCM
+
+    return np.asarray(lmask[j:j+MFct])[:,icol]
+
+## End of refnrows function.
+
+
+def refnpyr(lmrows, ism, NLvl):
+    """
+    Split (finer target level) and forced (own target level, partial
+    sea accepted) masks of the level blocks of a row band from its level
+    mask rows.  Return a list indexed by level of dicts of the arrays.
+    """
+    import numpy  as np
+
+    MFct = 2**(NLvl-1)
+    ncol = lmrows.shape[1]
+
+## Finest target level within each block of each level.
+    rpyr = [ None ]*(NLvl+1)
+    for levl in range(1, NLvl+1):
+        jchk = 2**(levl - 1)
+        irng = jchk*ism
+        lmin = lmrows.reshape(MFct//jchk, jchk, ncol//irng, 
+                              irng).min(axis=(1,3))
+## Level 1 cells keep the all-sea check and level NLvl is no target.
+        rpyr[levl] = {'split': lmin < levl, 
+                      'force': (lmin == levl) & (1 < levl < NLvl) }
+
+    return rpyr
+
+## End of refnpyr function.
+
+
+def refnok(lvl, rlv, jb, ib):
+    """
+    Acceptance of level candidate cells at band offsets jb, ib from the
+    sea mask pyramid level lvl and the refinement level rlv.  Return
+    the accepted and the partial sea cell masks.
+    """
+
+    jk = jb//lvl['jchk']
+    ik = ib//lvl['irng']
+    area = lvl['jchk']*lvl['irng']
+    hsea = lvl['hsea'][jk, ik]
+    part = ( rlv['force'][jk, ik] & ~hsea &
+             (2*lvl['nsea'][jk, ik] >= area) )
+
+    return (hsea & ~rlv['split'][jk, ik]) | part, part
+
+## End of refnok function.
+
+
+def refndep(bband, jb, icel, jchk, irng, depmin, NCM=0):
+    """
+    Mean depth of the sea points (< depmin) of partial sea cells at band
+    rows jb and bathy columns icel from the band rows bband.
+    """
+    import numpy  as np
+
+    jm = jb[:,None,None] + np.arange(jchk)[None,:,None]
+    im = icel[:,None,None] + np.arange(irng)[None,None,:]
+    if( NCM > 0 ): im = im % NCM
+    sub = bband[jm, im]
+    sea = sub < depmin
+
+    return ( np.sum( np.where(sea, sub, 0.0), axis=(1,2) ) /
+             np.maximum( 1, np.sum(sea, axis=(1,2)) ) )
+
+## End of refndep function.
+
+## End of smcelrefn.py program.
@@ -1,13 +1,19 @@
 """
 ##  Function smcelsplit for splitting a SMC grid into sub-grids.
 ##
+##  Cells could be given as an SMCCells object in place of the cell file
+##  and the sub-grid cells are returned as an SMCCells object.  JGLi18Oct2026
+##
 ##  First created:        JGLi08Oct2021
-##  Last modified:        JGLi05Feb2025
+##  Last modified:        JGLi18Oct2026
 ##
 """
 
-def smcelsplit(SMCeFile, zdlonlat, SpltFile, WrkDir='./', NLvl=5, **kwargs): 
-    """ Split a SMC grid into sub-grids with given splitting lines. """
+def smcelsplit(SMCeFile, zdlonlat, SpltFile, WrkDir='./', NLvl=5, 
+               Save=True, **kwargs): 
+    """ Split a SMC grid into sub-grids with given splitting lines. 
+        SMCeFile could be a cell file or an SMCCells object with 'Cels'.
+        Return sub-grid cells as an SMCCells object, saved if Save. """
 
 ##  Import relevant modules and functions
     import numpy as np
@@ -16,6 +22,7 @@ def smcelsplit(SMCeFile, zdlonlat, SpltFile, WrkDir='./', NLvl=5, **kwargs):
     from datetime import datetime
     from readcell import readcell   
     from readtext import readtext   
+    from smcells import SMCCells
 
     print( " smcelsplt started at %s " % datetime.now().strftime('%F %H:%M:%S') )
 
@@ -23,7 +30,10 @@ def smcelsplit(SMCeFile, zdlonlat, SpltFile, WrkDir='./', NLvl=5, **kwargs):
     print (" Split cell arrays will be saved in ", WrkDir)
 
 ##  Read cell array from input file. 
-    headrs, cel = readcell( [ SMCeFile ] ) 
+    if( isinstance(SMCeFile, SMCCells) ):
+        headrs, cel = readcell( [ SMCeFile['Cels'] ] )
+    else:
+        headrs, cel = readcell( [ SMCeFile ] ) 
     nc = int( headrs[0].split()[0] )
     print ('Total cell number = %d' % nc )
     print ("First cell array is ", cel[0,:])
@@ -182,36 +192,19 @@ def smcelsplit(SMCeFile, zdlonlat, SpltFile, WrkDir='./', NLvl=5, **kwargs):
                 else:
                     PBndy.append( list(cel[i,:]) ) 
 
-##  Convert cell lists and save into two cell files.
-    fmtcel='%6d %5d %4d %3d %5d'
-
-    Atcels = np.array(Atlns)
-    print(" Saving Atcels cells:", Atcels.shape )
-    np.savetxt(WrkDir+"AtnCels.dat", Atcels, fmt=fmtcel, comments='')
-
-    Pacels = np.array(Pacfc)
-    print(" Saving Pacels cells:", Pacels.shape )
-    np.savetxt(WrkDir+"PcfCels.dat", Pacels, fmt=fmtcel, comments='')
-
-    Shcels = np.array(South)
-    print(" Saving Shcels cells:", Shcels.shape )
-    np.savetxt(WrkDir+"SthCels.dat", Shcels, fmt=fmtcel, comments='')
-
-    ABcels = np.array(ABndy)
-    print(" Saving ABcels cells:", ABcels.shape )
-    np.savetxt(WrkDir+"AtnBdys.dat", ABcels, fmt=fmtcel, comments='')
-
-    PBcels = np.array(PBndy)
-    print(" Saving PBcels cells:", PBcels.shape )
-    np.savetxt(WrkDir+"PcfBdys.dat", PBcels, fmt=fmtcel, comments='')
+##  Convert cell lists and save into sub-grid cell files without header.
+    subcels = SMCCells( WrkDir )
+    for part, sublist in [ ('AtnCels', Atlns), ('PcfCels', Pacfc), 
+        ('SthCels', South), ('AtnBdys', ABndy), ('PcfBdys', PBndy), 
+        ('SthBdys', SBndy) ]:
+        subcels.add(part, np.array(sublist))
+        print(" Saving "+part+" cells:", subcels[part][1].shape )
 
-    SBcels = np.array(SBndy)
-    print(" Saving SBcels cells:", SBcels.shape )
-    np.savetxt(WrkDir+"SthBdys.dat", SBcels, fmt=fmtcel, comments='')
+    if( Save ): subcels.save()
 
     print( " smcelsplt finished at %s " % datetime.now().strftime('%F %H:%M:%S') )
 
-    return 0
+    return subcels
 
 ## End of smcelsplt function ##
 
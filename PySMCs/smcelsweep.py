@@ -0,0 +1,175 @@
+"""
+## Function smcelsweep to compare SMC grid designs over one bathymetry.
+##
+## Each configuration is a dict of the smcellgen parameters to try, i.e.
+##   {'name':'L4d10', 'NLvl':4, 'depmin':10.0, 'dshalw':-150.0,
+##    'wlevel':0.0, 'region':[SW lon, SW lat, NE lon, NE lat]}
+## where missing wlevel is 0.0, depmin is wlevel, dshalw is depmin and
+## a missing region gives the global grid.  Refinement polygons of
+## smcelrefn could be given as 'refine'.  A dict of value lists, such
+## as {'NLvl':[3,4], 'depmin':[0.0,10.0]}, is expanded into all their
+## combinations.
+##
+## The bathy is read once into bit-packed masks of every depmin and
+## dshalw threshold, which are shared in memory by nproc processes.
+## Each configuration is counted by smcelcount without any cell file,
+## giving the cell numbers of each level, U/V face numbers and a cost
+## proxy, the cell updates per time step of the largest cells with a
+## size-2**(l-1) cell updated 2**(NLvl-l) times as in the multi-level
+## CFL sub-steps.  The cost per size-1 cell step, cost/2**(NLvl-1), is
+## comparable between grids of different NLvl.  Results are returned as
+## a list of dicts and saved as a text table if TableFl is given.
+##
+## First created:    JGLi18Oct2026
+##
+"""
+
+def smcelsjob(args):
+    """
+    Pool worker to count one smcelsweep configuration on shared masks.
+    """
+
+    from smcelsweep import smcelsrun
+    from smcellsat import satattach
+
+    cfg, bitdesc, ndzlonlat, x0y0, Arctic, sample = args
+
+    shms, masks = satattach( bitdesc[1] )
+    bits = dict( bitdesc[0], masks=masks )
+    try:
+        result = smcelsrun(bits, cfg, ndzlonlat, x0y0, Arctic, sample)
+    finally:
+        del bits, masks
+        for shm in shms: shm.close()
+
+    return result
+
+## End of smcelsjob function.
+
+
+def smcelsrun(bits, cfg, ndzlonlat, x0y0, Arctic=False, sample=1):
+    """
+    Count cells and faces of one configuration and work out its cost.
+    """
+
+    from smcelcount import smcelcount
+
+    NLvl = int( cfg['NLvl'] )
+    mlvlxy0 = [ NLvl, x0y0[0], x0y0[1] ]
+    Global = cfg.get('region') is None
+    if( not Global ): mlvlxy0 += list( cfg['region'] )
+
+    print(" Sweep", cfg['name'], "NLvl, wlevel, depmin, dshalw =", NLvl,
+          cfg['wlevel'], cfg['depmin'], cfg['dshalw'])
+    est = smcelcount(None, ndzlonlat, mlvlxy0, Global=Global,
+                     Arctic=Arctic and Global, depmin=cfg['depmin'],
+                     dshalw=cfg['dshalw'], wlevel=cfg['wlevel'],
+                     sample=sample, bits=bits, refine=cfg.get('refine'))
+
+## Size-2**(l-1) cells take 2**(NLvl-l) sub-steps of a base time step.
+    Ns = est['Ns']
+    cost = sum( [ Ns[l]*2**(NLvl-l) for l in range(1, NLvl+1) ] )
+
+    result = dict( cfg )
+    result.update( {'Ns': Ns, 'NU': est['NU'], 'NV': est['NV'],
+                    'NCL': est['NCL'], 'NFC': est['NFC'], 'cost': cost,
+                    'cost1': cost/float(2**(NLvl-1)), 'wall': est['wall']} )
+
+    return result
+
+## End of smcelsrun function.
+
+
+def smcelsweep(Bathy, ndzlonlat, configs, x0lon=0.0, y0lat=0.0,
+               Arctic=False, nproc=1, sample=1, TableFl=None, **kwargs):
+    """
+    Count cells, faces and cost of a list of grid configurations, or of
+    all combinations of a dict of parameter lists, on one bathy.
+    """
+
+    import itertools
+    from datetime import datetime
+    from multiprocessing import Pool
+    from smcelsweep import smcelsrun, smcelsjob
+    from smcelbits import smcelbits
+    from smcellsat import satshare
+
+    if( isinstance(configs, dict) ):
+        keys = list( configs )
+        configs = [ dict( zip(keys, vals) ) for vals in
+                    itertools.product( *[configs[key] for key in keys] ) ]
+
+## Fill in defaults and thresholds reset as in smcellgen.
+    cfgs = []
+    thrs = []
+    for k, config in enumerate(configs):
+        cfg = dict( config )
+        cfg['wlevel'] = config.get('wlevel', 0.0)
+        cfg['depmin'] = max([ config.get('depmin', cfg['wlevel']),
+                              cfg['wlevel'] ])
+        cfg['dshalw'] = config.get('dshalw', cfg['depmin'])
+        if( cfg['dshalw'] >= cfg['depmin'] ):
+            cfg['dshalw'] = cfg['depmin']
+        cfg['NLvl'] = int( config.get('NLvl', 4) )
+        cfg['region'] = config.get('region')
+        cfg['name'] = config.get('name', 'Cfg{:03d}'.format(k))
+        thrs += [ cfg['depmin'], cfg['dshalw'] ]
+        cfgs.append( cfg )
+
+## One bathy read for the masks of all thresholds.
+    print(" Building masks for thresholds", sorted(set(thrs)), " at ",
+          datetime.now().strftime('%F %H:%M:%S'))
+    bits = smcelbits(Bathy, thrs)
+    x0y0 = [ x0lon, y0lat ]
+
+    if( nproc > 1 and len(cfgs) > 1 ):
+        shms = []
+        try:
+            shms, mdesc = satshare( bits['masks'] )
+            bitdesc = ( {key: bits[key] for key in bits if key != 'masks'},
+                        mdesc )
+            del bits
+            args = [ (cfg, bitdesc, ndzlonlat, x0y0, Arctic, sample)
+                     for cfg in cfgs ]
+            with Pool(processes=nproc) as pool:
+                results = pool.map(smcelsjob, args)
+        finally:
+            for shm in shms:
+                shm.close()
+                shm.unlink()
+    else:
+        results = [ smcelsrun(bits, cfg, ndzlonlat, x0y0, Arctic, sample)
+                    for cfg in cfgs ]
+
+## Table of all configurations with cells of levels 1 to max NLvl.
+    MLvl = max( [ rst['NLvl'] for rst in results ] )
+    lines = [ '{:12s} {:>4s} {:>8s} {:>8s} {:>8s}'.format('name', 'NLvl',
+              'wlevel', 'depmin', 'dshalw') +
+              ''.join( [ '{:>9s}'.format('N'+str(l)) for l in
+                         range(1, MLvl+1) ] ) +
+              ' {:>9s} {:>9s} {:>9s} {:>9s} {:>11s} {:>11s}'.format('NC',
+              'NU', 'NV', 'NFC', 'cost', 'cost1') ]
+    for rst in results:
+        Ns = rst['Ns'] + [0]*(MLvl - rst['NLvl'])
+        lines.append( '{:12s} {:4d} {:8.2f} {:8.2f} {:8.2f}'.format(
+                      rst['name'], rst['NLvl'], rst['wlevel'],
+                      rst['depmin'], rst['dshalw']) +
+                      ''.join( [ '{:9d}'.format(n) for n in Ns[1:] ] ) +
+                      ' {:9d} {:9d} {:9d} {:9d} {:11d} {:11.1f}'.format(
+                      Ns[0], rst['NU'], rst['NV'], rst['NFC'],
+                      rst['cost'], rst['cost1']) )
+
+    print( '\n'.join(lines) )
+    if( TableFl is not None ):
+        with open(TableFl, 'w') as flhdl:
+            flhdl.write( '\n'.join(lines) + '\n' )
+        print(" Sweep table saved in "+TableFl)
+
+    print(" smcelsweep finished at",
+          datetime.now().strftime('%F %H:%M:%S') )
+
+    return results
+
+## End of smcelsweep function.
+
+## End of smcelsweep.py program.
@@ -2,12 +2,13 @@
 ##  smcelvrts function generates the polygon vertices used to draw cells
 ##  on grid plots or output field plots when field colour is filled. 
 ##  First Created:    12 Jan 2021     Jian-Guo Li
-##  Last Modified:     8 Apr 2025     Jian-Guo Li
+##  Last Modified:    18 Oct 2026     Jian-Guo Li
 ##
 ## usage:  nvrts, ncels, svrts, scels, nsmrk = smcelvrts( cel, zdlnlt, 
 ##           rdpols, rngsxy, excids=[], NArB=[], Pnrds=3.0 )
 ##
-## input:  cel --- cell array to be projected. 
+## input:  cel --- cell array to be projected, or an SMCCells object
+##                  whose 'BArc' header is used if NArB is not given.
 ##         zdlnlt = [zrlon, zrlat, dxlon, dylat] --- i=j=0 lon-lat and size-1 increments.
 ##         rdpols = [radius, pangle, plon, plat] --- projection radius, angle, and pole.
 ##         rngsxy = [-10.0, 10.0,-13.0, 10.0] --- plot ranges (assume radius = 10.0 ).
@@ -24,6 +25,12 @@ def smcelvrts( cel, zdlnlt, rdpols, rngsxy, excids=[], NArB=[], Pnrds=3.0):
 
     import numpy as np
     from steromap import steromap
+    from smcells import SMCCells
+
+##  Merge in-memory cell parts as readcell does.
+    if( isinstance(cel, SMCCells) ):
+        if( len(NArB) == 0 ): NArB = cel.NArB
+        headrs, cel = cel.readcell()
 
 ##  Process input parameters.
     zrlon=zdlnlt[0]; zrlat=zdlnlt[1]
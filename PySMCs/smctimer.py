@@ -0,0 +1,112 @@
+"""
+## Opt-in timing and counters for the SMC cell generators and the bathy
+## reduction functions.
+##
+## An SMCTimer object passed as timer= to smcellgen or reduceGEBCObstr
+## collects the wall time of each stage (table or mask build, window
+## checks, sort, write etc.), one record for each row band or tile with
+## its own times and cell counts, and named counters such as the cell
+## number of each level and the shallow-skip count nshalw.  Everything
+## could be saved as a JSON file with tojson.  Without a timer the
+## functions only print their usual progress lines.
+##
+##   timer = SMCTimer('SMC61250')
+##   smcellgen(Bathy, ndzlonlat, mlvlxy0, ..., timer=timer)
+##   timer.tojson('SMC61250Time.json')
+##
+## First created:    JGLi18Oct2026
+##
+"""
+
+class SMCTimer:
+    """
+    Stage wall times, row band or tile records and counters of a run.
+    """
+
+    def __init__(self, name='SMCTimer'):
+        import time
+        from datetime import datetime
+
+        self.name = name
+        self.started = datetime.now().strftime('%F %H:%M:%S')
+        self.stages = {}
+        self.records = []
+        self.counters = {}
+        self._t0 = time.perf_counter()
+
+    def stage(self, name):
+        """ Context to add the wall time of a block to stage name. """
+        import time
+        from contextlib import contextmanager
+
+        @contextmanager
+        def _stage():
+            t0 = time.perf_counter()
+            try:
+                yield self
+            finally:
+                self.addtime(name, time.perf_counter() - t0)
+
+        return _stage()
+
+    def addtime(self, name, wall, calls=1):
+        stg = self.stages.setdefault(name, {'wall': 0.0, 'calls': 0})
+        stg['wall'] += wall
+        stg['calls'] += calls
+
+    def count(self, name, n=1):
+        """ Add n to counter name, n could be a list for each level. """
+        import numpy  as np
+
+        if( np.ndim(n) > 0 ):
+            n = [ int(k) for k in n ]
+            old = self.counters.get(name, [0]*len(n))
+            self.counters[name] = [ a + b for a, b in zip(old, n) ]
+        else:
+            self.counters[name] = self.counters.get(name, 0) + int(n)
+
+    def record(self, kind, **fields):
+        """ Append one record, such as a row band or a tile. """
+        rec = {'kind': kind}
+        rec.update( fields )
+        self.records.append( rec )
+
+    def merge(self, other):
+        """ Merge a timer dict from a worker process. """
+        for name, stg in other['stages'].items():
+            self.addtime(name, stg['wall'], stg['calls'])
+        for name, n in other['counters'].items():
+            self.count(name, n)
+        self.records += other['records']
+
+    def todict(self):
+        import time
+        return {'name': self.name, 'started': self.started,
+                'wall': time.perf_counter() - self._t0,
+                'stages': self.stages, 'counters': self.counters,
+                'records': self.records}
+
+    def tojson(self, jsonfile):
+        """ Save the timer dict as a JSON file. """
+        import json
+
+        with open(jsonfile, 'w') as flhdl:
+            json.dump(self.todict(), flhdl, indent=1)
+        print(" Timing saved in "+jsonfile)
+
+## End of SMCTimer class.
+
+
+def timing(timer, name):
+    """
+    Stage context of timer, or a null context if timer is None.
+    """
+    from contextlib import nullcontext
+
+    if( timer is None ):
+        return nullcontext()
+    return timer.stage(name)
+
+## End of timing function.
+
+## End of smctimer.py program.